@@ -1,37 +1,203 @@
-from typing import Dict, Generator, List, Optional
+import asyncio
+import copy
+import logging
+import sys
+from typing import AsyncGenerator, Dict, Generator, List, Optional
 from agents.voice_agent import ConversationalAgent
 from agent_node import AgentNode
+from agent_path_finder import AgentPathFinder
+from async_utils import iterate_sync
+from config_registry import CompiledAgentConfig
+from context_window import ContextWindow
+from intent_router import IntentRouter
+from stream_events import token_event, transition_event
 from transition_manager import TransitionManager, TRANSITION_PATH_SEPARATOR
+from route_plan import resolve_route_execution
+from turn_budget import resolve_turn_limits
+
+logger = logging.getLogger(__name__)
+
+# Version of the serialized session state produced by AgentGraph.to_state
+SESSION_STATE_VERSION = 1
+
+
+class AgentContexts(dict):
+    """Per-agent contexts of one session, created on first use so idle agents cost a session nothing"""
+    
+    def __init__(self, nodes: Dict[str, AgentNode]):
+        super().__init__()
+        self._nodes = nodes
+        
+    def __missing__(self, agent_name: str) -> Dict:
+        node = self._nodes.get(agent_name)
+        if node is None:
+            raise KeyError(agent_name)
+        context = self[agent_name] = AgentGraph._new_agent_context(node.agent)
+        return context
 
 
 class AgentGraph:
-    def __init__(self, root_agent: ConversationalAgent, transition_rules: Dict[str, str] = None, intent_patterns: Dict[str, List[str]] = None):
+    def __init__(self, root_agent: ConversationalAgent, transition_rules: Dict[str, str] = None, intent_patterns: Dict[str, List[str]] = None,
+                 path_finder: Optional[AgentPathFinder] = None, config: Optional[CompiledAgentConfig] = None):
         """
         Initialize the agent graph with a root agent.
         
         Args:
             root_agent: The root agent of the graph
-            intent_patterns: Dictionary mapping intent names to regex patterns or keywords
+            intent_patterns: Dictionary mapping agent names to regex patterns that route messages
+                straight to them from the root agent (see IntentRouter)
+            path_finder: Shared path finder; built from agent_config.json if omitted
+            config: Compiled configuration the graph was built from, if any
         """
+        # Topology: shared by every session created from this graph
         self.root = AgentNode(root_agent, transition_rules)
         self.nodes: Dict[str, AgentNode] = {root_agent.get_name(): self.root}
-        self.active_node = self.root
-        self.agent_path: List[str] = [root_agent.get_name()]
-        self.conversation_history: List[Dict] = []
+        self.max_context_token_budget = root_agent.get_context_token_budget()
         self.intent_patterns = intent_patterns or {}
+        self.intent_router = IntentRouter(self.intent_patterns, self.root.transition_rules)
+        self.config = config
+        
+        # Initialize transition manager with the completion agents and per-turn limits from the config
+        transition_settings = config.transition_settings if config is not None else {}
+        max_hops, max_backend_calls = resolve_turn_limits(transition_settings)
+        self.transition_manager = TransitionManager(
+            path_finder, completion_agents=transition_settings.get("completion_agents"),
+            max_hops=max_hops, max_backend_calls=max_backend_calls,
+            route_execution=resolve_route_execution(transition_settings))
+        
+        self._init_session_state()
+        
+    def _init_session_state(self) -> None:
+        """Reset the mutable per-conversation state on top of the current topology"""
+        self.active_node = self.root
+        self.agent_path: List[str] = [self.root.agent.get_name()]
+        # Bounded by the largest agent budget; each request is trimmed to its agent's own budget
+        self.conversation_history = ContextWindow(self.max_context_token_budget)
+        
+        # Share the path finder (topology) and settings but keep transitions per session
+        self.transition_manager = self.transition_manager.create_session()
         
-        # Initialize transition manager
-        self.transition_manager = TransitionManager()
+        # Per-agent context (simplified), created when an agent first takes part in the conversation
+        self.agent_contexts: Dict[str, Dict] = AgentContexts(self.nodes)
         
-        # Per-agent context (simplified)
-        self.agent_contexts: Dict[str, Dict] = {
-            root_agent.get_name(): {
-                "conversation_summary": [],
-                "user_preferences": {},
-                "session_data": {}
-            }
+    @staticmethod
+    def _new_agent_context(agent: ConversationalAgent) -> Dict:
+        """Create an empty per-agent context"""
+        return {
+            "conversation_summary": ContextWindow(agent.get_context_token_budget()),
+            "user_preferences": {},
+            "session_data": {}
         }
         
+    def create_session(self) -> 'AgentGraph':
+        """
+        Create a graph for a new conversation.
+        
+        The returned graph shares this graph's nodes, agents and path tables
+        (which must not be modified afterwards) and starts with fresh
+        conversation state at the root agent.
+        
+        Returns:
+            AgentGraph: A session view of this graph
+        """
+        session = copy.copy(self)
+        session._init_session_state()
+        return session
+        
+    def migrate_to(self, template: 'AgentGraph') -> 'AgentGraph':
+        """
+        Move this session's conversation state onto another graph's topology.
+        
+        Used after a configuration reload: history, transitions and the
+        contexts of agents that still exist are kept, and the active agent is
+        kept if it still exists (otherwise the session returns to the root).
+        
+        Args:
+            template: Graph whose topology the session should use from now on
+            
+        Returns:
+            AgentGraph: A session view of template carrying this session's state
+        """
+        session = template.create_session()
+        session.conversation_history = self.conversation_history
+        for agent_name, context in self.agent_contexts.items():
+            if agent_name in session.nodes:
+                session.agent_contexts[agent_name] = context
+        
+        active_agent_name = self.active_node.agent.get_name()
+        if active_agent_name in session.nodes:
+            session.active_node = session.nodes[active_agent_name]
+            session.agent_path = self.agent_path
+        
+        session.transition_manager.transition_log = self.transition_manager.transition_log
+        plan = self.transition_manager.plan
+        if plan is not None and all(agent_name in session.nodes for agent_name in plan.path):
+            session.transition_manager.plan = plan
+        return session
+        
+    def to_state(self) -> Dict:
+        """
+        Get this session's conversation state as JSON-serializable data.
+        
+        The state holds no topology: it is restored onto whatever graph is
+        current with restore_session, the same way migrate_to moves a session.
+        
+        Returns:
+            Dictionary with the schema version, active agent, agent path, history,
+            per-agent contexts and transition state
+        """
+        return {
+            "version": SESSION_STATE_VERSION,
+            "active_agent": self.active_node.agent.get_name(),
+            "agent_path": list(self.agent_path),
+            "conversation_history": self.conversation_history.to_state(),
+            "agent_contexts": {
+                agent_name: {
+                    "conversation_summary": context["conversation_summary"].to_state(),
+                    "user_preferences": dict(context["user_preferences"]),
+                    "session_data": dict(context["session_data"])
+                }
+                for agent_name, context in self.agent_contexts.items()
+            },
+            "transitions": self.transition_manager.to_state()
+        }
+        
+    def restore_session(self, state: Dict) -> 'AgentGraph':
+        """
+        Create a session of this graph from to_state() data.
+        
+        Contexts of agents that no longer exist are dropped, and the session
+        returns to the root if its active agent no longer exists.
+        
+        Args:
+            state: Data returned by to_state()
+            
+        Returns:
+            AgentGraph: A session view of this graph carrying the saved state
+        """
+        if state.get("version") != SESSION_STATE_VERSION:
+            raise ValueError(f"Unsupported session state version: {state.get('version')}")
+        session = self.create_session()
+        session.conversation_history = ContextWindow.from_state(
+            state["conversation_history"], self.max_context_token_budget)
+        for agent_name, context in state.get("agent_contexts", {}).items():
+            node = self.nodes.get(agent_name)
+            if node is not None:
+                session.agent_contexts[agent_name] = {
+                    "conversation_summary": ContextWindow.from_state(
+                        context["conversation_summary"], node.agent.get_context_token_budget()),
+                    "user_preferences": dict(context.get("user_preferences", {})),
+                    "session_data": dict(context.get("session_data", {}))
+                }
+        
+        active_node = self.nodes.get(state.get("active_agent"))
+        if active_node is not None:
+            session.active_node = active_node
+            session.agent_path = list(state.get("agent_path", [])) or [active_node.agent.get_name()]
+        
+        session.transition_manager.load_state(state.get("transitions", {}), self.nodes)
+        return session
+        
     def add_agent(self, parent_agent_name: str, agent: ConversationalAgent, 
                   transition_rules: Dict[str, str] = None) -> None:
         """
@@ -48,13 +214,7 @@ class AgentGraph:
         agent_node = AgentNode(agent, transition_rules)
         self.nodes[agent.get_name()] = agent_node
         self.nodes[parent_agent_name].add_child(agent_node)
-        
-        # Initialize context for the new agent
-        self.agent_contexts[agent.get_name()] = {
-            "conversation_summary": [],
-            "user_preferences": {},
-            "session_data": {}
-        }
+        self.max_context_token_budget = max(self.max_context_token_budget, agent.get_context_token_budget())
         
     def transition_to(self, agent_name: str) -> bool:
         if agent_name not in self.nodes:
@@ -65,6 +225,35 @@ class AgentGraph:
         return True
         
     def process_message(self, user_message: str) -> Generator[str, None, None]:
+        """Synchronous counterpart of aprocess_message for callers without an event loop"""
+        yield from iterate_sync(self.aprocess_message(user_message))
+        
+    async def aprocess_message(self, user_message: str) -> AsyncGenerator[str, None]:
+        """Process a user message and yield the response text as it is generated"""
+        async for event in self.aprocess_events(user_message):
+            if event["content"]:
+                yield event["content"]
+        
+    async def aprocess_events(self, user_message: str) -> AsyncGenerator[Dict, None]:
+        """
+        Process a user message and yield typed stream events.
+        
+        Args:
+            user_message: The user's input message
+            
+        Yields:
+            Token events with response deltas and transition events (see stream_events)
+        """
+        # Every handoff and backend call of this turn is counted against its budget
+        self.transition_manager.start_turn(self.active_node.agent.get_name())
+        try:
+            async for event in self._aprocess_turn(user_message):
+                yield event
+        finally:
+            self.transition_manager.finish_turn()
+            
+    async def _aprocess_turn(self, user_message: str) -> AsyncGenerator[Dict, None]:
+        """Process one user turn for aprocess_events"""
         # Update current agent's context with new user message
         current_agent_name = self.active_node.agent.get_name()
         self.agent_contexts[current_agent_name]["conversation_summary"].append({
@@ -73,31 +262,44 @@ class AgentGraph:
             "agent": current_agent_name
         })
         
-        self.conversation_history.append({
+        user_message_id = self.conversation_history.append({
             "role": "user",
             "content": user_message
         })
         
+        # Fast path: route straight from the root to a specialist when the intent is unambiguous
+        if self.active_node is self.root:
+            route = self.intent_router.route(user_message)
+            if route and route["target_agent"] in self.nodes and route["target_agent"] != current_agent_name:
+                next_agent = self.transition_manager.execute_path_transition(
+                    current_agent_name, route["target_agent"])
+                if next_agent and self.transition_manager.admit_hop(current_agent_name, next_agent, "intent_router"):
+                    async for event in self._ahandoff(current_agent_name, user_message, "", next_agent,
+                                                      reason="intent_router", user_message_id=user_message_id):
+                        yield event
+                    return
+        
         active_agent = self.active_node.agent
         
-        # Add system message with parent context (not global)
-        if len(self.conversation_history) == 1:
-            system_message = active_agent.get_system_message()
-            # Include relevant parent context in system message
+        # Parent context (not global) is added on the first turn, after the agent's static system prompt
+        context_message = None
+        if len(self.conversation_history) == 1 and not self.conversation_history.folded_count:
             context_str = self._format_parent_context(current_agent_name)
             if context_str:
-                system_message += f"\nParent Context: {context_str}"
-            messages = [{"role": "system", "content": system_message}]
-            messages.extend(self.conversation_history)
-        else:
-            messages = self.conversation_history.copy()
+                context_message = f"Parent Context: {context_str}"
+        
+        # Only the bounded window (summary plus recent turns) is sent to the backend
+        messages = self.conversation_history.to_messages(
+            active_agent.get_system_message(), token_budget=active_agent.get_context_token_budget(),
+            context_message=context_message)
         
+        # Stops reading as soon as a transition marker is complete so the handoff starts immediately
         response_chunks = []
-        for chunk in active_agent.execute_with_streaming(messages):
-            response_chunks.append(chunk)
-            yield chunk
+        async for chunk in self.transition_manager.astream_response(active_agent, messages, self.nodes,
+                                                                    response_chunks):
+            yield token_event(current_agent_name, chunk)
         
-        full_response = "".join(response_chunks) if isinstance(response_chunks[0], str) else response_chunks[0]
+        full_response = "".join(response_chunks)
         
         # Update current agent's context with agent response
         self.agent_contexts[current_agent_name]["conversation_summary"].append({
@@ -106,28 +308,161 @@ class AgentGraph:
             "agent": current_agent_name
         })
         
-        self.conversation_history.append({
+        response_message_id = self.conversation_history.append({
             "role": "assistant",
             "content": full_response
         })
         
+        # A fan-out runs several specialists concurrently on the same message
+        fanout_targets = self.transition_manager.detect_fanout(full_response, current_agent_name, self.nodes)
+        if fanout_targets:
+            branches = self.transition_manager.admit_branches(current_agent_name, fanout_targets)
+            if len(branches) > 1:
+                async for event in self._afanout(current_agent_name, user_message, full_response, branches,
+                                                 user_message_id=user_message_id,
+                                                 response_message_id=response_message_id):
+                    yield event
+            elif branches:
+                async for event in self._ahandoff(current_agent_name, user_message, full_response, branches[0],
+                                                  reason="fanout", user_message_id=user_message_id,
+                                                  response_message_id=response_message_id):
+                    yield event
+            return
+        
         # Check for transition intent with improved detection
         transition_target = self.transition_manager.detect_intent_and_transition(
             user_message, full_response, self.active_node, self.nodes)
-        if transition_target:
-            # Record the transition
-            self.transition_manager.record_transition(
-                current_agent_name, user_message, full_response, transition_target, self.agent_contexts)
-            
-            if self.transition_to(transition_target):
-                # Pass the original query to the new agent for processing
-                yield f"\n[Transferring to {transition_target} to handle your request...]\n"
+        if transition_target and self.transition_manager.admit_hop(current_agent_name, transition_target, "transition"):
+            async for event in self._ahandoff(current_agent_name, user_message, full_response, transition_target,
+                                              user_message_id=user_message_id,
+                                              response_message_id=response_message_id):
+                yield event
                 
-                # Process the query with the new agent
-                yield from self.transition_manager.process_transitioned_message(
-                    user_message, transition_target, self.nodes, self.agent_contexts, 
-                    self.conversation_history, self._format_parent_context, context_str="")
+    async def _ahandoff(self, from_agent: str, user_message: str, response: str,
+                        target_agent: str, reason: str = "transition", user_message_id: Optional[int] = None,
+                        response_message_id: Optional[int] = None) -> AsyncGenerator[Dict, None]:
+        """Record a transition, activate the target agent and let it process the user's message"""
+        self.transition_manager.record_transition(
+            from_agent, user_message, response, target_agent, self.agent_contexts,
+            kind=reason, user_message_id=user_message_id, response_message_id=response_message_id)
+        
+        if self.transition_to(target_agent):
+            # Pass straight through the intermediate agents of a multi-step route (relay mode),
+            # so only the agent at the end of it answers, in this turn
+            relays = []
+            relay_from = target_agent
+            relay_to = self.transition_manager.next_relay_hop(relay_from)
+            while (relay_to in self.nodes
+                   and self.transition_manager.admit_hop(relay_from, relay_to, "relay")):
+                self.transition_manager.record_transition(
+                    relay_from, user_message, "", relay_to, self.agent_contexts, kind="relay",
+                    user_message_id=user_message_id)
+                relays.append((relay_from, relay_to))
+                relay_from = relay_to
+                relay_to = self.transition_manager.next_relay_hop(relay_from)
+            answering_agent = relay_from
+            
+            # Pass the original query to the new agent for processing
+            yield transition_event(
+                from_agent, target_agent,
+                f"\n[Transferring to {answering_agent} to handle your request...]\n", reason)
+            for relay_from, relay_to in relays:
+                self.transition_to(relay_to)
+                yield transition_event(relay_from, relay_to, reason="relay")
+                target_agent = relay_to
+            
+            # Process the query with the new agent
+            async for event in self.transition_manager.aprocess_transitioned_events(
+                    user_message, target_agent, self.nodes, self.agent_contexts,
+                    self.conversation_history, self._format_parent_context, context_str=""):
+                yield event
                 
+    async def _afanout(self, from_agent: str, user_message: str, response: str, target_agents: List[str],
+                       user_message_id: Optional[int] = None,
+                       response_message_id: Optional[int] = None) -> AsyncGenerator[Dict, None]:
+        """
+        Run several agents on the user's message concurrently and merge their answers into one reply
+        
+        Every branch is recorded in the transition log and started at once, so
+        the turn takes about as long as its slowest branch. The answers are
+        streamed in the order of the fan-out marker, each under a header naming
+        its agent, and stored as one assistant message; the conversation stays
+        with from_agent. A failed branch's section says it could not be handled;
+        if every branch failed, the merged reply is stored and the first error
+        is raised.
+        
+        Args:
+            from_agent: Agent that fanned out
+            user_message: The user's message, passed to every branch
+            response: from_agent's response containing the fan-out marker
+            target_agents: Admitted branch agents
+            user_message_id: ID of the user message in the conversation history
+            response_message_id: ID of from_agent's response in the conversation history
+            
+        Yields:
+            One transition event per branch, then the branches' token events
+        """
+        for target_agent in target_agents:
+            self.transition_manager.record_transition(
+                from_agent, user_message, response, target_agent, self.agent_contexts,
+                kind="fanout", user_message_id=user_message_id, response_message_id=response_message_id)
+        
+        notice = f"\n[Forwarding your request to {', '.join(target_agents)}...]\n"
+        for index, target_agent in enumerate(target_agents):
+            yield transition_event(from_agent, target_agent, notice if index == 0 else "", "fanout")
+        
+        async def run_branch(target_agent: str, queue: asyncio.Queue, response_chunks: List[str]) -> None:
+            # Each branch answers only its own part; the other branches cover the rest
+            others = ", ".join(agent for agent in target_agents if agent != target_agent)
+            context_str = " | ".join(filter(None, [
+                self._format_parent_context(target_agent),
+                f"Forwarded by {from_agent} together with {others}; handle only your part of the request."]))
+            try:
+                async for event in self.transition_manager.arun_transferred_agent(
+                        user_message, target_agent, self.nodes, self.agent_contexts,
+                        self._format_parent_context, context_str, response_chunks):
+                    queue.put_nowait(event)
+            except Exception as e:
+                queue.put_nowait(e)
+            finally:
+                queue.put_nowait(None)
+        
+        branches = [(target_agent, asyncio.Queue(), []) for target_agent in target_agents]
+        tasks = [asyncio.ensure_future(run_branch(*branch)) for branch in branches]
+        errors = []
+        sections = []
+        try:
+            # Branches run concurrently; their output is relayed one branch after another
+            for target_agent, queue, response_chunks in branches:
+                header = f"\n[{target_agent}]\n"
+                yield token_event(target_agent, header)
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        break
+                    if isinstance(item, Exception):
+                        errors.append(item)
+                        logger.warning("Fan-out branch failed", extra={"from_agent": from_agent,
+                                                                       "to_agent": target_agent,
+                                                                       "error": repr(item)})
+                        if not response_chunks:
+                            response_chunks.append("(This part of your request could not be handled right now.)")
+                            yield token_event(target_agent, response_chunks[-1])
+                        continue
+                    yield item
+                sections.append(header + "".join(response_chunks))
+        finally:
+            for task in tasks:
+                task.cancel()
+        
+        # Recorded even if every branch failed, so the next turn's context still has this one
+        self.conversation_history.append({
+            "role": "assistant",
+            "content": "".join(sections).strip()
+        })
+        if len(errors) == len(branches):
+            raise errors[0]
+        
     def get_current_agent(self) -> ConversationalAgent:
         """Get the currently active agent"""
         return self.active_node.agent
@@ -140,51 +475,61 @@ class AgentGraph:
         """Get all transitions that have occurred"""
         return self.transition_manager.get_transitions()
         
+    def get_turn_stats(self) -> Optional[Dict]:
+        """Get the hops, backend calls and backend time of the last (or current) turn"""
+        turn = self.transition_manager.turn
+        return turn.to_dict() if turn is not None else None
+        
     def get_recent_transitions(self, count: int = 5) -> List[Dict]:
         """Get the most recent transitions"""
         return self.transition_manager.get_recent_transitions(count)
         
+    def get_transitions_page(self, cursor: int = 0, limit: int = 100) -> Dict:
+        """Get one page of transitions (see TransitionManager.get_transitions_page)"""
+        return self.transition_manager.get_transitions_page(cursor, limit)
+        
+    def estimate_state_size(self) -> int:
+        """Roughly estimate the memory held by this session's conversation state, in bytes"""
+        size = self.conversation_history.memory_size() + sys.getsizeof(self.agent_path)
+        for context in self.agent_contexts.values():
+            size += context["conversation_summary"].memory_size()
+            size += sys.getsizeof(context["user_preferences"]) + sys.getsizeof(context["session_data"])
+        size += self.transition_manager.transition_log.memory_size()
+        return size
 
         
     def _format_parent_context(self, current_agent: str) -> str:
         """Format the parent agent's context into a readable string"""
         parent_agent = self._find_parent_agent(current_agent)
-        if not parent_agent or parent_agent not in self.agent_contexts:
+        if not parent_agent:
             return ""
             
-        parent_context = self.agent_contexts[parent_agent]
+        # A parent that never took part in the conversation has no context yet
+        parent_context = self.agent_contexts.get(parent_agent)
         context_parts = []
         
         # Add recent conversation summary from parent
-        if parent_context["conversation_summary"]:
+        if parent_context and parent_context["conversation_summary"]:
             recent_messages = parent_context["conversation_summary"][-2:]  # Last 2 messages from parent
             context_parts.append("Parent conversation: " + " | ".join([
                 f"{msg['role']}: {msg['content'][:30]}..." for msg in recent_messages
             ]))
             
         # Add user preferences from parent
-        if parent_context["user_preferences"]:
+        if parent_context and parent_context["user_preferences"]:
             context_parts.append("User preferences: " + str(parent_context["user_preferences"]))
             
         # Add recent transitions from transition manager
         last_transition = self.transition_manager.get_last_transition()
         if last_transition:
-            context_parts.append(f"Previous transition: {last_transition['from_agent']} {TRANSITION_PATH_SEPARATOR} {last_transition['to_agent']}")
+            context_parts.append(f"Previous transition: {last_transition.from_agent} {TRANSITION_PATH_SEPARATOR} {last_transition.to_agent}")
             
         return " | ".join(context_parts)
         
     def _find_parent_agent(self, agent_name: str) -> Optional[str]:
         """Find the parent agent for a given agent"""
-        if agent_name == self.root.agent.get_name():
+        node = self.nodes.get(agent_name)
+        if node is None or node is self.root or node.parent is None:
             return None
-            
-        # Search through all nodes to find the parent
-        for parent_name, parent_node in self.nodes.items():
-            for child in parent_node.get_children():
-                if child.agent.get_name() == agent_name:
-                    return parent_name
-        return None
+        return node.parent.agent.get_name()
         
-
-
-
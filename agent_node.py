@@ -14,6 +14,7 @@ class AgentNode:
         self.agent = agent
         self.transition_rules = transition_rules or {}
         self.children: List['AgentNode'] = []
+        self.parent: Optional['AgentNode'] = None
 
     def get_agent(self):
         return self.agent    
@@ -21,6 +22,7 @@ class AgentNode:
     def add_child(self, child_node: 'AgentNode') -> None:
         """Add a child node to this agent node"""
         self.children.append(child_node)
+        child_node.parent = self
         
     def get_children(self) -> List['AgentNode']:
         """Get all child nodes"""
@@ -3,27 +3,56 @@ Agent Path Finder Module
 
 This module provides pathfinding capabilities to determine the optimal route
 from one agent to another in the agent graph structure.
+
+Shortest paths are precomputed into next-hop and distance tables (one row
+per target agent), so path queries are lookups proportional to the path
+length instead of a fresh BFS.
 """
 
 import json
+from array import array
 from typing import Dict, List, Optional, Set
 from collections import deque
 
+# Graphs up to this many agents get all routing rows computed at construction (the cost grows
+# quadratically, so it is kept to small graphs to bound config build and reload times);
+# larger graphs compute each target's row on first use.
+DEFAULT_PRECOMPUTE_LIMIT = 256
+
 
 class AgentPathFinder:
     """Finds optimal paths between agents in the agent graph"""
-    
-    def __init__(self, config_file: str = "agent_config.json"):
+
+    def __init__(self, config_file: str = "agent_config.json", agents_config: Optional[Dict] = None,
+                 precompute_limit: int = DEFAULT_PRECOMPUTE_LIMIT):
         """
         Initialize the path finder with agent configuration
-        
+
         Args:
             config_file: Path to the agent configuration JSON file
+            agents_config: Already parsed configuration; config_file is not read if given
+            precompute_limit: Precompute all routing rows if the graph has at most this many agents
         """
         self.config_file = config_file
-        self.agents_config = self._load_config()
+        self.agents_config = agents_config if agents_config is not None else self._load_config()
         self.graph = self._build_graph()
-        
+
+        # Dense indices for the routing tables
+        self._agent_names: List[str] = sorted(self.graph)
+        self._agent_index: Dict[str, int] = {name: i for i, name in enumerate(self._agent_names)}
+        self._neighbors: List[List[int]] = [
+            sorted(self._agent_index[neighbor] for neighbor in self.graph[name])
+            for name in self._agent_names
+        ]
+        self._typecode = "H" if len(self._agent_names) < 0xFFFF else "i"
+        self._unreachable = 0xFFFF if self._typecode == "H" else -1
+
+        # Per target agent index: next hop index and hop distance for every source agent
+        self._next_hop_rows: Dict[int, array] = {}
+        self._distance_rows: Dict[int, array] = {}
+        if len(self._agent_names) <= precompute_limit:
+            self.precompute_all()
+
     def _load_config(self) -> Dict:
         """Load agent configuration from JSON file"""
         try:
@@ -33,118 +62,187 @@ class AgentPathFinder:
             raise FileNotFoundError(f"Configuration file {self.config_file} not found")
         except json.JSONDecodeError:
             raise ValueError(f"Invalid JSON in configuration file {self.config_file}")
-    
+
     def _build_graph(self) -> Dict[str, Set[str]]:
         """
         Build a bidirectional graph from agent configuration
-        
+
         Returns:
             Dictionary mapping agent names to sets of connected agents
         """
         graph = {}
-        
+
         # Initialize all agents in graph
         for agent in self.agents_config['agents']:
             agent_name = agent['agent_name']
             graph[agent_name] = set()
-        
+
         # Add edges based on transition rules
         for agent in self.agents_config['agents']:
             agent_name = agent['agent_name']
             transition_rules = agent.get('transition_rules', {})
-            
-            for target_agent in transition_rules.items():
-                # Add bidirectional connections
-                graph[agent_name].add(target_agent)
-                if target_agent in graph:
+
+            for target_agent in transition_rules.values():
+                # Add bidirectional connections to known agents only
+                if target_agent in graph and target_agent != agent_name:
+                    graph[agent_name].add(target_agent)
                     graph[target_agent].add(agent_name)
-        
+
         # Add parent-child relationships
         for agent in self.agents_config['agents']:
             agent_name = agent['agent_name']
             parent_agent = agent.get('parent_agent')
-            
+
             if parent_agent and parent_agent in graph:
                 # Add bidirectional parent-child connection
                 graph[agent_name].add(parent_agent)
                 graph[parent_agent].add(agent_name)
-        
+
         return graph
-    
+
+    def precompute_all(self) -> None:
+        """Compute the routing rows towards every agent"""
+        for target_index in range(len(self._agent_names)):
+            self._routing_row(target_index)
+
+    def _routing_row(self, target_index: int) -> array:
+        """
+        Get the next-hop row towards a target, computing it with one BFS if needed
+
+        Since the graph is bidirectional, a BFS outward from the target gives every
+        agent's parent in the BFS tree, which is its next hop towards the target.
+        """
+        row = self._next_hop_rows.get(target_index)
+        if row is not None:
+            return row
+
+        size = len(self._agent_names)
+        unreachable = self._unreachable
+        next_hops = array(self._typecode, [unreachable]) * size
+        distances = array(self._typecode, [unreachable]) * size
+        next_hops[target_index] = target_index
+        distances[target_index] = 0
+
+        queue = deque([target_index])
+        while queue:
+            current = queue.popleft()
+            next_distance = distances[current] + 1
+            for neighbor in self._neighbors[current]:
+                if distances[neighbor] == unreachable:
+                    distances[neighbor] = next_distance
+                    next_hops[neighbor] = current
+                    queue.append(neighbor)
+
+        self._distance_rows[target_index] = distances
+        self._next_hop_rows[target_index] = next_hops
+        return next_hops
+
     def find_path(self, start_agent: str, target_agent: str) -> Optional[List[str]]:
         """
-        Find the shortest path between two agents using BFS
-        
+        Find the shortest path between two agents using the next-hop table
+
         Args:
             start_agent: Name of the starting agent
             target_agent: Name of the target agent
-            
+
         Returns:
             List of agent names representing the path, or None if no path exists
         """
-        if start_agent not in self.graph or target_agent not in self.graph:
+        start_index = self._agent_index.get(start_agent)
+        target_index = self._agent_index.get(target_agent)
+        if start_index is None or target_index is None:
             return None
-            
-        if start_agent == target_agent:
+
+        if start_index == target_index:
             return [start_agent]
-        
-        # BFS to find shortest path
-        queue = deque([(start_agent, [start_agent])])
-        visited = {start_agent}
-        
-        while queue:
-            current_agent, path = queue.popleft()
-            
-            # Check all connected agents
-            for neighbor in self.graph[current_agent]:
-                if neighbor == target_agent:
-                    return path + [neighbor]
-                
-                if neighbor not in visited:
-                    visited.add(neighbor)
-                    queue.append((neighbor, path + [neighbor]))
-        
-        return None  # No path found
-    
+
+        next_hops = self._routing_row(target_index)
+        if next_hops[start_index] == self._unreachable:
+            return None  # No path found
+
+        path = [start_agent]
+        current = start_index
+        while current != target_index:
+            current = next_hops[current]
+            path.append(self._agent_names[current])
+        return path
+
+    def get_next_hop(self, start_agent: str, target_agent: str) -> Optional[str]:
+        """
+        Get the next agent on the shortest path towards a target
+
+        Args:
+            start_agent: Name of the starting agent
+            target_agent: Name of the target agent
+
+        Returns:
+            Name of the next agent, the start agent if it is the target, or None if unreachable
+        """
+        start_index = self._agent_index.get(start_agent)
+        target_index = self._agent_index.get(target_agent)
+        if start_index is None or target_index is None:
+            return None
+        next_hop = self._routing_row(target_index)[start_index]
+        return None if next_hop == self._unreachable else self._agent_names[next_hop]
+
+    def get_distance(self, start_agent: str, target_agent: str) -> Optional[int]:
+        """
+        Get the number of hops on the shortest path between two agents
+
+        Args:
+            start_agent: Name of the starting agent
+            target_agent: Name of the target agent
+
+        Returns:
+            Hop count, or None if no path exists
+        """
+        start_index = self._agent_index.get(start_agent)
+        target_index = self._agent_index.get(target_agent)
+        if start_index is None or target_index is None:
+            return None
+        self._routing_row(target_index)
+        distance = self._distance_rows[target_index][start_index]
+        return None if distance == self._unreachable else distance
+
     def get_direct_connections(self, agent_name: str) -> Set[str]:
         """
         Get all agents directly connected to the given agent
-        
+
         Args:
             agent_name: Name of the agent
-            
+
         Returns:
             Set of directly connected agent names
         """
         return self.graph.get(agent_name, set()).copy()
-    
+
     def is_reachable(self, start_agent: str, target_agent: str) -> bool:
         """
         Check if target agent is reachable from start agent
-        
+
         Args:
             start_agent: Name of the starting agent
             target_agent: Name of the target agent
-            
+
         Returns:
             True if target is reachable, False otherwise
         """
-        return self.find_path(start_agent, target_agent) is not None
-    
+        return self.get_distance(start_agent, target_agent) is not None
+
     def get_path_description(self, path: List[str]) -> str:
         """
         Get a human-readable description of a path
-        
+
         Args:
             path: List of agent names representing the path
-            
+
         Returns:
             String description of the path
         """
         if not path:
             return "No path"
-        
+
         if len(path) == 1:
             return f"Already at {path[0]}"
-        
+
         return " → ".join(path)
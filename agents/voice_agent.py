@@ -1,23 +1,75 @@
 import os
-import requests
 import json
+import logging
 import time
-from dynamic_graph_generator import DynamicGraphStructureGenerator
+from config_registry import load_agent_config
+from http_pool import get_shared_client
+from backend_governor import DEFAULT_PRIORITY, get_backend_governor
+from backend_pool import BackendCall, BackendPool, get_backend_pool
+from hedging import get_hedge_policy
+from prompt_fingerprints import get_prompt_fingerprints
+from metrics import BACKEND_LATENCY, FIRST_TOKEN_LATENCY, QUEUE_WAIT, REQUEST_ERRORS
+from async_utils import iterate_in_thread
+from response_cache import ResponseCache, get_response_cache
+from tool_registry import get_tool_registry, merge_tool_call_delta
+from context_window import DEFAULT_TOKEN_BUDGET
+
+logger = logging.getLogger(__name__)
+
+# Appended to an agent's own prompt when it handles a request transferred from another agent
+TRANSFER_INSTRUCTIONS = """
+
+TRANSITION CONTEXT: You have received a transferred request that you are specifically designed to handle. 
+The user's query is the transferred request below.
+
+IMPORTANT INSTRUCTIONS:
+- Handle this request using your specialized knowledge and tools
+- Provide a direct, helpful response to address the user's specific needs
+- Once you have completed your task (e.g., confirmed a booking, answered a question), you may redirect the user back to reception or feedback for additional assistance
+- If your task is complete and the user needs general assistance, use: TRANSITION_TO: reception_agent
+- If your task is complete and the user wants to provide feedback, use: TRANSITION_TO: feedback_agent
+- Only transition after you have fully completed your assigned task"""
 
 class ConversationalAgent:
-    def __init__(self, agent_name, agent_tools=None, agent_system_prompt="", temperature=0.7, agent_tool_prompt=""):
+    def __init__(self, agent_name, agent_tools=None, agent_system_prompt="", temperature=0.7, agent_tool_prompt="",
+                 http_client=None, graph_structure_prompt=None, response_cache=None, context_token_budget=None,
+                 priority=DEFAULT_PRIORITY, governor=None, backend_pool=None, hedging=None, tool_registry=None):
         self._agent_name = agent_name
         self._agent_tools = agent_tools or []
+        # Tool implementations shared by all agents unless a registry is injected; when tool execution is
+        # enabled the tool schemas are sent with every request and the returned tool calls executed
+        self._tool_registry = tool_registry or get_tool_registry()
+        self._tools_enabled = self._tool_registry.enabled and bool(self._agent_tools)
         
-        # Generate dynamic graph structure from config
-        generator = DynamicGraphStructureGenerator("agent_config.json")
-        graph_structure = generator.generate_graph_structure_prompt()
+        # Graph structure is rendered once per config; use the shared compiled config unless one is injected
+        if graph_structure_prompt is None:
+            graph_structure_prompt = load_agent_config().graph_structure_prompt
         
-        self._agent_system_prompt = agent_system_prompt + graph_structure
+        # Both prompts are fixed per agent, so every request starts with the same bytes (backend prefix caching)
+        tool_prompt = f"\n\n{agent_tool_prompt}" if agent_tool_prompt and self._tools_enabled else ""
+        self._agent_system_prompt = agent_system_prompt + tool_prompt + graph_structure_prompt
+        self._transfer_system_prompt = agent_system_prompt + tool_prompt + TRANSFER_INSTRUCTIONS
         self._temperature = temperature
         self._agent_tool_prompt = agent_tool_prompt
-        self._ngrok_url = os.environ.get("NGROK_SERVER_URL", "https://d2c6-35-225-158-177.ngrok-free.app")
-        self._model_name = "Qwen/Qwen2.5-7B-Instruct"
+        # Inference replicas shared by all agents unless a pool is injected (see backend_pool)
+        self._backend_pool = backend_pool or get_backend_pool()
+        self._model_name = self._backend_pool.default_model
+        # Keep-alive connection pool shared by all agents unless one is injected
+        self._http_client = http_client or get_shared_client()
+        # Admission to the backend; higher-priority agents are served first when it is saturated
+        self._priority = priority
+        self._governor = governor or get_backend_governor()
+        # Records how much of each prompt the backend can serve from its prefix cache
+        self._prompt_fingerprints = get_prompt_fingerprints()
+        # Optional hedging of slow calls, configured by the agent's "hedging" block
+        self._hedge_policy = get_hedge_policy() if (hedging or {}).get("enabled", False) else None
+        # Optional completion cache, configured by the agent's "response_cache" block
+        cache_settings = response_cache or {}
+        self._response_cache = get_response_cache() if cache_settings.get("enabled", False) else None
+        self._response_cache_ttl = cache_settings.get("ttl_seconds")
+        # Estimated tokens of conversation history (beyond the system prompt) sent per request
+        self._context_token_budget = context_token_budget or int(
+            os.environ.get("CONTEXT_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET))
 
     def get_name(self):
         return self._agent_name
@@ -28,45 +80,346 @@ class ConversationalAgent:
     def get_system_message(self):
         return self._agent_system_prompt
 
+    def get_transfer_system_message(self):
+        return self._transfer_system_prompt
+
     def get_tools(self):
         return self._agent_tools
 
+    def get_context_token_budget(self):
+        return self._context_token_budget
+
+    def get_priority(self):
+        return self._priority
+
     def get_tools_with_impl(self):
-        return {tool['function']['name']: None for tool in self._agent_tools}
+        return {tool['function']['name']: self._tool_registry.get(tool['function']['name'])
+                for tool in self._agent_tools}
+
+    def _cache_key(self, payload):
+        if self._response_cache is None:
+            return None
+        # The leading system prompt is hashed on its own; later system messages (summary, context) are part of the messages
+        system_message, messages = payload["messages"][0]["content"], payload["messages"][1:]
+        return ResponseCache.make_key(payload["model"], system_message, messages, self._temperature)
+
+    def _with_tool_results(self, payload, content, tool_calls, rounds):
+        """
+        Execute a response's tool calls and build the follow-up request carrying their results
+
+        Args:
+            payload: Request that produced the tool calls
+            content: Text of the response that made the calls
+            tool_calls: The response's tool calls
+            rounds: Tool rounds of the agent response so far, including this one
+
+        Returns:
+            The follow-up payload; after the last allowed tool round it no longer offers tools,
+            so the backend has to answer in text
+        """
+        results = self._tool_registry.execute(self._agent_name, tool_calls)
+        messages = payload["messages"] + [{"role": "assistant", "content": content or None,
+                                           "tool_calls": tool_calls}] + results
+        follow_up = dict(payload, messages=messages)
+        if rounds >= self._tool_registry.max_rounds:
+            follow_up.pop("tools", None)
+        return follow_up
+
+    def _only_idempotent_tools(self, tool_calls):
+        """Whether a response built on these tool calls may be cached"""
+        return all(self._tool_registry.is_idempotent(call["function"]["name"]) for call in tool_calls)
 
     def send_request(self, user_message, custom_system_message=None):
+        payload = self._build_payload(self._request_messages(user_message, custom_system_message))
+        cache_key = self._cache_key(payload)
+        if cache_key:
+            cached = self._response_cache.lookup(self._agent_name, cache_key)
+            if cached is not None:
+                return cached
+        self._prompt_fingerprints.record(self._agent_name, payload["messages"])
+        parts = []
+        cacheable = True
+        rounds = 0
+        while True:
+            tool_calls = []
+            content, error = self._request_completion(payload, tool_calls)
+            if error is not None:
+                return f"[Error contacting backend: {error}]"
+            parts.append(content)
+            # Tool calls are executed and their results sent back until the agent answers in text
+            if not tool_calls or "tools" not in payload:
+                break
+            cacheable = cacheable and self._only_idempotent_tools(tool_calls)
+            rounds += 1
+            payload = self._with_tool_results(payload, content, tool_calls, rounds)
+        content = "".join(parts)
+        if cache_key and content and cacheable:
+            self._response_cache.put(cache_key, content, self._response_cache_ttl)
+        return content
+
+    def _request_completion(self, payload, tool_calls):
+        """
+        Run one non-streamed backend call under a governor slot
+
+        Args:
+            payload: Request payload
+            tool_calls: List the response's tool calls are added to
+
+        Returns:
+            Tuple of (content, None) on success or (None, error) if the call failed
+        """
+        # Raises BackendOverloaded if no backend slot frees up within the queueing deadline
+        with self._governor.slot(self._agent_name, self._priority) as waited:
+            QUEUE_WAIT.observe(waited, (self._agent_name,))
+            start_time = time.time()
+            parts = []
+            try:
+                for item in self._run_call(self._request_call, payload, "response"):
+                    if isinstance(item, str):
+                        parts.append(item)
+                    else:
+                        merge_tool_call_delta(tool_calls, item)
+            except Exception as e:
+                elapsed = time.time() - start_time
+                logger.warning("Backend request failed", extra={
+                    "agent": self._agent_name, "elapsed_ms": round(elapsed * 1000, 1), "error": str(e)})
+                REQUEST_ERRORS.inc((self._agent_name,))
+                return None, e
+            elapsed = time.time() - start_time
+            logger.info("Backend request finished", extra={
+                "agent": self._agent_name, "elapsed_ms": round(elapsed * 1000, 1),
+                "queue_wait_ms": round(waited * 1000, 1), "tool_calls": len(tool_calls)})
+            BACKEND_LATENCY.observe(elapsed, (self._agent_name,))
+            if self._hedge_policy is not None:
+                self._hedge_policy.record_latency(self._agent_name, "response", elapsed)
+            return "".join(parts), None
+
+    def _post_to_backend(self, payload, call, stream=False):
+        """
+        Send a completion request to a backend picked by the pool
+
+        A backend that cannot serve the request is counted as failed and the
+        next one is tried, so a dead replica costs no user-visible error while
+        others are up. The backend and response are stored on the call, which
+        must be finished by the caller.
+        """
+        attempts = len(self._backend_pool.backends)
+        exclude = call.exclude
+        for attempt in range(attempts):
+            backend = self._backend_pool.acquire(exclude)
+            response = None
+            try:
+                response = self._http_client.post(backend.url + "/v1/chat/completions",
+                                                  json=dict(payload, model=backend.model), stream=stream)
+                response.raise_for_status()
+            except Exception as e:
+                if response is not None:
+                    response.close()
+                backend_failure = not call.cancelled and BackendPool.is_backend_failure(e)
+                self._backend_pool.release(backend, success=not backend_failure, error=str(e))
+                if not backend_failure or attempt == attempts - 1:
+                    raise
+                exclude = backend
+                continue
+            call.backend, call.response = backend, response
+            if call.cancelled:
+                response.close()
+            return
+
+    def _request_call(self, payload, call):
+        """Run one non-streamed completion on a pooled backend and yield its content, then its tool calls"""
+        error = None
+        try:
+            self._post_to_backend(payload, call)
+            message = call.response.json()["choices"][0]["message"]
+            call.first_token_time = time.monotonic()
+            yield message.get("content") or ""
+            for index, tool_call in enumerate(message.get("tool_calls") or ()):
+                yield dict(tool_call, index=index)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            call.finish(self._backend_pool, error)
+
+    def _stream_call(self, payload, call):
+        """Run one streamed completion on a pooled backend and yield its content deltas and tool call fragments"""
+        error = None
+        try:
+            self._post_to_backend(payload, call, stream=True)
+            for line in call.response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or [{}]
+                delta = choices[0].get("delta") or {}
+                content, tool_calls = delta.get("content"), delta.get("tool_calls")
+                if (content or tool_calls) and call.first_token_time is None:
+                    call.first_token_time = time.monotonic()
+                if content:
+                    yield content
+                for tool_call in tool_calls or ():
+                    yield tool_call
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            call.finish(self._backend_pool, error)
+
+    def _run_call(self, run, payload, latency_kind):
+        """
+        Run a backend call, hedging it when this agent opted in and the call is slower than usual
+
+        Args:
+            run: _request_call or _stream_call
+            payload: Request payload
+            latency_kind: "response" or "first_token", selecting the latency threshold
+
+        Returns:
+            Iterator over the call's content
+        """
+        threshold = None
+        if self._hedge_policy is not None:
+            threshold = self._hedge_policy.threshold(self._agent_name, latency_kind)
+        if threshold is None:
+            return run(payload, BackendCall())
+
+        calls = []
+
+        def start_attempt(index):
+            call = BackendCall(exclude=calls[0].backend if calls else None)
+            calls.append(call)
+            if index == 0:
+                return run(payload, call)
+            return self._governed(run(payload, call))
+
+        def cancel_attempt(index):
+            if index < len(calls):
+                calls[index].cancel()
+
+        def acquire_capacity():
+            # A hedge never queues: it only goes out if a backend slot is free right now
+            return self._governor.try_acquire(self._agent_name, self._priority)
+
+        return self._hedge_policy.iterate(start_attempt, cancel_attempt, threshold, acquire_capacity)
+
+    def _governed(self, items):
+        """Yield from a hedge call and give its backend slot back to the governor when it ends"""
+        try:
+            yield from items
+        finally:
+            self._governor.release()
+
+    def _request_messages(self, user_message, custom_system_message=None):
         system_message = custom_system_message if custom_system_message else self._agent_system_prompt
-        
+        return [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": user_message}
+        ]
+
+    def _build_payload(self, messages):
+        # The agent's own system prompt is used when the caller does not provide one
+        if not messages or messages[0]["role"] != "system":
+            messages = [{"role": "system", "content": self._agent_system_prompt}] + list(messages)
         payload = {
             "model": self._model_name,
-            "messages": [
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": user_message}
-            ]
+            "messages": messages
         }
-        url = self._ngrok_url.rstrip('/') + "/v1/chat/completions"
+        if self._tools_enabled:
+            payload["tools"] = self._agent_tools
+        return payload
+
+    def stream_request(self, user_message, custom_system_message=None):
+        """Request a streamed completion for a single user message"""
+        yield from self.stream_messages(self._request_messages(user_message, custom_system_message))
+
+    def stream_messages(self, messages):
+        """Request a streamed completion for a message list and yield content deltas as they arrive"""
+        payload = self._build_payload(messages)
+        cache_key = self._cache_key(payload)
+        if cache_key:
+            cached = self._response_cache.lookup(self._agent_name, cache_key)
+            if cached is not None:
+                # Served without contacting the backend
+                yield cached
+                return
+        self._prompt_fingerprints.record(self._agent_name, payload["messages"])
+        payload["stream"] = True
+        chunks = []
+        cacheable = True
+        rounds = 0
+        while True:
+            round_chunks = []
+            tool_calls = []
+            completed = yield from self._stream_completion(payload, round_chunks, tool_calls)
+            if not completed:
+                return
+            chunks.extend(round_chunks)
+            # Tool calls are executed (off the governor slot) and their results streamed on by the next call
+            if not tool_calls or "tools" not in payload:
+                break
+            cacheable = cacheable and self._only_idempotent_tools(tool_calls)
+            rounds += 1
+            payload = self._with_tool_results(payload, "".join(round_chunks), tool_calls, rounds)
+        # Only complete streams are cached; a closed or failed stream never gets here
+        if cache_key and chunks and cacheable:
+            self._response_cache.put(cache_key, "".join(chunks), self._response_cache_ttl)
+
+    def _stream_completion(self, payload, chunks, tool_calls):
+        """
+        Run one streamed backend call under a governor slot and yield its content deltas
+
+        Args:
+            payload: Request payload
+            chunks: List the yielded deltas are also appended to
+            tool_calls: List the response's tool calls are assembled in
+
+        Returns:
+            bool: Whether the call completed (an error message has been yielded otherwise)
+        """
+        # Raises BackendOverloaded if no backend slot frees up within the queueing deadline
+        waited = self._governor.acquire(self._agent_name, self._priority)
+        QUEUE_WAIT.observe(waited, (self._agent_name,))
         start_time = time.time()
+        first_token_time = None
+        deltas = None
         try:
-            response = requests.post(url, json=payload, timeout=30)
-            response.raise_for_status()
-            data = response.json()
-            elapsed = time.time() - start_time
-            print(f"[Request-Response Time: {elapsed:.2f} seconds]")
-            return data["choices"][0]["message"]["content"]
+            deltas = self._run_call(self._stream_call, payload, "first_token")
+            for delta in deltas:
+                if first_token_time is None:
+                    first_token_time = time.time()
+                    FIRST_TOKEN_LATENCY.observe(first_token_time - start_time, (self._agent_name,))
+                    if self._hedge_policy is not None:
+                        self._hedge_policy.record_latency(self._agent_name, "first_token", first_token_time - start_time)
+                if not isinstance(delta, str):
+                    merge_tool_call_delta(tool_calls, delta)
+                    continue
+                chunks.append(delta)
+                yield delta
+            return True
         except Exception as e:
+            logger.warning("Backend stream failed", extra={"agent": self._agent_name, "error": str(e)})
+            REQUEST_ERRORS.inc((self._agent_name,))
+            yield f"[Error contacting backend: {e}]"
+            return False
+        finally:
+            # Closing an unfinished call drops the connection so the backend stops generating
+            if deltas is not None:
+                deltas.close()
             elapsed = time.time() - start_time
-            print(f"[Request-Response Time: {elapsed:.2f} seconds]")
-            return f"[Error contacting backend: {e}]"
+            self._governor.release(elapsed)
+            logger.info("Backend stream finished", extra={
+                "agent": self._agent_name, "elapsed_ms": round(elapsed * 1000, 1),
+                "ttft_ms": round((first_token_time - start_time) * 1000, 1) if first_token_time else None,
+                "queue_wait_ms": round(waited * 1000, 1)})
+            BACKEND_LATENCY.observe(elapsed, (self._agent_name,))
 
     def execute_with_streaming(self, messages):
-        system_message = None
-        user_message = ""
-        
-        for msg in messages:
-            if msg["role"] == "system":
-                system_message = msg["content"]
-            elif msg["role"] == "user":
-                user_message = msg["content"]
-        
-        response = self.send_request(user_message, system_message)
-        yield response
+        yield from self.stream_messages(messages)
+
+    async def aexecute_with_streaming(self, messages):
+        """Async counterpart of execute_with_streaming; the backend stream is read off the event loop"""
+        async for delta in iterate_in_thread(self.stream_messages, messages):
+            yield delta
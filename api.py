@@ -1,14 +1,30 @@
 from fastapi import FastAPI, HTTPException, Request, Query
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 from multi_graph_agent import ConversationAgentGraph
+from session_manager import SessionManager
+from session_store import SessionConflict, get_session_store
+from config_reloader import ConfigReloader
+from async_utils import run_blocking
+from http_pool import get_shared_client
+from backend_governor import BackendOverloaded, get_backend_governor
+from backend_pool import get_backend_pool
+from hedging import get_hedge_policy
+from prompt_fingerprints import get_prompt_fingerprints
+from response_cache import get_response_cache
+from tool_registry import get_tool_registry
+from metrics import CHAT_TURNS_IN_PROGRESS, REGISTRY
+from config_registry import load_agent_config
+from structured_logging import configure_logging, get_logging_stats, log_context, shutdown_logging
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from stream_events import EVENT_DONE, EVENT_ERROR, format_sse
 import logging
+import os
 import time
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Structured JSON logs, formatted and written by a background thread (see structured_logging)
+configure_logging(load_agent_config().raw.get("logging"))
 logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Multi-Agent Office Assistant API")
@@ -22,8 +38,59 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
-# Initialize the agent graph
-agent_graph = ConversationAgentGraph.create_agent_graph()
+# Initialize the shared agent graph topology and the per-session state manager
+session_manager = SessionManager(
+    ConversationAgentGraph.create_agent_graph(),
+    max_sessions=int(os.environ.get("SESSION_MAX_COUNT", "1000")),
+    idle_ttl_seconds=float(os.environ.get("SESSION_IDLE_TTL_SECONDS", "1800")),
+    max_memory_bytes=int(float(os.environ.get("SESSION_MAX_MEMORY_MB", "256")) * 1024 * 1024),
+    store=get_session_store()
+)
+
+# Gauges owned by other components are read when /metrics is scraped
+REGISTRY.gauge("chat_active_sessions", "Sessions held in memory").set_function(
+    lambda: {(): session_manager.get_stats()["active_sessions"]})
+REGISTRY.gauge("llm_backend_in_flight", "Backend calls holding a governor slot").set_function(
+    lambda: {(): get_backend_governor().get_stats()["in_flight"]})
+REGISTRY.gauge("llm_backend_queue_depth", "Backend calls waiting for a governor slot").set_function(
+    lambda: {(): get_backend_governor().get_stats()["queue_depth"]})
+REGISTRY.gauge("llm_backend_outstanding", "Outstanding calls per backend replica", ("backend",)).set_function(
+    lambda: {(backend["url"],): backend["outstanding"] for backend in get_backend_pool().get_stats()["backends"]})
+
+# Rebuilds the graph when agent_config.json changes ("watch") or on POST /admin/reload
+config_reloader = ConfigReloader(session_manager)
+
+@app.on_event("startup")
+async def start_config_watcher():
+    if os.environ.get("CONFIG_RELOAD_MODE", "off").lower() == "watch":
+        config_reloader.start_watching(float(os.environ.get("CONFIG_RELOAD_INTERVAL_SECONDS", "2")))
+
+@app.on_event("shutdown")
+async def stop_config_watcher():
+    config_reloader.stop_watching()
+
+@app.on_event("startup")
+async def start_backend_health_checks():
+    interval = float(os.environ.get("LLM_HEALTH_CHECK_INTERVAL_SECONDS", "10"))
+    if interval > 0:
+        get_backend_pool().start_health_checks(interval)
+
+@app.on_event("shutdown")
+async def stop_backend_health_checks():
+    get_backend_pool().stop_health_checks()
+
+@app.on_event("shutdown")
+async def flush_session_store():
+    if session_manager.store is not None:
+        session_manager.store.close()
+
+@app.on_event("shutdown")
+async def stop_tool_workers():
+    get_tool_registry().close()
+
+@app.on_event("shutdown")
+async def flush_logs():
+    shutdown_logging()
 
 class Message(BaseModel):
     content: str
@@ -33,6 +100,8 @@ class Response(BaseModel):
     content: str
     agent_name: str
     transition_path: Optional[List[str]] = None
+    session_id: Optional[str] = None
+    turn: Optional[Dict] = None
 
 def clean_response(response: str) -> str:
     """Clean and format the response text"""
@@ -55,30 +124,60 @@ def clean_response(response: str) -> str:
     
     return response
 
-async def process_chat_message(content: str) -> Response:
-    """Process a chat message and return the response"""
+async def process_chat_message(content: str, session_id: Optional[str] = None) -> Response:
+    """Process a chat message within a session and return the response"""
+    CHAT_TURNS_IN_PROGRESS.inc()
+    try:
+        with log_context(session_id):
+            return await _process_chat_turn(content, session_id)
+    finally:
+        CHAT_TURNS_IN_PROGRESS.dec()
+
+async def _process_chat_turn(content: str, session_id: Optional[str]) -> Response:
+    """Run one chat turn for process_chat_message"""
     try:
-        # Process the message through the agent graph
-        response_chunks = []
-        for chunk in agent_graph.process_message(content):
-            response_chunks.append(chunk)
+        # Turns of one session run one at a time, from loading the session to saving it
+        async with session_manager.turn_lock(session_id):
+            agent_graph = await session_manager.aget_session(session_id)
+            
+            # Process the message through the session's agent graph
+            response_chunks = []
+            try:
+                async for chunk in agent_graph.aprocess_message(content):
+                    response_chunks.append(chunk)
+            except Exception:
+                # Save what the failed turn recorded (e.g. the user's message), as a streamed turn does
+                await session_manager.aend_turn(session_id)
+                raise
+            await session_manager.aend_turn(session_id)
+            
+            # Get current agent, path and turn accounting before the next turn of the session can start
+            current_agent = agent_graph.get_current_agent().get_name()
+            agent_path = agent_graph.get_agent_path()
+            turn = agent_graph.get_turn_stats()
         
         # Combine chunks and clean the response
         full_response = "".join(response_chunks)
         cleaned_response = clean_response(full_response)
-          # Get current agent and path
-        current_agent = agent_graph.get_current_agent().get_name()
-        agent_path = agent_graph.get_agent_path()
         
         return Response(
             content=cleaned_response,
             agent_name=current_agent,
-            transition_path=agent_path
+            transition_path=agent_path,
+            session_id=session_id,
+            turn=turn
         )
+    except BackendOverloaded as e:
+        logger.warning("Rejected chat turn", extra={"reason": e.reason, "retry_after_s": e.retry_after})
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": str(max(1, round(e.retry_after)))})
+    except SessionConflict as e:
+        # Another worker ran a turn of this session meanwhile; this turn was not saved
+        logger.warning("Chat turn conflicted with another worker", extra={"session_id": e.session_id})
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         # Handle API request errors with consistent logging
-        error_message = f"Error in process_chat_message: {str(e)}"
-        logger.error(error_message, exc_info=True)
+        logger.error("Chat turn failed", extra={"error": str(e)}, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/chat")
@@ -86,75 +185,222 @@ async def process_chat_message(content: str) -> Response:
 async def chat_post(request: Request):
     """Handle POST requests to the chat endpoint"""
     try:
-        logger.debug(f"Received POST request: {request.method} {request.url}")
+        logger.debug("Received chat request", extra={"method": request.method, "url": str(request.url)})
         body = await request.json()
-        logger.debug(f"Request body: {body}")
         message = Message(**body)
-        return await process_chat_message(message.content)
+        return await process_chat_message(message.content, message.session_id)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error in POST chat: {str(e)}", exc_info=True)
+        logger.error("POST chat request failed", extra={"error": str(e)}, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/chat")
 @app.get("/chat/")
-async def chat_get(message: str = Query(..., description="The message to process")):
+async def chat_get(message: str = Query(..., description="The message to process"),
+                   session_id: Optional[str] = Query(None, description="Conversation session identifier")):
     """Handle GET requests to the chat endpoint"""
     try:
-        logger.debug(f"Received GET request with message: {message}")
-        return await process_chat_message(message)
+        logger.debug("Received chat request", extra={"method": "GET", "message_chars": len(message)})
+        return await process_chat_message(message, session_id)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error in GET chat: {str(e)}", exc_info=True)
+        logger.error("GET chat request failed", extra={"error": str(e)}, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+async def stream_chat_events(content: str, session_id: Optional[str] = None):
+    """Stream a chat turn as server-sent events: tokens, transitions, then a final done event"""
+    CHAT_TURNS_IN_PROGRESS.inc()
+    try:
+        # The session's turn lock is held until the streamed turn has been saved
+        async with session_manager.turn_lock(session_id):
+            saved = False
+            try:
+                agent_graph = await session_manager.aget_session(session_id)
+                with log_context(session_id):
+                    async for event in agent_graph.aprocess_events(content):
+                        yield format_sse(event)
+                # The turn is only done once its state is saved; a conflict is reported instead
+                saved = True
+                await session_manager.aend_turn(session_id)
+                yield format_sse({
+                    "type": EVENT_DONE,
+                    "agent_name": agent_graph.get_current_agent().get_name(),
+                    "transition_path": agent_graph.get_agent_path(),
+                    "session_id": session_id,
+                    "turn": agent_graph.get_turn_stats()
+                })
+            except BackendOverloaded as e:
+                logger.warning("Rejected streamed chat turn",
+                               extra={"reason": e.reason, "retry_after_s": e.retry_after})
+                yield format_sse({"type": EVENT_ERROR, "detail": str(e), "retry_after": e.retry_after})
+            except SessionConflict as e:
+                logger.warning("Chat turn conflicted with another worker", extra={"session_id": e.session_id})
+                yield format_sse({"type": EVENT_ERROR, "detail": str(e), "status": 409})
+            except Exception as e:
+                logger.error("Streamed chat turn failed", extra={"error": str(e)}, exc_info=True)
+                yield format_sse({"type": EVENT_ERROR, "detail": str(e)})
+            finally:
+                if not saved:
+                    # Keep what the failed or abandoned turn added (e.g. the user's message)
+                    try:
+                        await session_manager.aend_turn(session_id)
+                    except SessionConflict as e:
+                        logger.warning("Chat turn conflicted with another worker",
+                                       extra={"session_id": e.session_id})
+    finally:
+        CHAT_TURNS_IN_PROGRESS.dec()
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@app.post("/chat/stream")
+async def chat_stream_post(message: Message):
+    """Stream the response to a chat message as server-sent events"""
+    return StreamingResponse(stream_chat_events(message.content, message.session_id),
+                             media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.get("/chat/stream")
+async def chat_stream_get(message: str = Query(..., description="The message to process"),
+                          session_id: Optional[str] = Query(None, description="Conversation session identifier")):
+    """Stream the response to a chat message as server-sent events"""
+    return StreamingResponse(stream_chat_events(message, session_id),
+                             media_type="text/event-stream", headers=SSE_HEADERS)
+
 @app.get("/agents")
 @app.get("/agents/")
 async def get_agents():
     """Get list of all available agents"""
-    import json
-    with open('agent_config.json', 'r') as f:
-        config = json.load(f)
-    
-    agent_names = [agent['agent_name'] for agent in config['agents']]
     return {
-        "agents": agent_names
+        "agents": list(session_manager.template_graph.config.agent_names)
     }
 
 @app.get("/current-agent")
 @app.get("/current-agent/")
-async def get_current_agent():
-    """Get the currently active agent"""
+async def get_current_agent(session_id: Optional[str] = Query(None, description="Conversation session identifier")):
+    """Get the currently active agent of a session"""
+    agent_graph = await session_manager.apeek_session(session_id) or session_manager.template_graph
     return {
         "agent": agent_graph.get_current_agent().get_name()
     }
 
 @app.get("/transitions")
 @app.get("/transitions/")
-async def get_transitions():
-    """Get all transitions that have occurred"""
-    return {
-        "transitions": agent_graph.get_transitions()
-    }
+async def get_transitions(session_id: Optional[str] = Query(None, description="Conversation session identifier"),
+                          cursor: int = Query(0, ge=0, description="Sequence number to start from (next_cursor of the previous page)"),
+                          limit: int = Query(100, ge=1, le=1000, description="Maximum number of transitions to return")):
+    """Get one page of the transitions that have occurred in a session"""
+    agent_graph = await session_manager.apeek_session(session_id)
+    if agent_graph is None:
+        page = {"transitions": [], "next_cursor": cursor, "has_more": False, "dropped": 0}
+    else:
+        page = agent_graph.get_transitions_page(cursor, limit)
+    # The page is plain JSON types already; skip FastAPI's response model encoding
+    return JSONResponse(page)
 
 @app.get("/recent-transitions")
 @app.get("/recent-transitions/")
-async def get_recent_transitions(count: int = Query(5, description="Number of recent transitions to return")):
-    """Get recent transitions"""
+async def get_recent_transitions(count: int = Query(5, description="Number of recent transitions to return"),
+                                 session_id: Optional[str] = Query(None, description="Conversation session identifier")):
+    """Get recent transitions of a session"""
+    agent_graph = await session_manager.apeek_session(session_id)
+    return JSONResponse({
+        "transitions": agent_graph.get_recent_transitions(count) if agent_graph else []
+    })
+
+@app.get("/sessions")
+@app.get("/sessions/")
+async def get_sessions():
+    """Get session manager statistics"""
+    return session_manager.get_stats()
+
+@app.get("/response-cache")
+@app.get("/response-cache/")
+async def get_response_cache_stats():
+    """Get response cache size and hit/miss counters"""
+    return get_response_cache().get_stats()
+
+@app.get("/tools")
+@app.get("/tools/")
+async def get_tool_stats():
+    """Get the registered tools, tool call counters and tool result cache statistics"""
+    return get_tool_registry().get_stats()
+
+@app.post("/admin/reload")
+@app.post("/admin/reload/")
+async def reload_config(force: bool = Query(False, description="Rebuild even if the file is unchanged")):
+    """Rebuild the agent graph from agent_config.json and swap it in"""
+    try:
+        return await run_blocking(config_reloader.reload, force)
+    except (FileNotFoundError, ValueError, KeyError) as e:
+        logger.error("Config reload failed", extra={"error": str(e)}, exc_info=True)
+        raise HTTPException(status_code=400, detail=f"Config reload failed: {str(e)}")
+
+@app.get("/admin/reload")
+@app.get("/admin/reload/")
+async def get_reload_reports():
+    """Get the current topology version and recent reload reports"""
     return {
-        "transitions": agent_graph.get_recent_transitions(count)
+        "version": session_manager.version,
+        "reloads": config_reloader.get_reports()
     }
 
+@app.get("/http-pool")
+@app.get("/http-pool/")
+async def get_http_pool_stats():
+    """Get backend connection pool statistics"""
+    return get_shared_client().get_stats()
+
+@app.get("/backends")
+@app.get("/backends/")
+async def get_backends():
+    """Get per-backend load, latency and health"""
+    return get_backend_pool().get_stats()
+
+@app.get("/hedging")
+@app.get("/hedging/")
+async def get_hedging_stats():
+    """Get hedged call counts, budget use and per-agent latency thresholds"""
+    return get_hedge_policy().get_stats()
+
+@app.get("/prompt-fingerprints")
+@app.get("/prompt-fingerprints/")
+async def get_prompt_fingerprint_stats(agent: Optional[str] = Query(None, description="Only report this agent")):
+    """Get per-agent prompt prefix reuse, as seen by a backend with prefix caching"""
+    return get_prompt_fingerprints().get_stats(agent)
+
+@app.get("/backend-governor")
+@app.get("/backend-governor/")
+async def get_backend_governor_stats():
+    """Get backend admission limits, queue depth and wait time metrics"""
+    return get_backend_governor().get_stats()
+
+@app.get("/logging")
+@app.get("/logging/")
+async def get_logging_pipeline_stats():
+    """Get the log pipeline's level, sampling rates, queue depth and dropped records"""
+    return get_logging_stats()
+
+@app.get("/metrics")
+async def get_metrics():
+    """Get all metrics in the Prometheus text exposition format"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # Add error handlers
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
-    logger.error(f"HTTP Exception: {exc.detail}")
+    logger.error("HTTP exception", extra={"status": exc.status_code, "detail": exc.detail,
+                                         "method": request.method, "url": str(request.url)})
     return JSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail},
+        headers=exc.headers,
     )
 
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
-    logger.error(f"General Exception: {str(exc)}", exc_info=True)
+    logger.error("Unhandled exception", extra={"error": str(exc), "method": request.method, "url": str(request.url)},
+                 exc_info=True)
     return JSONResponse(
         status_code=500,
         content={"detail": str(exc)},
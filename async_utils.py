@@ -0,0 +1,120 @@
+"""
+Async Utilities Module
+
+This module bridges the blocking backend client and the asyncio request path:
+blocking calls run on a dedicated worker pool so they never stall the event
+loop, and async generators can still be consumed from synchronous code such
+as the CLI.
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncGenerator, Callable, Generator, Iterator, TypeVar
+
+T = TypeVar("T")
+
+_END_OF_STREAM = object()
+
+# Worker threads available for blocking backend calls across all sessions
+BACKEND_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("LLM_WORKER_THREADS", "64")),
+    thread_name_prefix="llm-backend"
+)
+
+
+async def run_blocking(func: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run a blocking function on the backend worker pool
+
+    Args:
+        func: The blocking callable
+        *args: Positional arguments for func
+        **kwargs: Keyword arguments for func
+
+    Returns:
+        The callable's result
+    """
+    loop = asyncio.get_running_loop()
+    # Carry context variables (e.g. the session and turn IDs used in logs) into the worker thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(BACKEND_EXECUTOR, functools.partial(context.run, func, *args, **kwargs))
+
+
+async def iterate_in_thread(gen_func: Callable[..., Iterator[T]], *args, **kwargs) -> AsyncGenerator[T, None]:
+    """
+    Consume a blocking generator on the backend worker pool as an async generator
+
+    Closing the async generator early stops the blocking generator at its next item.
+
+    Args:
+        gen_func: Function returning the blocking generator
+        *args: Positional arguments for gen_func
+        **kwargs: Keyword arguments for gen_func
+
+    Yields:
+        The items produced by the blocking generator
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    cancelled = threading.Event()
+
+    def publish(item, error=None) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (item, error))
+        except RuntimeError:
+            # The event loop has already been closed
+            cancelled.set()
+
+    def produce() -> None:
+        generator = gen_func(*args, **kwargs)
+        try:
+            for item in generator:
+                if cancelled.is_set():
+                    break
+                publish(item)
+        except BaseException as error:
+            publish(_END_OF_STREAM, error)
+            return
+        finally:
+            generator.close()
+        publish(_END_OF_STREAM)
+
+    loop.run_in_executor(BACKEND_EXECUTOR, contextvars.copy_context().run, produce)
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is _END_OF_STREAM:
+                if error is not None:
+                    raise error
+                break
+            yield item
+    finally:
+        cancelled.set()
+
+
+def iterate_sync(async_gen: AsyncGenerator[T, None]) -> Generator[T, None, None]:
+    """
+    Consume an async generator from synchronous code
+
+    Must not be called from a thread that is already running an event loop.
+
+    Args:
+        async_gen: The async generator to drive
+
+    Yields:
+        The items produced by async_gen
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(async_gen.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(async_gen.aclose())
+        loop.close()
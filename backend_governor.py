@@ -0,0 +1,293 @@
+"""
+Backend Governor Module
+
+This module limits how many requests are in flight to the LLM backend at
+once. Requests beyond the limit wait in a bounded priority queue, so
+higher-priority agents (e.g. emergency_agent) are admitted first when the
+backend is saturated. A request is rejected immediately when the queue is
+full or its estimated wait already exceeds the queueing deadline, instead
+of piling more load onto a backend that cannot serve it in time.
+"""
+
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from async_utils import BACKEND_EXECUTOR
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRIORITY = 0
+# Weight of the newest sample in the moving average of backend hold times
+HOLD_TIME_SMOOTHING = 0.2
+
+
+class BackendOverloaded(Exception):
+    """Raised when a backend request cannot be admitted before its queueing deadline"""
+
+    def __init__(self, message: str, reason: str, retry_after: float):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    """A request waiting for a backend slot"""
+
+    __slots__ = ("priority", "seq", "agent_name", "granted", "cancelled")
+
+    def __init__(self, priority: int, seq: int, agent_name: str):
+        self.priority = priority
+        self.seq = seq
+        self.agent_name = agent_name
+        self.granted = False
+        self.cancelled = False
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        # Highest priority first, then first come first served
+        return (-self.priority, self.seq) < (-other.priority, other.seq)
+
+
+class BackendGovernor:
+    """Admission control with a max-in-flight limit and a bounded priority queue"""
+
+    def __init__(self, max_in_flight: int = 16, max_queue: int = 48, queue_deadline: float = 10.0):
+        """
+        Initialize the governor
+
+        Args:
+            max_in_flight: Maximum backend requests running at once
+            max_queue: Maximum requests waiting for a slot; when full, a newcomer displaces the
+                most recent of the lowest-priority waiters below it, or is rejected
+            queue_deadline: Longest a request may wait for a slot, in seconds
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_deadline = queue_deadline
+        self._condition = threading.Condition()
+        self._queue: List[_Waiter] = []
+        self._queued = 0
+        self._in_flight = 0
+        self._seq = itertools.count()
+        self._hold_time: Optional[float] = None
+
+        self.admitted = 0
+        self.queued_total = 0
+        self.max_queue_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.rejections: Dict[str, int] = {"queue_full": 0, "deadline_estimate": 0, "timeout": 0, "displaced": 0}
+        self._lanes: Dict[int, Dict] = {}
+
+    def acquire(self, agent_name: str, priority: int = DEFAULT_PRIORITY) -> float:
+        """
+        Wait for a backend slot
+
+        Args:
+            agent_name: Agent making the request (for metrics)
+            priority: Higher values are admitted first
+
+        Returns:
+            float: Seconds spent waiting
+
+        Raises:
+            BackendOverloaded: If the request cannot be admitted within the queueing deadline
+        """
+        start = time.monotonic()
+        with self._condition:
+            if self._in_flight < self.max_in_flight and not self._queued:
+                self._in_flight += 1
+                self._record_admission(priority, 0.0)
+                return 0.0
+
+            estimate = self._estimate_wait(priority)
+            if estimate is not None and estimate > self.queue_deadline:
+                self._reject(priority, "deadline_estimate", estimate)
+            if self._queued >= self.max_queue and not self._displace(priority):
+                self._reject(priority, "queue_full", estimate)
+
+            waiter = _Waiter(priority, next(self._seq), agent_name)
+            heapq.heappush(self._queue, waiter)
+            self._queued += 1
+            self.queued_total += 1
+            self.max_queue_depth = max(self.max_queue_depth, self._queued)
+
+            deadline = start + self.queue_deadline
+            while not waiter.granted and not waiter.cancelled:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    waiter.cancelled = True
+                    self._queued -= 1
+                    self._reject(priority, "timeout", self.queue_deadline)
+                self._condition.wait(remaining)
+
+            if waiter.cancelled:
+                # Displaced by a higher-priority request while the queue was full
+                self._reject(priority, "displaced", estimate)
+
+            waited = time.monotonic() - start
+            self._record_admission(priority, waited)
+            return waited
+
+    def try_acquire(self, agent_name: str, priority: int = DEFAULT_PRIORITY) -> bool:
+        """
+        Take a backend slot only if one is free without queueing
+
+        Args:
+            agent_name: Agent making the request (for metrics)
+            priority: Priority lane the request is counted in
+
+        Returns:
+            bool: Whether a slot was taken; release it with release()
+        """
+        with self._condition:
+            if self._in_flight >= self.max_in_flight or self._queued:
+                return False
+            self._in_flight += 1
+            self._record_admission(priority, 0.0)
+            return True
+
+    def release(self, hold_time: Optional[float] = None) -> None:
+        """
+        Return a backend slot and admit the next waiter
+
+        Args:
+            hold_time: Seconds the slot was held, used to estimate queueing delays
+        """
+        with self._condition:
+            self._in_flight -= 1
+            if hold_time is not None:
+                self._hold_time = hold_time if self._hold_time is None else (
+                    HOLD_TIME_SMOOTHING * hold_time + (1 - HOLD_TIME_SMOOTHING) * self._hold_time)
+            while self._queue and self._in_flight < self.max_in_flight:
+                waiter = heapq.heappop(self._queue)
+                if waiter.cancelled:
+                    continue
+                waiter.granted = True
+                self._queued -= 1
+                self._in_flight += 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, agent_name: str, priority: int = DEFAULT_PRIORITY) -> Iterator[float]:
+        """
+        Hold a backend slot for the duration of a with-block
+
+        Args:
+            agent_name: Agent making the request
+            priority: Higher values are admitted first
+
+        Yields:
+            float: Seconds spent waiting for the slot
+        """
+        waited = self.acquire(agent_name, priority)
+        start = time.monotonic()
+        try:
+            yield waited
+        finally:
+            self.release(time.monotonic() - start)
+
+    def _estimate_wait(self, priority: int) -> Optional[float]:
+        """Estimate how long a new request of this priority would wait, once hold times are known"""
+        if self._hold_time is None:
+            return None
+        ahead = sum(1 for waiter in self._queue if not waiter.cancelled and waiter.priority >= priority)
+        return (ahead + 1) / self.max_in_flight * self._hold_time
+
+    def _displace(self, priority: int) -> bool:
+        """Cancel the most recent of the lowest-priority waiters to make room; return whether one was found"""
+        victim = None
+        for waiter in self._queue:
+            if not waiter.cancelled and waiter.priority < priority and (
+                    victim is None or (waiter.priority, -waiter.seq) < (victim.priority, -victim.seq)):
+                victim = waiter
+        if victim is None:
+            return False
+        victim.cancelled = True
+        self._queued -= 1
+        self._condition.notify_all()
+        return True
+
+    def _reject(self, priority: int, reason: str, estimate: Optional[float]) -> None:
+        """Count a rejection and raise BackendOverloaded"""
+        self.rejections[reason] += 1
+        self._lane(priority)["rejected"] += 1
+        retry_after = estimate if estimate is not None else (self._hold_time or 1.0)
+        raise BackendOverloaded(
+            f"Backend overloaded ({reason}): {self._in_flight} in flight, {self._queued} queued",
+            reason, retry_after)
+
+    def _record_admission(self, priority: int, waited: float) -> None:
+        """Update the wait-time metrics for an admitted request"""
+        self.admitted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        lane = self._lane(priority)
+        lane["admitted"] += 1
+        lane["total_wait"] += waited
+
+    def _lane(self, priority: int) -> Dict:
+        """Get the counters of one priority level"""
+        lane = self._lanes.get(priority)
+        if lane is None:
+            lane = self._lanes[priority] = {"admitted": 0, "rejected": 0, "total_wait": 0.0}
+        return lane
+
+    def get_stats(self) -> Dict:
+        """Get limits, current load, and queue depth and wait time metrics"""
+        with self._condition:
+            return {
+                "max_in_flight": self.max_in_flight,
+                "max_queue": self.max_queue,
+                "queue_deadline_seconds": self.queue_deadline,
+                "in_flight": self._in_flight,
+                "queue_depth": self._queued,
+                "max_queue_depth": self.max_queue_depth,
+                "admitted": self.admitted,
+                "queued_total": self.queued_total,
+                "rejections": dict(self.rejections),
+                "avg_wait_ms": round(self.total_wait / self.admitted * 1000, 3) if self.admitted else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "avg_hold_ms": round(self._hold_time * 1000, 3) if self._hold_time is not None else None,
+                "lanes": {
+                    str(priority): {
+                        "admitted": lane["admitted"],
+                        "rejected": lane["rejected"],
+                        "avg_wait_ms": round(lane["total_wait"] / lane["admitted"] * 1000, 3)
+                        if lane["admitted"] else 0.0
+                    }
+                    for priority, lane in sorted(self._lanes.items(), reverse=True)
+                }
+            }
+
+
+_shared_governor: Optional[BackendGovernor] = None
+_shared_governor_lock = threading.Lock()
+
+
+def get_backend_governor() -> BackendGovernor:
+    """Get the process-wide governor, sized from LLM_MAX_IN_FLIGHT, LLM_MAX_QUEUE and LLM_QUEUE_DEADLINE_SECONDS"""
+    global _shared_governor
+    if _shared_governor is None:
+        with _shared_governor_lock:
+            if _shared_governor is None:
+                worker_threads = BACKEND_EXECUTOR._max_workers
+                max_in_flight = int(os.environ.get("LLM_MAX_IN_FLIGHT", "16"))
+                # Waiting requests occupy worker threads, so by default the queue takes the rest of them
+                max_queue = int(os.environ.get("LLM_MAX_QUEUE", max(worker_threads - max_in_flight, 0)))
+                if max_in_flight + max_queue > worker_threads:
+                    logger.warning("LLM_MAX_IN_FLIGHT + LLM_MAX_QUEUE exceeds LLM_WORKER_THREADS; "
+                                   "priority admission may be delayed", extra={
+                                       "max_in_flight": max_in_flight, "max_queue": max_queue,
+                                       "worker_threads": worker_threads})
+                _shared_governor = BackendGovernor(
+                    max_in_flight=max_in_flight,
+                    max_queue=max_queue,
+                    queue_deadline=float(os.environ.get("LLM_QUEUE_DEADLINE_SECONDS", "10")),
+                )
+    return _shared_governor
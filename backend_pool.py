@@ -0,0 +1,384 @@
+"""
+Backend Pool Module
+
+This module spreads LLM calls over several inference replicas. Each call goes
+to the healthy backend with the fewest outstanding requests (or the lowest
+latency-weighted load). Backends that keep failing are ejected for a while,
+and background health probes let them back in under a slow-start weight
+that ramps their share of traffic up gradually.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import requests
+
+from http_pool import PooledHTTPClient, get_shared_client
+from metrics import BACKEND_ERRORS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "Qwen/Qwen2.5-7B-Instruct"
+DEFAULT_BACKEND_URL = "https://d2c6-35-225-158-177.ngrok-free.app"
+STRATEGY_LEAST_OUTSTANDING = "least_outstanding"
+STRATEGY_EWMA = "ewma"
+# Weight of the newest sample in the latency moving average
+LATENCY_SMOOTHING = 0.3
+# Share of traffic a backend gets right after re-admission, relative to a fully warmed one
+MIN_SLOW_START_WEIGHT = 0.1
+
+STATE_HEALTHY = "healthy"
+STATE_EJECTED = "ejected"
+
+
+class Backend:
+    """One inference replica and its load and health state"""
+
+    __slots__ = ("url", "model", "outstanding", "latency_ewma", "state", "consecutive_failures",
+                 "ejected_until", "admitted_at", "requests", "failures", "ejections", "last_error")
+
+    def __init__(self, url: str, model: str = DEFAULT_MODEL):
+        self.url = url.rstrip("/")
+        self.model = model
+        self.outstanding = 0
+        self.latency_ewma: Optional[float] = None
+        self.state = STATE_HEALTHY
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.admitted_at: Optional[float] = None
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+        self.last_error: Optional[str] = None
+
+    def weight(self, now: float, slow_start_seconds: float) -> float:
+        """Get the backend's share of traffic, ramping up linearly after re-admission"""
+        if self.admitted_at is None or slow_start_seconds <= 0:
+            return 1.0
+        ramp = (now - self.admitted_at) / slow_start_seconds
+        if ramp >= 1.0:
+            self.admitted_at = None
+            return 1.0
+        return max(MIN_SLOW_START_WEIGHT, ramp)
+
+    def to_dict(self, now: float, slow_start_seconds: float) -> Dict:
+        """Get the backend's state as a JSON-serializable dictionary"""
+        return {
+            "url": self.url,
+            "model": self.model,
+            "state": self.state,
+            "outstanding": self.outstanding,
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 3) if self.latency_ewma is not None else None,
+            "weight": round(self.weight(now, slow_start_seconds), 3),
+            "requests": self.requests,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "ejections": self.ejections,
+            "ejected_for_seconds": round(max(0.0, self.ejected_until - now), 3)
+            if self.state == STATE_EJECTED else 0.0,
+            "last_error": self.last_error,
+        }
+
+
+class BackendCall:
+    """One request on a pooled backend that can be cancelled from another thread"""
+
+    __slots__ = ("exclude", "backend", "response", "start_time", "first_token_time", "cancelled")
+
+    def __init__(self, exclude: Optional[Backend] = None):
+        """
+        Initialize the call
+
+        Args:
+            exclude: Backend to avoid if another one is available (e.g. the one a hedged call is already on)
+        """
+        self.exclude = exclude
+        self.backend: Optional[Backend] = None
+        self.response: Optional[requests.Response] = None
+        self.start_time = time.monotonic()
+        self.first_token_time: Optional[float] = None
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        """Abort the call; closing its response drops the connection so the backend stops generating"""
+        self.cancelled = True
+        response = self.response
+        if response is not None:
+            response.close()
+
+    def finish(self, pool: "BackendPool", error: Optional[Exception] = None) -> None:
+        """
+        Close the response and release the backend to the pool
+
+        Args:
+            pool: Pool the backend was acquired from
+            error: Error the call ended with, if any; errors caused by cancel() are not backend failures
+        """
+        if self.response is not None:
+            self.response.close()
+        if self.backend is None:
+            return
+        failed = error is not None and not self.cancelled and BackendPool.is_backend_failure(error)
+        latency = self.first_token_time - self.start_time if self.first_token_time is not None else None
+        pool.release(self.backend, success=not failed, latency=latency, error=str(error) if failed else None)
+        self.backend = None
+
+
+class BackendPool:
+    """Load-balances calls over backends, ejecting failing ones and re-admitting them gradually"""
+
+    def __init__(self, backends: List[Backend], strategy: str = STRATEGY_LEAST_OUTSTANDING,
+                 failure_threshold: int = 3, ejection_seconds: float = 30.0, slow_start_seconds: float = 30.0,
+                 probe_path: str = "/v1/models", http_client: Optional[PooledHTTPClient] = None):
+        """
+        Initialize the pool
+
+        Args:
+            backends: Backends to balance over (at least one)
+            strategy: "least_outstanding", or "ewma" to also weigh each backend by its latency average
+            failure_threshold: Consecutive failures after which a backend is ejected
+            ejection_seconds: How long an ejected backend receives no traffic before it is probed again
+            slow_start_seconds: How long a re-admitted backend takes to ramp up to its full share
+            probe_path: Path requested by health probes
+            http_client: Client used for health probes; the shared pooled client if omitted
+        """
+        if not backends:
+            raise ValueError("BackendPool needs at least one backend")
+        if strategy not in (STRATEGY_LEAST_OUTSTANDING, STRATEGY_EWMA):
+            raise ValueError(f"Unknown load balancing strategy: {strategy}")
+        self.backends = backends
+        self.strategy = strategy
+        self.failure_threshold = failure_threshold
+        self.ejection_seconds = ejection_seconds
+        self.slow_start_seconds = slow_start_seconds
+        self.probe_path = probe_path
+        self._http_client = http_client
+        self._lock = threading.Lock()
+        self._probe_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    @property
+    def default_model(self) -> str:
+        """Model of the first backend, used where a request has no backend yet (e.g. cache keys)"""
+        return self.backends[0].model
+
+    def acquire(self, exclude: Optional[Backend] = None) -> Backend:
+        """
+        Pick a backend for one call and count it as outstanding
+
+        Ejected backends are skipped. Without health checks running, a backend
+        whose ejection time is over is re-admitted here instead. If every
+        backend is ejected, the one whose ejection ends first is used rather
+        than failing the call.
+
+        Args:
+            exclude: Backend to skip unless it is the only one available
+
+        Returns:
+            Backend: The chosen backend; pass it to release() when the call ends
+        """
+        now = time.monotonic()
+        with self._lock:
+            best, best_score = None, None
+            for backend in self.backends:
+                if backend is exclude and len(self.backends) > 1:
+                    continue
+                if backend.state == STATE_EJECTED:
+                    if self._probe_thread is not None or backend.ejected_until > now:
+                        continue
+                    self._readmit(backend)
+                score = (backend.outstanding + 1) / backend.weight(now, self.slow_start_seconds)
+                if self.strategy == STRATEGY_EWMA and backend.latency_ewma is not None:
+                    score *= backend.latency_ewma
+                # Random tie-breaking keeps idle backends from always losing to the first one listed
+                if best is None or score < best_score or (score == best_score and random.random() < 0.5):
+                    best, best_score = backend, score
+            if best is None:
+                best = exclude if exclude is not None and exclude.state != STATE_EJECTED else min(
+                    self.backends, key=lambda backend: backend.ejected_until)
+            best.outstanding += 1
+            best.requests += 1
+            return best
+
+    def release(self, backend: Backend, success: bool = True, latency: Optional[float] = None,
+                error: Optional[str] = None) -> None:
+        """
+        Finish a call started with acquire()
+
+        Args:
+            backend: Backend returned by acquire()
+            success: Whether the backend served the call
+            latency: Seconds until the first token (streams) or the response, for the latency average
+            error: Description of the failure, if any
+        """
+        with self._lock:
+            backend.outstanding -= 1
+            if success:
+                if backend.state == STATE_EJECTED:
+                    self._readmit(backend)
+                backend.consecutive_failures = 0
+                if latency is not None:
+                    backend.latency_ewma = latency if backend.latency_ewma is None else (
+                        LATENCY_SMOOTHING * latency + (1 - LATENCY_SMOOTHING) * backend.latency_ewma)
+            else:
+                BACKEND_ERRORS.inc((backend.url, "request"))
+                self._record_failure(backend, error)
+
+    @contextmanager
+    def lease(self) -> Iterator[Backend]:
+        """Hold a backend for the duration of a with-block; exceptions count as backend failures"""
+        backend = self.acquire()
+        start = time.monotonic()
+        try:
+            yield backend
+        except Exception as e:
+            self.release(backend, success=not self.is_backend_failure(e), error=str(e))
+            raise
+        self.release(backend, latency=time.monotonic() - start)
+
+    @staticmethod
+    def is_backend_failure(error: Exception) -> bool:
+        """Whether an error reflects on the backend (connection problems, 5xx) rather than the request (4xx)"""
+        if isinstance(error, requests.HTTPError) and error.response is not None:
+            return error.response.status_code >= 500
+        return True
+
+    def _record_failure(self, backend: Backend, error: Optional[str]) -> None:
+        """Count a failure and eject the backend once it reaches the threshold (lock held)"""
+        backend.failures += 1
+        backend.consecutive_failures += 1
+        backend.last_error = error
+        if backend.state != STATE_EJECTED and backend.consecutive_failures >= self.failure_threshold:
+            backend.state = STATE_EJECTED
+            backend.ejected_until = time.monotonic() + self.ejection_seconds
+            backend.ejections += 1
+            logger.warning("Ejected backend", extra={"backend": backend.url, "failures": backend.consecutive_failures,
+                                                     "ejection_s": self.ejection_seconds, "error": error})
+
+    def _readmit(self, backend: Backend) -> None:
+        """Let an ejected backend back in under slow start (lock held)"""
+        backend.state = STATE_HEALTHY
+        backend.consecutive_failures = 0
+        backend.admitted_at = time.monotonic()
+        logger.info("Re-admitted backend", extra={"backend": backend.url, "slow_start_s": self.slow_start_seconds})
+
+    def probe(self, backend: Backend) -> bool:
+        """
+        Run one health probe against a backend and update its state
+
+        Args:
+            backend: Backend to probe
+
+        Returns:
+            bool: Whether the backend answered successfully
+        """
+        client = self._http_client or get_shared_client()
+        try:
+            response = client.get(backend.url + self.probe_path)
+            response.raise_for_status()
+            response.close()
+            healthy, error = True, None
+        except Exception as e:
+            healthy, error = False, str(e)
+            BACKEND_ERRORS.inc((backend.url, "health_check"))
+
+        with self._lock:
+            if backend.state == STATE_EJECTED:
+                if healthy:
+                    self._readmit(backend)
+                else:
+                    backend.ejected_until = time.monotonic() + self.ejection_seconds
+                    backend.last_error = error
+            elif not healthy:
+                self._record_failure(backend, error)
+        return healthy
+
+    def probe_all(self) -> None:
+        """Probe every healthy backend and every ejected backend whose ejection time is over"""
+        now = time.monotonic()
+        for backend in self.backends:
+            if backend.state != STATE_EJECTED or backend.ejected_until <= now:
+                self.probe(backend)
+
+    def start_health_checks(self, interval_seconds: float = 10.0) -> None:
+        """
+        Start a background thread that probes the backends periodically
+
+        Args:
+            interval_seconds: Time between probe rounds
+        """
+        if self._probe_thread is not None:
+            return
+        self._stop_event.clear()
+        self._probe_thread = threading.Thread(
+            target=self._run_health_checks, args=(interval_seconds,), name="backend-health", daemon=True)
+        self._probe_thread.start()
+
+    def stop_health_checks(self) -> None:
+        """Stop the background probe thread"""
+        self._stop_event.set()
+        if self._probe_thread is not None:
+            self._probe_thread.join()
+            self._probe_thread = None
+
+    def _run_health_checks(self, interval_seconds: float) -> None:
+        """Probe the backends until stopped"""
+        while not self._stop_event.wait(interval_seconds):
+            try:
+                self.probe_all()
+            except Exception as e:
+                logger.error("Backend health check round failed", extra={"error": str(e)})
+
+    def get_stats(self) -> Dict:
+        """Get the strategy and per-backend load, latency and health"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "strategy": self.strategy,
+                "health_checks": self._probe_thread is not None,
+                "backends": [backend.to_dict(now, self.slow_start_seconds) for backend in self.backends],
+            }
+
+    @classmethod
+    def from_env(cls) -> "BackendPool":
+        """
+        Create a pool from environment variables
+
+        LLM_BACKENDS is a comma-separated list of backend URLs, each optionally
+        followed by "|<model>"; without it the single NGROK_SERVER_URL backend is used.
+        """
+        default_model = os.environ.get("LLM_MODEL", DEFAULT_MODEL)
+        specs = [spec.strip() for spec in os.environ.get("LLM_BACKENDS", "").split(",") if spec.strip()]
+        if not specs:
+            specs = [os.environ.get("NGROK_SERVER_URL", DEFAULT_BACKEND_URL)]
+        backends = []
+        for spec in specs:
+            url, _, model = spec.partition("|")
+            backends.append(Backend(url.strip(), model.strip() or default_model))
+        return cls(
+            backends,
+            strategy=os.environ.get("LLM_BALANCING", STRATEGY_LEAST_OUTSTANDING),
+            failure_threshold=int(os.environ.get("LLM_EJECT_AFTER_FAILURES", "3")),
+            ejection_seconds=float(os.environ.get("LLM_EJECTION_SECONDS", "30")),
+            slow_start_seconds=float(os.environ.get("LLM_SLOW_START_SECONDS", "30")),
+            probe_path=os.environ.get("LLM_HEALTH_CHECK_PATH", "/v1/models"),
+        )
+
+
+_shared_pool: Optional[BackendPool] = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_backend_pool() -> BackendPool:
+    """Get the process-wide backend pool used by all agents"""
+    global _shared_pool
+    if _shared_pool is None:
+        with _shared_pool_lock:
+            if _shared_pool is None:
+                _shared_pool = BackendPool.from_env()
+    return _shared_pool
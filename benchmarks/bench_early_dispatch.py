@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Early Dispatch Benchmark - Measures the end-to-end latency of routed turns with and without early
+transition dispatch, against a local streaming backend with a fixed per-token delay.
+
+The root agent answers every untransferred request with a short preamble, a TRANSITION_TO marker and
+a trailing explanation; without early dispatch the trailing tokens are generated before the target
+agent is called.
+
+Usage:
+    python benchmarks/bench_early_dispatch.py [--turns 20] [--token-delay-ms 20] [--trailing-tokens 40]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ROUTED_REPLY = "Sure, let me connect you with the right team. TRANSITION_TO:booking_agent\n"
+SPECIALIST_REPLY = "I can book that room for you. Which date and time would you like?"
+
+
+def make_handler(token_delay: float, trailing_tokens: int):
+    """Create a request handler streaming OpenAI-style deltas word by word"""
+    trailing = " ".join(f"detail{i}" for i in range(trailing_tokens))
+
+    class StreamingHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args) -> None:
+            pass
+
+        def do_POST(self) -> None:
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            last_message = body["messages"][-1]["content"]
+            text = SPECIALIST_REPLY if "TRANSFERRED" in last_message else ROUTED_REPLY + trailing
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for word in re.findall(r"\S+\s*", text):
+                    time.sleep(token_delay)
+                    data = json.dumps({"choices": [{"delta": {"content": word}}]})
+                    self._write_chunk(f"data: {data}\n\n".encode())
+                self._write_chunk(b"data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def _write_chunk(self, data: bytes) -> None:
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+    return StreamingHandler
+
+
+class QuietServer(ThreadingHTTPServer):
+    """Streaming server that ignores connections dropped by cancelled requests"""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address) -> None:
+        pass
+
+
+def run_turns(template_graph, early_dispatch: bool, turns: int) -> list:
+    """Run routed turns on fresh sessions and return their end-to-end latencies in milliseconds"""
+    from async_utils import iterate_sync
+
+    latencies = []
+    for _ in range(turns):
+        session = template_graph.create_session()
+        session.transition_manager.early_dispatch = early_dispatch
+        start = time.perf_counter()
+        events = list(iterate_sync(session.aprocess_events("Could you help me with something?")))
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert session.get_current_agent().get_name() == "booking_agent", "turn was not routed"
+        assert any(event["type"] == "transition" for event in events)
+    return latencies
+
+
+def describe(latencies: list) -> str:
+    """Format the median and p95 of a list of latencies"""
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"median {statistics.median(ordered):8.1f} ms   p95 {p95:8.1f} ms"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--token-delay-ms", type=float, default=20.0)
+    parser.add_argument("--trailing-tokens", type=int, default=40)
+    args = parser.parse_args()
+
+    server = QuietServer(("127.0.0.1", 0), make_handler(args.token_delay_ms / 1000, args.trailing_tokens))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["NGROK_SERVER_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from multi_graph_agent import ConversationAgentGraph
+
+    template_graph = ConversationAgentGraph.create_agent_graph()
+    for node in template_graph.nodes.values():
+        # Cached replies would hide the generation time being measured
+        node.agent._response_cache = None
+    results = {}
+    # The agents print per-request timings; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        for early_dispatch in (False, True):
+            results[early_dispatch] = run_turns(template_graph, early_dispatch, args.turns)
+    server.shutdown()
+
+    print(f"{args.turns} routed turns, {args.token_delay_ms:g} ms per token, "
+          f"{args.trailing_tokens} tokens after the marker")
+    print(f"  wait for full response : {describe(results[False])}")
+    print(f"  early dispatch         : {describe(results[True])}")
+    saved = statistics.median(results[False]) - statistics.median(results[True])
+    print(f"  median saved per turn  : {saved:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Path Finder Benchmark - Measures AgentPathFinder adjacency and all-pairs table construction and path queries
+on synthetic agent graphs of 10 to 5,000 agents, against the previous per-query BFS.
+
+Usage:
+    python benchmarks/bench_path_finder.py [--sizes 10,100,1000,5000] [--queries 2000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from collections import deque
+from typing import Dict, List, Optional, Set
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent_path_finder import AgentPathFinder
+from synthetic_config import build_synthetic_config
+
+
+def legacy_find_path(graph: Dict[str, Set[str]], start_agent: str, target_agent: str) -> Optional[List[str]]:
+    """The previous implementation: a fresh BFS per query, copying the path at every push"""
+    if start_agent not in graph or target_agent not in graph:
+        return None
+    if start_agent == target_agent:
+        return [start_agent]
+    queue = deque([(start_agent, [start_agent])])
+    visited = {start_agent}
+    while queue:
+        current_agent, path = queue.popleft()
+        for neighbor in graph[current_agent]:
+            if neighbor == target_agent:
+                return path + [neighbor]
+            if neighbor not in visited:
+                visited.add(neighbor)
+                queue.append((neighbor, path + [neighbor]))
+    return None
+
+
+def run(sizes: List[int], query_count: int) -> None:
+    print(f"{'agents':>7} {'build ms':>10} {'table ms':>10} {'query us':>10} {'legacy us':>10} {'speedup':>8} {'avg hops':>9}")
+    for size in sizes:
+        config = build_synthetic_config(size)
+        rng = random.Random(size)
+        pairs = [(f"agent_{rng.randrange(size)}", f"agent_{rng.randrange(size)}") for _ in range(query_count)]
+
+        start = time.perf_counter()
+        finder = AgentPathFinder(agents_config=config, precompute_limit=0)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        finder.precompute_all()
+        table_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        hops = 0
+        for source, target in pairs:
+            hops += len(finder.find_path(source, target)) - 1
+        query_us = (time.perf_counter() - start) / query_count * 1e6
+
+        legacy_pairs = pairs[:max(1, min(query_count, 200_000 // size))]
+        start = time.perf_counter()
+        for source, target in legacy_pairs:
+            legacy_find_path(finder.graph, source, target)
+        legacy_us = (time.perf_counter() - start) / len(legacy_pairs) * 1e6
+
+        print(f"{size:>7} {build_ms:>10.2f} {table_ms:>10.2f} {query_us:>10.2f} {legacy_us:>10.2f} "
+              f"{legacy_us / query_us:>7.1f}x {hops / query_count:>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,500,1000,5000", help="Comma-separated agent counts")
+    parser.add_argument("--queries", type=int, default=2000, help="Path queries per graph size")
+    args = parser.parse_args()
+    run([int(size) for size in args.sizes.split(",")], args.queries)
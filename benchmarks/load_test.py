@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+Load Test - Drives the chat API with concurrent sessions and reports throughput, latency percentiles and
+time to first token, optionally saving the results as a JSON baseline and comparing against an earlier one.
+
+Each session sends a sequence of turns, a mix of direct questions and routed turns ("... route me to
+<agent>") that the mock backend answers with a TRANSITION_TO: marker. Streamed turns (the default) use
+/chat/stream and measure time to the first token event; --mode chat uses POST /chat.
+
+With --spawn, a mock backend (benchmarks/mock_backend.py) and the API server are started on free local
+ports for the duration of the run; otherwise --url must point at a running API server.
+
+Usage:
+    python benchmarks/load_test.py --spawn [--sessions 20] [--turns 5] [--routed-ratio 0.3]
+                                   [--ttft lognormal:150:0.4] [--token-delay fixed:15] [--error-rate 0]
+                                   [--output benchmarks/baselines/local.json] [--compare baseline.json]
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 [--mock-url http://127.0.0.1:8800]
+
+Exits with status 1 when --compare finds a metric worse than the baseline by more than --tolerance.
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import requests
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_VERSION = 1
+DEFAULT_ROUTE_TARGETS = "faq_agent,hr_agent,visitor_agent,it_agent"
+
+# Metrics compared against a baseline: (section, metric, whether higher is better)
+COMPARED_METRICS = [
+    ("throughput", "turns_per_second", True),
+    ("latency_ms", "p50", False),
+    ("latency_ms", "p95", False),
+    ("latency_ms", "p99", False),
+    ("ttft_ms", "p50", False),
+    ("ttft_ms", "p95", False),
+    ("ttft_ms", "p99", False),
+]
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Get a nearest-rank percentile of an ascending list"""
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(values: List[float]) -> Optional[Dict]:
+    """Get the count, mean, percentiles and maximum of a list of latencies in milliseconds"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.fmean(ordered), 3),
+        "p50": round(percentile(ordered, 0.50), 3),
+        "p95": round(percentile(ordered, 0.95), 3),
+        "p99": round(percentile(ordered, 0.99), 3),
+        "max": round(ordered[-1], 3),
+    }
+
+
+class SessionRunner(threading.Thread):
+    """One simulated user sending a sequence of turns in its own session"""
+
+    def __init__(self, index: int, args: argparse.Namespace, start_barrier: threading.Barrier):
+        super().__init__(name=f"load-session-{index}", daemon=True)
+        self.index = index
+        self.args = args
+        self.start_barrier = start_barrier
+        self.rng = random.Random((args.seed or 0) * 100003 + index)
+        self.session_id = f"load-{uuid.uuid4().hex[:12]}"
+        self.http = requests.Session()
+        self.current_agent: Optional[str] = None
+        self.results: List[Dict] = []
+
+    def run(self) -> None:
+        self.start_barrier.wait()
+        for turn in range(self.args.turns):
+            routed = self.rng.random() < self.args.routed_ratio
+            if routed:
+                targets = [name for name in self.args.route_targets if name != self.current_agent]
+                target = self.rng.choice(targets or self.args.route_targets)
+                message = f"I have a question for another team, please route me to {target}"
+            else:
+                message = f"Hi, this is caller {self.index}-{turn}. What can you help me with today?"
+            if self.args.mode == "stream":
+                result = self._stream_turn(message)
+            else:
+                result = self._chat_turn(message)
+            result["kind"] = "routed" if routed else "direct"
+            self.results.append(result)
+            if self.args.think_time:
+                time.sleep(self.args.think_time)
+
+    def _stream_turn(self, message: str) -> Dict:
+        """Send a turn to /chat/stream and time the first token and the final event"""
+        start = time.perf_counter()
+        result = {"ok": False, "ttft_ms": None, "transitions": 0}
+        try:
+            with self.http.post(f"{self.args.url}/chat/stream", json={"content": message, "session_id": self.session_id},
+                                stream=True, timeout=self.args.timeout) as response:
+                if response.status_code != 200:
+                    result["error"] = f"http_{response.status_code}"
+                    return result
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    event = json.loads(line[len("data:"):])
+                    if event["type"] == "token" and result["ttft_ms"] is None:
+                        result["ttft_ms"] = (time.perf_counter() - start) * 1000
+                    elif event["type"] == "transition":
+                        result["transitions"] += 1
+                    elif event["type"] == "done":
+                        result["ok"] = True
+                        self.current_agent = event.get("agent_name")
+                    elif event["type"] == "error":
+                        result["error"] = "overloaded" if "retry_after" in event else "stream_error"
+                if not result["ok"] and "error" not in result:
+                    result["error"] = "incomplete_stream"
+        except requests.RequestException as e:
+            result["error"] = type(e).__name__
+        finally:
+            result["latency_ms"] = (time.perf_counter() - start) * 1000
+        return result
+
+    def _chat_turn(self, message: str) -> Dict:
+        """Send a turn to POST /chat and time the response"""
+        start = time.perf_counter()
+        result = {"ok": False, "ttft_ms": None, "transitions": 0}
+        try:
+            response = self.http.post(f"{self.args.url}/chat", json={"content": message, "session_id": self.session_id},
+                                      timeout=self.args.timeout)
+            if response.status_code == 200:
+                result["ok"] = True
+                body = response.json()
+                self.current_agent = body.get("agent_name")
+                result["transitions"] = max(0, len(body.get("transition_path") or []) - 1)
+            else:
+                result["error"] = f"http_{response.status_code}"
+        except requests.RequestException as e:
+            result["error"] = type(e).__name__
+        finally:
+            result["latency_ms"] = (time.perf_counter() - start) * 1000
+        return result
+
+
+def run_load(args: argparse.Namespace) -> Dict:
+    """Run all sessions concurrently and aggregate their results"""
+    start_barrier = threading.Barrier(args.sessions + 1)
+    runners = [SessionRunner(index, args, start_barrier) for index in range(args.sessions)]
+    for runner in runners:
+        runner.start()
+    start_barrier.wait()
+    start = time.perf_counter()
+    for runner in runners:
+        runner.join()
+    elapsed = time.perf_counter() - start
+
+    turns = [result for runner in runners for result in runner.results]
+    succeeded = [turn for turn in turns if turn["ok"]]
+    errors: Dict[str, int] = {}
+    for turn in turns:
+        if not turn["ok"]:
+            errors[turn["error"]] = errors.get(turn["error"], 0) + 1
+    report = {
+        "throughput": {
+            "turns": len(turns),
+            "succeeded": len(succeeded),
+            "elapsed_seconds": round(elapsed, 3),
+            "turns_per_second": round(len(succeeded) / elapsed, 3) if elapsed else 0.0,
+            "error_rate": round(1 - len(succeeded) / len(turns), 4) if turns else 0.0,
+        },
+        "latency_ms": summarize([turn["latency_ms"] for turn in succeeded]),
+        "ttft_ms": summarize([turn["ttft_ms"] for turn in succeeded if turn["ttft_ms"] is not None]),
+        "by_kind": {
+            kind: {
+                "latency_ms": summarize([turn["latency_ms"] for turn in succeeded if turn["kind"] == kind]),
+                "ttft_ms": summarize([turn["ttft_ms"] for turn in succeeded
+                                      if turn["kind"] == kind and turn["ttft_ms"] is not None]),
+                "transitions": sum(turn["transitions"] for turn in succeeded if turn["kind"] == kind),
+            }
+            for kind in ("direct", "routed")
+        },
+        "errors": errors,
+    }
+    return report
+
+
+def free_port() -> int:
+    """Get a free local TCP port"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    """Poll a URL until it answers, failing if the process exits first"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process serving {url} exited with status {process.returncode}")
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not become ready within {timeout:g} s")
+
+
+def spawn_servers(args: argparse.Namespace) -> List[subprocess.Popen]:
+    """Start the mock backend and the API server, pointing args.url and args.mock_url at them"""
+    mock_port, api_port = free_port(), free_port()
+    args.mock_url = f"http://127.0.0.1:{mock_port}"
+    args.url = f"http://127.0.0.1:{api_port}"
+    log = open(args.server_log, "w") if args.server_log else subprocess.DEVNULL
+
+    mock_command = [sys.executable, os.path.join(REPO_ROOT, "benchmarks", "mock_backend.py"),
+                    "--port", str(mock_port), "--ttft", args.ttft, "--token-delay", args.token_delay,
+                    "--error-rate", str(args.error_rate), "--drop-rate", str(args.drop_rate)]
+    if args.seed is not None:
+        mock_command += ["--seed", str(args.seed)]
+    if args.script:
+        mock_command += ["--script", args.script]
+    processes = [subprocess.Popen(mock_command, stdout=log, stderr=log)]
+    try:
+        wait_until_ready(f"{args.mock_url}/v1/models", processes[0])
+        env = dict(os.environ, NGROK_SERVER_URL=args.mock_url)
+        env.pop("LLM_BACKENDS", None)
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "api:app", "--host", "127.0.0.1", "--port", str(api_port),
+             "--log-level", "warning"],
+            cwd=REPO_ROOT, env=env, stdout=log, stderr=log))
+        wait_until_ready(f"{args.url}/agents", processes[1], timeout=60.0)
+    except Exception:
+        stop_servers(processes)
+        raise
+    return processes
+
+
+def stop_servers(processes: List[subprocess.Popen]) -> None:
+    """Terminate spawned servers"""
+    for process in reversed(processes):
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def git_revision() -> Optional[str]:
+    """Get the current commit of the repository, if available"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Compare a report against a baseline and print the differences
+
+    Args:
+        report: Results of this run
+        baseline: Previously saved baseline (its "results")
+        tolerance: Allowed relative change in the worse direction, e.g. 0.1 for 10%
+
+    Returns:
+        Descriptions of the metrics that regressed beyond the tolerance
+    """
+    regressions = []
+    print(f"\nComparison with baseline (tolerance {tolerance:.0%}):")
+    for section, metric, higher_is_better in COMPARED_METRICS:
+        current = (report.get(section) or {}).get(metric)
+        previous = (baseline.get(section) or {}).get(metric)
+        if current is None or previous is None:
+            continue
+        change = (current - previous) / previous if previous else 0.0
+        worse = -change if higher_is_better else change
+        flag = "REGRESSION" if worse > tolerance else ""
+        print(f"  {section + '.' + metric:30} {previous:10.1f} -> {current:10.1f}  {change:+7.1%}  {flag}")
+        if flag:
+            regressions.append(f"{section}.{metric} {change:+.1%}")
+    return regressions
+
+
+def print_report(report: Dict) -> None:
+    """Print a human-readable summary of a report"""
+    throughput = report["throughput"]
+    print(f"{throughput['succeeded']}/{throughput['turns']} turns in {throughput['elapsed_seconds']:.1f} s "
+          f"({throughput['turns_per_second']:.2f} turns/s, error rate {throughput['error_rate']:.2%})")
+    rows = [("all", report["latency_ms"], report["ttft_ms"])]
+    rows += [(kind, stats["latency_ms"], stats["ttft_ms"]) for kind, stats in report["by_kind"].items()]
+    print(f"  {'':8} {'latency p50':>12} {'p95':>9} {'p99':>9}   {'ttft p50':>9} {'p95':>9} {'p99':>9}")
+    for name, latency, ttft in rows:
+        cells = [f"{latency[key]:9.1f}" if latency else f"{'-':>9}" for key in ("p50", "p95", "p99")]
+        cells += [f"{ttft[key]:9.1f}" if ttft else f"{'-':>9}" for key in ("p50", "p95", "p99")]
+        print(f"  {name:8} {cells[0]:>12} {cells[1]} {cells[2]}   {cells[3]} {cells[4]} {cells[5]}")
+    if report["errors"]:
+        print(f"  errors: {report['errors']}")
+    if report.get("backend"):
+        print(f"  backend: {report['backend']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="API server to load")
+    parser.add_argument("--mock-url", help="mock backend whose /stats are included in the report")
+    parser.add_argument("--spawn", action="store_true", help="start a mock backend and the API server")
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent sessions")
+    parser.add_argument("--turns", type=int, default=5, help="turns per session")
+    parser.add_argument("--routed-ratio", type=float, default=0.3, help="share of turns that are routed")
+    parser.add_argument("--route-targets", default=DEFAULT_ROUTE_TARGETS, help="comma-separated routing targets")
+    parser.add_argument("--mode", choices=("stream", "chat"), default="stream")
+    parser.add_argument("--think-time", type=float, default=0.0, help="seconds between a session's turns")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--ttft", default="lognormal:150:0.4", help="mock time to first token (with --spawn)")
+    parser.add_argument("--token-delay", default="fixed:15", help="mock delay between tokens (with --spawn)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="mock error rate (with --spawn)")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="mock dropped stream rate (with --spawn)")
+    parser.add_argument("--script", help="mock reply script (with --spawn)")
+    parser.add_argument("--server-log", help="file receiving the spawned servers' output")
+    parser.add_argument("--output", help="save the results as a JSON baseline")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+    args.route_targets = [name.strip() for name in args.route_targets.split(",") if name.strip()]
+    args.url = args.url.rstrip("/")
+
+    processes = spawn_servers(args) if args.spawn else []
+    try:
+        if args.mock_url:
+            requests.post(f"{args.mock_url}/stats/reset", timeout=5)
+        report = run_load(args)
+        if args.mock_url:
+            backend = requests.get(f"{args.mock_url}/stats", timeout=5).json()
+            turns = report["throughput"]["turns"]
+            backend["calls_per_turn"] = round(backend["requests"] / turns, 3) if turns else 0.0
+            report["backend"] = backend
+    finally:
+        stop_servers(processes)
+
+    print_report(report)
+    config = {key: value for key, value in vars(args).items()
+              if key not in ("url", "mock_url", "output", "compare", "server_log", "spawn")}
+    baseline = {
+        "version": BASELINE_VERSION,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "config": config,
+        "results": report,
+    }
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"\nSaved baseline to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+        if previous.get("config") != config:
+            print("\nWarning: the baseline was recorded with a different configuration")
+        regressions = compare(report, previous["results"], args.tolerance)
+        if regressions:
+            print(f"\nRegressed: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
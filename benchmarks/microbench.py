@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks - Measures the in-process orchestration cost around the LLM call on synthetic agent graphs
+of increasing size and long conversation histories, and fails when a result exceeds its threshold.
+
+Covered paths: graph building from JSON (JSONGraphBuilder.build_graph_from_json_file), transition detection
+(TransitionManager.detect_intent_and_transition), path queries (AgentPathFinder.find_path), parent context
+(AgentGraph._format_parent_context / _find_parent_agent), TransitionManager.record_transition,
+api.clean_response, and a whole routed turn through AgentGraph.aprocess_events with stub agents that answer
+instantly.
+
+Thresholds are per-operation limits in microseconds, keyed "<benchmark>[<size>]", in
+benchmarks/microbench_thresholds.json. They leave generous headroom over a typical laptop so that only
+real complexity regressions (e.g. a linear scan creeping into a per-turn path) trip them.
+
+Usage:
+    python benchmarks/microbench.py [--sizes 10,100,1000] [--history 5000] [--only find_path,clean_response]
+                                    [--thresholds FILE] [--output results.json] [--no-check]
+
+Exits with status 1 when any benchmark exceeds its threshold.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import AsyncGenerator, Callable, Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+# Agents resolve a backend on construction; none is ever contacted here
+os.environ.setdefault("NGROK_SERVER_URL", "http://127.0.0.1:9")
+
+from agents.voice_agent import ConversationalAgent
+from synthetic_config import build_synthetic_config
+
+DEFAULT_THRESHOLDS = os.path.join(REPO_ROOT, "benchmarks", "microbench_thresholds.json")
+
+
+class StubAgent(ConversationalAgent):
+    """Agent answering every request instantly with a scripted reply instead of calling a backend"""
+
+    def __init__(self, agent: ConversationalAgent, reply: Callable[[List[Dict]], str]):
+        self.__dict__.update(agent.__dict__)
+        self._reply = reply
+
+    async def aexecute_with_streaming(self, messages: List[Dict]) -> AsyncGenerator[str, None]:
+        for word in self._reply(messages).split(" "):
+            yield word + " "
+
+
+def measure(func: Callable[[], object], min_time: float = 0.2, repeats: int = 5) -> float:
+    """
+    Time a function
+
+    Args:
+        func: Operation to time
+        min_time: Approximate duration of each timed batch, in seconds
+        repeats: Number of timed batches
+
+    Returns:
+        float: Best per-call time over the batches, in microseconds
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= 0.02 or number >= 1 << 20:
+            break
+        number *= 10
+    number = max(1, int(number * (min_time / repeats) / elapsed)) if elapsed else number
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best * 1e6
+
+
+class Suite:
+    """Benchmarks of one synthetic graph size"""
+
+    def __init__(self, size: int, history: int, workdir: str):
+        from config_registry import load_agent_config
+        from json_graph_builder import JSONGraphBuilder
+
+        self.size = size
+        self.history = history
+        self.config_file = os.path.join(workdir, f"agents_{size}.json")
+        with open(self.config_file, "w") as f:
+            json.dump(build_synthetic_config(size, child_rules=True), f)
+        self.graph = JSONGraphBuilder.build_graph_from_config(load_agent_config(self.config_file))
+        self.names = list(self.graph.nodes)
+        self.rng = random.Random(size)
+        self.leaf = self.names[-1]
+        self.deep_target = self.names[len(self.names) // 2]
+
+    def session_at(self, agent_name: str):
+        """Create a session whose active agent is agent_name, with a long history in its parent's context"""
+        session = self.graph.create_session()
+        parent = session._find_parent_agent(agent_name) or agent_name
+        summary = session.agent_contexts[parent]["conversation_summary"]
+        for i in range(self.history):
+            summary.append({"role": "user" if i % 2 == 0 else "assistant",
+                            "content": f"message {i} about the booking of room {i % 17}", "agent": parent})
+        for i in range(min(self.history, 500)):
+            session.transition_manager.record_transition(
+                parent, f"turn {i}", "reply", agent_name, session.agent_contexts, user_message_id=i)
+        session.transition_to(agent_name)
+        return session
+
+    def build_graph(self) -> float:
+        from config_registry import load_agent_config
+        from json_graph_builder import JSONGraphBuilder
+
+        def build():
+            load_agent_config(self.config_file, reload=True)
+            JSONGraphBuilder.build_graph_from_json_file(self.config_file)
+
+        return measure(build, min_time=0.5, repeats=3)
+
+    def detect_transition(self) -> float:
+        session = self.graph.create_session()
+        node = session.nodes[self.leaf]
+        response = f"I will connect you with the right team.\nTRANSITION_TO:{self.deep_target}\nThanks."
+        manager = session.transition_manager
+
+        def detect():
+            manager.detect_intent_and_transition("please help", response, node, session.nodes)
+            manager.plan = None
+
+        return measure(detect)
+
+    def detect_no_transition(self) -> float:
+        session = self.graph.create_session()
+        node = session.nodes[self.leaf]
+        response = "Here is a plain answer without any transition marker. " * 5
+        return measure(lambda: session.transition_manager.detect_intent_and_transition(
+            "hello", response, node, session.nodes))
+
+    def find_path(self) -> float:
+        finder = self.graph.transition_manager.path_finder
+        pairs = [(self.rng.choice(self.names), self.rng.choice(self.names)) for _ in range(256)]
+        state = {"i": 0}
+
+        def query():
+            start, target = pairs[state["i"] & 255]
+            state["i"] += 1
+            finder.find_path(start, target)
+
+        return measure(query)
+
+    def find_parent_agent(self) -> float:
+        session = self.graph.create_session()
+        return measure(lambda: session._find_parent_agent(self.leaf))
+
+    def format_parent_context(self) -> float:
+        session = self.session_at(self.leaf)
+        return measure(lambda: session._format_parent_context(self.leaf))
+
+    def record_transition(self) -> float:
+        session = self.session_at(self.leaf)
+        parent = session._find_parent_agent(self.leaf)
+        manager, contexts = session.transition_manager, session.agent_contexts
+        return measure(lambda: manager.record_transition(
+            parent, "I need to book a meeting room", "Sure.", self.leaf, contexts,
+            user_message_id=1, response_message_id=2))
+
+    def routed_turn(self) -> float:
+        """A turn at the root that the root hands to its first child, with both agents stubbed"""
+        from async_utils import iterate_sync
+
+        target = self.names[1] if len(self.names) > 1 else self.names[0]
+        replies = {self.names[0]: f"Let me connect you. TRANSITION_TO:{target}",
+                   target: "Your room is booked for tomorrow at ten."}
+        template = self.graph.create_session()
+        template.nodes = {name: node for name, node in template.nodes.items()}
+        for name in (self.names[0], target):
+            original = self.graph.nodes[name]
+            stub = type(original)(StubAgent(original.agent, lambda messages, n=name: replies[n]),
+                                  original.transition_rules)
+            stub.children = original.children
+            stub.parent = getattr(original, "parent", None)
+            template.nodes[name] = stub
+        template.root = template.nodes[self.names[0]]
+
+        def turn():
+            session = template.create_session()
+            for _ in iterate_sync(session.aprocess_events("Could you help me with something?")):
+                pass
+
+        return measure(turn, repeats=3)
+
+
+def clean_response_bench() -> float:
+    from api import clean_response
+
+    response = ("Thanks for reaching out, I can certainly help you with that request today. " * 20
+                + "\nTRANSITION_TO:booking_agent\n[Global Context: omitted]")
+    return measure(lambda: clean_response(response))
+
+
+BENCHMARKS = ["build_graph", "detect_transition", "detect_no_transition", "find_path", "find_parent_agent",
+              "format_parent_context", "record_transition", "routed_turn"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,1000", help="comma-separated synthetic graph sizes")
+    parser.add_argument("--history", type=int, default=5000, help="messages in the long conversation history")
+    parser.add_argument("--only", help="comma-separated benchmark names to run")
+    parser.add_argument("--thresholds", default=DEFAULT_THRESHOLDS)
+    parser.add_argument("--output", help="save the results as JSON")
+    parser.add_argument("--no-check", action="store_true", help="report only, never fail")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+    selected = set(args.only.split(",")) if args.only else None
+
+    # The agents print per-request debug lines; keep the report readable
+    import contextlib
+    import io
+
+    results: Dict[str, float] = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        if selected is None or "clean_response" in selected:
+            with contextlib.redirect_stdout(io.StringIO()):
+                results["clean_response"] = clean_response_bench()
+        for size in sizes:
+            with contextlib.redirect_stdout(io.StringIO()):
+                suite = Suite(size, args.history, workdir)
+            for name in BENCHMARKS:
+                if selected is not None and name not in selected:
+                    continue
+                with contextlib.redirect_stdout(io.StringIO()):
+                    results[f"{name}[{size}]"] = getattr(suite, name)()
+
+    thresholds: Dict[str, float] = {}
+    if os.path.exists(args.thresholds):
+        with open(args.thresholds, "r", encoding="utf-8") as f:
+            thresholds = json.load(f)
+
+    failures = []
+    print(f"{'benchmark':32} {'us/op':>12} {'threshold':>12}")
+    for key, value in results.items():
+        limit: Optional[float] = thresholds.get(key)
+        failed = limit is not None and value > limit
+        if failed:
+            failures.append(key)
+        limit_text = f"{limit:12.1f}" if limit is not None else f"{'-':>12}"
+        print(f"{key:32} {value:12.2f} {limit_text}  {'FAIL' if failed else ''}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"history": args.history, "results_us": results}, f, indent=2)
+
+    if failures and not args.no_check:
+        print(f"\nOver threshold: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Mock Backend - A local OpenAI-compatible /v1/chat/completions server for benchmarking without a GPU.
+
+Replies are chosen by a script of regex rules over the last user message (and optionally the system
+prompt), so routed turns can be produced with scripted TRANSITION_TO: markers. Time to first token and
+the delay between streamed tokens are drawn from configurable latency distributions, and a fraction of
+requests can fail with an HTTP error or have their stream dropped halfway through.
+
+Latency distributions are written as "<kind>:<params>" in milliseconds:
+    fixed:200   uniform:100:400   normal:200:50   lognormal:200:0.5 (median, sigma)   exp:200 (mean)
+
+Script files are JSON objects:
+    {"rules": [{"match": "route me to (\\w+)", "transferred": false, "reply": "Sure. TRANSITION_TO:\\1"}],
+     "default": "Happy to help with that."}
+A rule may also carry "system", a regex the system prompt must match; "transferred" restricts it to
+requests that are (true) or are not (false) transferred from another agent. Replies may reference the
+rule's groups as \\1, \\2, ...
+A rule with "tool_calls" (a list of {"name": ..., "arguments": {...}}) answers a request that offers
+tools with those tool calls; once the request carries their results, it answers with its reply, in
+which {tool_results} is replaced by the results' contents.
+
+Usage:
+    python benchmarks/mock_backend.py [--port 8800] [--ttft lognormal:150:0.4] [--token-delay fixed:15]
+                                      [--error-rate 0.01] [--drop-rate 0.01] [--script script.json]
+
+GET /stats reports request, error and drop counts; POST /stats/reset clears them.
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+TRANSFERRED_PREFIX = "[TRANSFERRED REQUEST]"
+
+DEFAULT_SCRIPT = {
+    "rules": [
+        {"match": r"\broute me to (\w+)", "transferred": False, "reply": "Let me connect you. TRANSITION_TO:\\1"},
+    ],
+    "default": ("Happy to help with that. Our office team can take care of it today, and I will make sure "
+                "everything you need is ready. Is there anything else you would like me to arrange?"),
+}
+
+
+def parse_distribution(spec: str, rng: random.Random) -> Callable[[], float]:
+    """
+    Parse a latency distribution
+
+    Args:
+        spec: "<kind>:<params>" in milliseconds, e.g. "lognormal:150:0.4"
+        rng: Random number generator to sample from
+
+    Returns:
+        Function returning a sample in seconds
+    """
+    kind, _, rest = spec.partition(":")
+    params = [float(value) for value in rest.split(":")] if rest else []
+    if kind == "fixed" and len(params) == 1:
+        sample = lambda: params[0]
+    elif kind == "uniform" and len(params) == 2:
+        sample = lambda: rng.uniform(params[0], params[1])
+    elif kind == "normal" and len(params) == 2:
+        sample = lambda: rng.gauss(params[0], params[1])
+    elif kind == "lognormal" and len(params) == 2:
+        sample = lambda: params[0] * rng.lognormvariate(0.0, params[1])
+    elif kind == "exp" and len(params) == 1:
+        sample = lambda: rng.expovariate(1.0 / params[0]) if params[0] > 0 else 0.0
+    else:
+        raise ValueError(f"Invalid latency distribution: {spec!r}")
+    return lambda: max(0.0, sample()) / 1000
+
+
+class MockScript:
+    """Regex rules choosing a reply for a chat request"""
+
+    def __init__(self, script: Dict):
+        """
+        Initialize the script
+
+        Args:
+            script: Object with "rules" and an optional "default" reply
+        """
+        self.rules = [
+            (re.compile(rule["match"], re.IGNORECASE),
+             re.compile(rule["system"], re.IGNORECASE) if rule.get("system") else None,
+             rule.get("transferred"),
+             rule["reply"],
+             rule.get("tool_calls"))
+            for rule in script.get("rules", [])
+        ]
+        self.default = script.get("default", DEFAULT_SCRIPT["default"])
+
+    def reply(self, messages: List[Dict], offers_tools: bool = False) -> Tuple[str, List[Dict]]:
+        """
+        Get the scripted reply to a request's messages
+
+        Args:
+            messages: The request's messages
+            offers_tools: Whether the request declares tools
+
+        Returns:
+            Tuple of (reply text, tool calls to return instead of the text, possibly empty)
+        """
+        system_prompt = messages[0]["content"] if messages and messages[0]["role"] == "system" else ""
+        user_message = next((message["content"] for message in reversed(messages)
+                             if message["role"] == "user"), "")
+        tool_results = [message["content"] for message in messages if message["role"] == "tool"]
+        transferred = user_message.startswith(TRANSFERRED_PREFIX)
+        for pattern, system_pattern, wants_transferred, reply, tool_calls in self.rules:
+            if wants_transferred is not None and wants_transferred != transferred:
+                continue
+            if system_pattern is not None and not system_pattern.search(system_prompt):
+                continue
+            match = pattern.search(user_message)
+            if match:
+                if tool_calls and offers_tools and not tool_results:
+                    return "", tool_calls
+                return match.expand(reply).replace("{tool_results}", " ".join(tool_results)), []
+        return self.default, []
+
+
+class MockBackendServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the mock backend's behaviour and counters"""
+
+    daemon_threads = True
+
+    def __init__(self, address, script: MockScript, ttft: Callable[[], float], token_delay: Callable[[], float],
+                 error_rate: float = 0.0, error_status: int = 500, drop_rate: float = 0.0,
+                 model: str = "mock-model", seed: Optional[int] = None):
+        """
+        Initialize the server
+
+        Args:
+            address: (host, port) to listen on
+            script: Reply script
+            ttft: Sampler of the delay before the first token, in seconds
+            token_delay: Sampler of the delay between streamed tokens, in seconds
+            error_rate: Fraction of requests answered with error_status
+            error_status: HTTP status of injected errors
+            drop_rate: Fraction of streamed responses cut off halfway
+            model: Model name reported by /v1/models
+            seed: Seed for the error and drop decisions
+        """
+        super().__init__(address, MockBackendHandler)
+        self.script = script
+        self.ttft = ttft
+        self.token_delay = token_delay
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.drop_rate = drop_rate
+        self.model = model
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = self._empty_stats()
+
+    @staticmethod
+    def _empty_stats() -> Dict:
+        return {"requests": 0, "streamed": 0, "errors": 0, "dropped": 0, "transitions": 0, "tool_calls": 0}
+
+    def count(self, **increments: int) -> None:
+        """Add to the request counters"""
+        with self.lock:
+            for key, value in increments.items():
+                self.stats[key] += value
+
+    def chance(self, rate: float) -> bool:
+        """Decide an injected failure"""
+        with self.lock:
+            return rate > 0 and self.rng.random() < rate
+
+    def handle_error(self, request, client_address) -> None:
+        # Clients cancel streams (early dispatch, hedging); a reset connection is not an error here
+        pass
+
+
+class MockBackendHandler(BaseHTTPRequestHandler):
+    """OpenAI-style chat completions, model listing and counters"""
+
+    protocol_version = "HTTP/1.1"
+    server: MockBackendServer
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        if self.path.startswith("/v1/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": self.server.model, "object": "model"}]})
+        elif self.path.startswith("/stats"):
+            with self.server.lock:
+                self._send_json(200, dict(self.server.stats))
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.startswith("/stats/reset"):
+            with self.server.lock:
+                self.server.stats = self.server._empty_stats()
+            self._send_json(200, {"reset": True})
+            return
+        if not self.path.startswith("/v1/chat/completions"):
+            self._send_json(404, {"error": "not found"})
+            return
+
+        request = json.loads(body)
+        stream = bool(request.get("stream"))
+        self.server.count(requests=1, streamed=int(stream))
+        time.sleep(self.server.ttft())
+        if self.server.chance(self.server.error_rate):
+            self.server.count(errors=1)
+            self._send_json(self.server.error_status, {"error": {"message": "injected failure"}})
+            return
+
+        text, tool_calls = self.server.script.reply(request.get("messages", []), bool(request.get("tools")))
+        if "TRANSITION_TO:" in text:
+            self.server.count(transitions=1)
+        if tool_calls:
+            self.server.count(tool_calls=len(tool_calls))
+            calls = [{"id": f"call_{index}", "type": "function",
+                      "function": {"name": call["name"], "arguments": json.dumps(call.get("arguments", {}))}}
+                     for index, call in enumerate(tool_calls)]
+            if stream:
+                self._stream_tool_calls(calls)
+            else:
+                self._send_json(200, {"object": "chat.completion", "model": self.server.model,
+                                      "choices": [{"index": 0, "finish_reason": "tool_calls",
+                                                   "message": {"role": "assistant", "content": None,
+                                                               "tool_calls": calls}}]})
+        elif stream:
+            self._stream(text)
+        else:
+            tokens = re.findall(r"\S+\s*", text)
+            time.sleep(sum(self.server.token_delay() for _ in tokens[1:]))
+            self._send_json(200, {"object": "chat.completion", "model": self.server.model,
+                                  "choices": [{"index": 0, "finish_reason": "stop",
+                                               "message": {"role": "assistant", "content": text}}]})
+
+    def _stream(self, text: str) -> None:
+        """Stream a reply word by word as server-sent events"""
+        tokens = re.findall(r"\S+\s*", text)
+        drop_after = len(tokens) // 2 if self.server.chance(self.server.drop_rate) else None
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for index, token in enumerate(tokens):
+                if index == drop_after:
+                    self.server.count(dropped=1)
+                    self.close_connection = True
+                    return
+                if index:
+                    time.sleep(self.server.token_delay())
+                data = json.dumps({"object": "chat.completion.chunk",
+                                   "choices": [{"index": 0, "delta": {"content": token}}]})
+                self._write_chunk(f"data: {data}\n\n".encode())
+            self._write_chunk(b"data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def _stream_tool_calls(self, calls: List[Dict]) -> None:
+        """Stream tool calls as server-sent events, each call's arguments split over two chunks"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for index, call in enumerate(calls):
+                arguments = call["function"]["arguments"]
+                half = len(arguments) // 2
+                fragments = [{"index": index, "id": call["id"], "type": "function",
+                              "function": {"name": call["function"]["name"], "arguments": arguments[:half]}},
+                             {"index": index, "function": {"arguments": arguments[half:]}}]
+                for fragment in fragments:
+                    time.sleep(self.server.token_delay())
+                    data = json.dumps({"object": "chat.completion.chunk",
+                                       "choices": [{"index": 0, "delta": {"tool_calls": [fragment]}}]})
+                    self._write_chunk(f"data: {data}\n\n".encode())
+            self._write_chunk(b"data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status: int, payload: Dict) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Create the command line parser"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--ttft", default="lognormal:150:0.4", help="time to first token distribution (ms)")
+    parser.add_argument("--token-delay", default="fixed:15", help="delay between streamed tokens (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--script", help="JSON reply script (default: route on 'route me to <agent>')")
+    parser.add_argument("--model", default="mock-model")
+    parser.add_argument("--seed", type=int, default=None)
+    return parser
+
+
+def create_server(args: argparse.Namespace) -> MockBackendServer:
+    """Create a mock backend from parsed command line arguments"""
+    rng = random.Random(args.seed)
+    script = DEFAULT_SCRIPT
+    if args.script:
+        with open(args.script, "r", encoding="utf-8") as f:
+            script = json.load(f)
+    return MockBackendServer(
+        (args.host, args.port), MockScript(script),
+        ttft=parse_distribution(args.ttft, rng),
+        token_delay=parse_distribution(args.token_delay, rng),
+        error_rate=args.error_rate, error_status=args.error_status, drop_rate=args.drop_rate,
+        model=args.model, seed=args.seed,
+    )
+
+
+def main() -> None:
+    server = create_server(build_parser().parse_args())
+    host, port = server.server_address[:2]
+    print(f"Mock backend listening on http://{host}:{port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
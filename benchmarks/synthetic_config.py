@@ -0,0 +1,47 @@
+"""
+Synthetic Config - Agent configs shaped like department trees, shared by the benchmarks that need graphs
+of arbitrary size (bench_path_finder.py, microbench.py).
+"""
+
+import random
+from typing import Dict
+
+
+def build_synthetic_config(agent_count: int, branching: int = 4, extra_rules: int = 2, seed: int = 7,
+                           child_rules: bool = False) -> Dict:
+    """
+    Create an agent config shaped like a department tree with cross-department transition rules
+
+    Args:
+        agent_count: Number of agents; agent_0 is the root
+        branching: Children per agent
+        extra_rules: Transition rules per agent to randomly chosen agents anywhere in the tree
+        seed: Seed for the random rule targets, so every run builds the same graph
+        child_rules: Also give every agent a transition rule to each of its children
+
+    Returns:
+        Dict: Config in the agent_config.json format
+    """
+    rng = random.Random(seed)
+    names = [f"agent_{i}" for i in range(agent_count)]
+    agents = []
+    for i, name in enumerate(names):
+        parent = names[(i - 1) // branching] if i else None
+        rules = {}
+        if parent:
+            rules["back"] = parent
+        if child_rules:
+            for child in range(i * branching + 1, min(agent_count, i * branching + branching + 1)):
+                rules[f"child_{child}"] = names[child]
+        for r in range(extra_rules):
+            rules[f"intent_{r}"] = names[rng.randrange(agent_count)]
+        agents.append({
+            "agent_name": name,
+            "agent_tools": [],
+            "agent_system_prompt": f"You are {name}. Always respond within 100 words.",
+            "temperature": 0.3,
+            "is_root": i == 0,
+            "parent_agent": parent,
+            "transition_rules": rules
+        })
+    return {"agents": agents}
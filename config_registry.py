@@ -0,0 +1,107 @@
+"""
+Config Registry Module
+
+This module parses agent_config.json once into an immutable compiled object
+holding the agent list, per-agent settings, tool schemas, the rendered graph
+structure prompt and the path finder. Graph building, agents, transition
+management and the API all share the same compiled instance.
+"""
+
+import copy
+import json
+import os
+import threading
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+
+from agent_path_finder import AgentPathFinder
+from dynamic_graph_generator import DynamicGraphStructureGenerator
+
+DEFAULT_CONFIG_FILE = "agent_config.json"
+
+
+class CompiledAgentConfig:
+    """Parsed, read-only view of an agent configuration"""
+
+    def __init__(self, raw_config: Dict, source: Optional[str] = None):
+        """
+        Compile a configuration dictionary
+
+        Args:
+            raw_config: Parsed agent configuration (copied, not referenced)
+            source: Path the configuration was loaded from, if any
+        """
+        raw_config = copy.deepcopy(raw_config)
+        self.source = source
+        self.raw: Mapping = MappingProxyType(raw_config)
+        agents = raw_config.get("agents", [])
+        self.agent_names: Tuple[str, ...] = tuple(agent["agent_name"] for agent in agents)
+        self.root_agent: Optional[str] = next(
+            (agent["agent_name"] for agent in agents if agent.get("is_root", False)), None)
+        self.agents: Mapping[str, Dict] = MappingProxyType({agent["agent_name"]: agent for agent in agents})
+        # Completion agents and per-turn limits of the transition executor (see TransitionManager)
+        self.transition_settings: Mapping = MappingProxyType(dict(raw_config.get("transitions", {})))
+        self.tool_schemas: Mapping[str, Tuple[Dict, ...]] = MappingProxyType({
+            agent["agent_name"]: tuple(agent.get("agent_tools", [])) for agent in agents
+        })
+        self.graph_structure_prompt: str = DynamicGraphStructureGenerator(
+            config=raw_config).generate_graph_structure_prompt()
+        self.path_finder = AgentPathFinder(agents_config=raw_config)
+
+    def get_agent(self, agent_name: str) -> Optional[Dict]:
+        """Get the configuration entry of an agent (must not be modified)"""
+        return self.agents.get(agent_name)
+
+
+_compiled_configs: Dict[str, CompiledAgentConfig] = {}
+_compiled_configs_lock = threading.Lock()
+
+
+def compile_agent_config(config_file: str = DEFAULT_CONFIG_FILE) -> CompiledAgentConfig:
+    """
+    Read and compile a configuration file without sharing the result
+
+    Args:
+        config_file: Path to the agent configuration JSON file
+
+    Returns:
+        CompiledAgentConfig: A new compiled configuration; see publish_agent_config
+    """
+    try:
+        with open(config_file, 'r') as f:
+            raw_config = json.load(f)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Configuration file {config_file} not found")
+    except json.JSONDecodeError:
+        raise ValueError(f"Invalid JSON in configuration file {config_file}")
+    return CompiledAgentConfig(raw_config, source=config_file)
+
+
+def publish_agent_config(config: CompiledAgentConfig) -> None:
+    """
+    Make a compiled configuration the one load_agent_config returns for its file
+
+    Args:
+        config: Configuration returned by compile_agent_config
+    """
+    with _compiled_configs_lock:
+        _compiled_configs[os.path.abspath(config.source or DEFAULT_CONFIG_FILE)] = config
+
+
+def load_agent_config(config_file: str = DEFAULT_CONFIG_FILE, reload: bool = False) -> CompiledAgentConfig:
+    """
+    Get the compiled configuration for a file, parsing it only on first use
+
+    Args:
+        config_file: Path to the agent configuration JSON file
+        reload: Re-read and recompile the file even if it is cached
+
+    Returns:
+        CompiledAgentConfig: The shared compiled configuration
+    """
+    key = os.path.abspath(config_file)
+    with _compiled_configs_lock:
+        compiled = _compiled_configs.get(key)
+        if compiled is None or reload:
+            compiled = _compiled_configs[key] = compile_agent_config(config_file)
+        return compiled
@@ -0,0 +1,149 @@
+"""
+Config Reloader Module
+
+This module rebuilds the agent graph from agent_config.json off the request
+path and swaps it into the session manager atomically. The new compiled
+config replaces the shared one (see load_agent_config) only after its graph
+has been built and swapped in, so a config that fails to build is never
+picked up elsewhere. Reloads can be triggered explicitly (e.g. from an admin
+endpoint) or by a background thread that watches the file's modification time.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from config_registry import compile_agent_config, publish_agent_config
+from json_graph_builder import JSONGraphBuilder
+from session_manager import SessionManager
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigReloader:
+    """Builds new graph versions from the config file and swaps them in"""
+
+    def __init__(self, session_manager: SessionManager, config_file: str = "agent_config.json",
+                 history_size: int = 20):
+        """
+        Initialize the reloader
+
+        Args:
+            session_manager: Session manager whose topology is replaced on reload
+            config_file: Path to the agent configuration JSON file
+            history_size: Number of reload reports to keep
+        """
+        self.session_manager = session_manager
+        self.config_file = config_file
+        self.history_size = history_size
+        self._reports: List[Dict] = []
+        self._content_hash = self._hash_file()
+        self._reload_lock = threading.Lock()
+        self._watch_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    def _hash_file(self) -> Optional[str]:
+        """Hash the config file's content, or None if it cannot be read"""
+        try:
+            with open(self.config_file, 'rb') as f:
+                return hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            return None
+
+    def reload(self, force: bool = False) -> Dict:
+        """
+        Rebuild the graph from the config file and swap it in
+
+        Blocking; call it from a worker thread rather than the event loop.
+
+        Args:
+            force: Rebuild even if the file content has not changed
+
+        Returns:
+            Dict: Report with the new version, timings and agent count
+        """
+        with self._reload_lock:
+            start = time.perf_counter()
+            content_hash = self._hash_file()
+            if not force and content_hash == self._content_hash:
+                return {
+                    "reloaded": False,
+                    "version": self.session_manager.version,
+                    "reason": "configuration unchanged"
+                }
+
+            # Nothing is published until the new graph is live; a failure leaves the old version in place
+            config = compile_agent_config(self.config_file)
+            compiled = time.perf_counter()
+            graph = JSONGraphBuilder.build_graph_from_config(config)
+            built = time.perf_counter()
+            version = self.session_manager.swap_template(graph)
+            publish_agent_config(config)
+            swapped = time.perf_counter()
+            self._content_hash = content_hash
+
+            report = {
+                "reloaded": True,
+                "version": version,
+                "agent_count": len(config.agent_names),
+                "compile_ms": round((compiled - start) * 1000, 3),
+                "build_ms": round((built - compiled) * 1000, 3),
+                "swap_ms": round((swapped - built) * 1000, 3),
+                "total_ms": round((swapped - start) * 1000, 3),
+                "completed_at": time.time()
+            }
+            self._reports.append(report)
+            del self._reports[:-self.history_size]
+            logger.info("Reloaded agent config", extra={"config_file": self.config_file, "version": version,
+                                                        "total_ms": report["total_ms"]})
+            return report
+
+    def get_reports(self) -> List[Dict]:
+        """Get the most recent reload reports, oldest first"""
+        return list(self._reports)
+
+    def start_watching(self, interval_seconds: float = 2.0) -> None:
+        """
+        Start a background thread that reloads when the file changes
+
+        Args:
+            interval_seconds: How often to check the file's modification time
+        """
+        if self._watch_thread is not None:
+            return
+        self._stop_event.clear()
+        self._watch_thread = threading.Thread(
+            target=self._watch, args=(interval_seconds,), name="config-reloader", daemon=True)
+        self._watch_thread.start()
+
+    def stop_watching(self) -> None:
+        """Stop the background watch thread"""
+        self._stop_event.set()
+        if self._watch_thread is not None:
+            self._watch_thread.join()
+            self._watch_thread = None
+
+    def _watch(self, interval_seconds: float) -> None:
+        """Poll the config file and reload on modification"""
+        last_mtime = self._mtime()
+        while not self._stop_event.wait(interval_seconds):
+            mtime = self._mtime()
+            if mtime == last_mtime:
+                continue
+            last_mtime = mtime
+            try:
+                self.reload()
+            except Exception as e:
+                # Keep serving the current version if the new file is invalid
+                logger.error("Config reload failed, keeping the current version", extra={
+                    "config_file": self.config_file, "version": self.session_manager.version, "error": str(e)})
+
+    def _mtime(self) -> Optional[float]:
+        """Get the config file's modification time, or None if it is missing"""
+        try:
+            return os.stat(self.config_file).st_mtime
+        except OSError:
+            return None
@@ -0,0 +1,208 @@
+"""
+Context Window Module
+
+This module bounds conversation history by an estimated token budget. The
+most recent messages are kept verbatim; older ones are folded, one at a time,
+into a compact running summary that is itself bounded. Only this window is
+sent to the backend.
+"""
+
+import sys
+from collections import deque
+from typing import Deque, Dict, Iterator, List, Optional
+
+DEFAULT_TOKEN_BUDGET = 2048
+MESSAGE_OVERHEAD_TOKENS = 4
+SUMMARY_SNIPPET_CHARS = 120
+SUMMARY_PREFIX = "Summary of earlier conversation:"
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of a text locally (about four characters per token)"""
+    return (len(text) + 3) // 4
+
+
+def estimate_message_tokens(message: Dict) -> int:
+    """Estimate the tokens a chat message costs, including per-message overhead"""
+    return estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+class ContextWindow:
+    """Recent messages within a token budget plus an incrementally maintained summary"""
+
+    def __init__(self, token_budget: int = DEFAULT_TOKEN_BUDGET, summary_ratio: float = 0.25,
+                 min_recent: int = 2):
+        """
+        Initialize an empty window
+
+        Args:
+            token_budget: Estimated tokens the summary and recent messages may use together
+            summary_ratio: Share of the budget reserved for the summary of older messages
+            min_recent: Messages always kept verbatim, even if they exceed the budget
+        """
+        self.token_budget = token_budget
+        self.summary_budget = int(token_budget * summary_ratio)
+        self.min_recent = min_recent
+        self._recent: Deque[Dict] = deque()
+        self._recent_tokens: Deque[int] = deque()
+        self._recent_total = 0
+        self._summary: Deque[str] = deque()
+        self._summary_tokens: Deque[int] = deque()
+        self._summary_total = 0
+        self.folded_count = 0
+        self._next_id = 0
+
+    def append(self, message: Dict) -> int:
+        """
+        Add a message, folding the oldest messages into the summary while over budget
+
+        Args:
+            message: Chat message with role and content; an "id" is assigned to it
+
+        Returns:
+            int: The message's ID, unique within this window
+        """
+        message["id"] = self._next_id
+        self._next_id += 1
+        tokens = estimate_message_tokens(message)
+        self._recent.append(message)
+        self._recent_tokens.append(tokens)
+        self._recent_total += tokens
+        while len(self._recent) > self.min_recent and self._recent_total + self._summary_total > self.token_budget:
+            self._fold(self._recent.popleft())
+            self._recent_total -= self._recent_tokens.popleft()
+        return message["id"]
+
+    def _fold(self, message: Dict) -> None:
+        """Fold one message into the summary, dropping the oldest summary lines if it grows too large"""
+        line = self.brief(message)
+        tokens = estimate_tokens(line) + 1
+        self._summary.append(line)
+        self._summary_tokens.append(tokens)
+        self._summary_total += tokens
+        self.folded_count += 1
+        while len(self._summary) > 1 and self._summary_total > self.summary_budget:
+            self._summary.popleft()
+            self._summary_total -= self._summary_tokens.popleft()
+
+    @staticmethod
+    def brief(message: Dict) -> str:
+        """Condense a message into one summary line"""
+        content = " ".join(message["content"].split())
+        if len(content) > SUMMARY_SNIPPET_CHARS:
+            content = content[:SUMMARY_SNIPPET_CHARS] + "..."
+        return f"{message['role']}: {content}"
+
+    def summary_text(self) -> str:
+        """Get the summary of messages no longer kept verbatim"""
+        return "\n".join(self._summary)
+
+    def messages(self) -> List[Dict]:
+        """Get the messages kept verbatim, oldest first"""
+        return list(self._recent)
+
+    def to_messages(self, system_message: Optional[str] = None, token_budget: Optional[int] = None,
+                    context_message: Optional[str] = None) -> List[Dict]:
+        """
+        Build the message list to send to the backend
+
+        Args:
+            system_message: Static system prompt to put first, if any; keep it identical across
+                requests so the backend can reuse its cached prefix
+            token_budget: Tighter budget for this call; recent messages that do not fit are
+                condensed into the summary message instead of being sent verbatim
+            context_message: Request-specific context, sent as a system message after the summary
+
+        Returns:
+            List of chat messages: system prompt, summary and context (if any), and recent messages
+        """
+        recent = list(self._recent)
+        summary_lines = list(self._summary)
+        if token_budget is not None and token_budget < self._recent_total + self._summary_total:
+            available = token_budget - self._summary_total
+            keep, used = 0, 0
+            for tokens in reversed(self._recent_tokens):
+                if keep >= self.min_recent and used + tokens > available:
+                    break
+                keep += 1
+                used += tokens
+            summary_lines.extend(self.brief(message) for message in recent[:len(recent) - keep])
+            recent = recent[len(recent) - keep:]
+
+        messages = []
+        if system_message:
+            messages.append({"role": "system", "content": system_message})
+        if summary_lines:
+            messages.append({"role": "system", "content": SUMMARY_PREFIX + "\n" + "\n".join(summary_lines)})
+        if context_message:
+            messages.append({"role": "system", "content": context_message})
+        messages.extend({"role": message["role"], "content": message["content"]} for message in recent)
+        return messages
+
+    def to_state(self) -> Dict:
+        """
+        Get the window's contents as JSON-serializable data
+
+        Returns:
+            Dictionary with the recent messages, summary lines, folded count and next message ID
+        """
+        return {
+            "recent": [dict(message) for message in self._recent],
+            "summary": list(self._summary),
+            "folded_count": self.folded_count,
+            "next_id": self._next_id,
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict, token_budget: int = DEFAULT_TOKEN_BUDGET) -> "ContextWindow":
+        """
+        Recreate a window from to_state() data
+
+        Token estimates are recomputed, and the window is not re-folded if the
+        budget has shrunk since the state was saved; the next append does that.
+
+        Args:
+            state: Data returned by to_state()
+            token_budget: Budget of the recreated window
+
+        Returns:
+            ContextWindow: The restored window
+        """
+        window = cls(token_budget)
+        for message in state.get("recent", []):
+            tokens = estimate_message_tokens(message)
+            window._recent.append(dict(message))
+            window._recent_tokens.append(tokens)
+            window._recent_total += tokens
+        for line in state.get("summary", []):
+            tokens = estimate_tokens(line) + 1
+            window._summary.append(line)
+            window._summary_tokens.append(tokens)
+            window._summary_total += tokens
+        window.folded_count = state.get("folded_count", 0)
+        window._next_id = state.get("next_id", len(window._recent))
+        return window
+
+    def estimated_tokens(self) -> int:
+        """Get the estimated tokens of the summary and recent messages"""
+        return self._recent_total + self._summary_total
+
+    def memory_size(self) -> int:
+        """Roughly estimate the memory held by the window, in bytes"""
+        size = sys.getsizeof(self._recent) + sys.getsizeof(self._summary)
+        for message in self._recent:
+            size += sys.getsizeof(message) + sys.getsizeof(message["content"])
+        for line in self._summary:
+            size += sys.getsizeof(line)
+        return size
+
+    def __len__(self) -> int:
+        return len(self._recent)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self._recent)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self._recent)[index]
+        return self._recent[index]
@@ -4,14 +4,16 @@ Dynamic Graph Structure Generator - Creates graph structure prompts from agent_c
 """
 
 import json
-from typing import Dict, List, Set
-from transition_manager import TRANSITION_PATH_SEPARATOR
+from typing import Dict, List, Optional, Set
+from transition_manager import FANOUT_SEPARATOR, TRANSITION_PATH_SEPARATOR
 
 class DynamicGraphStructureGenerator:
-    def __init__(self, config_file: str):
-        """Initialize with agent configuration file"""
-        with open(config_file, 'r') as f:
-            self.config = json.load(f)
+    def __init__(self, config_file: Optional[str] = None, config: Optional[Dict] = None):
+        """Initialize with an agent configuration file or an already parsed configuration"""
+        if config is None:
+            with open(config_file, 'r') as f:
+                config = json.load(f)
+        self.config = config
         self.agents = self.config.get('agents', [])
         
     def generate_graph_structure_prompt(self) -> str:
@@ -44,10 +46,12 @@ GRAPH STRUCTURE:
 - Use exact syntax for transitions:
   * Single transition: TRANSITION_TO:agent_name
   * Multi-step: TRANSITION_TO:agent1{TRANSITION_PATH_SEPARATOR}agent2{TRANSITION_PATH_SEPARATOR}agent3
+  * Several departments at once: TRANSITION_TO:agent1{FANOUT_SEPARATOR}agent2 (for compound requests; each agent answers its part)
   * System will automatically find the best path if direct connection doesn't exist
 - Examples: 
   * TRANSITION_TO:it_agent
   * TRANSITION_TO:booking_agent{TRANSITION_PATH_SEPARATOR}scheduler_agent
+  * TRANSITION_TO:booking_agent{FANOUT_SEPARATOR}visitor_agent
 
 TRANSITION GUIDELINES:
 - Only transition when users have SPECIFIC needs requiring specialized agents
@@ -0,0 +1,225 @@
+"""
+Hedging Module
+
+This module cuts tail latency on backend calls. When a call has not produced
+its first token (or response) within an adaptive threshold - a running
+percentile of that agent's recent latencies - a duplicate is sent to another
+backend, whichever answers first is used and the other is cancelled. The
+share of hedged calls is capped by a budget so hedging cannot multiply load.
+"""
+
+import contextvars
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Iterator, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+_END = object()
+
+
+class HedgePolicy:
+    """Per-agent latency percentiles, the hedging budget and hedged iteration"""
+
+    def __init__(self, budget: float = 0.05, percentile: float = 0.95, min_samples: int = 20,
+                 window: int = 200, budget_window: int = 1000):
+        """
+        Initialize the policy
+
+        Args:
+            budget: Maximum fraction of calls that may be hedged
+            percentile: Latency percentile (0-1) after which a call is hedged
+            min_samples: Latency samples an agent needs before its calls are hedged
+            window: Most recent latency samples kept per agent
+            budget_window: Approximate number of recent calls the budget is measured over
+        """
+        self.budget = budget
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.window = window
+        self.budget_window = budget_window
+        self._lock = threading.Lock()
+        self._samples: Dict[Tuple[str, str], Deque[float]] = {}
+        self._calls = 0.0
+        self._hedges = 0.0
+        self.total_calls = 0
+        self.total_hedges = 0
+        self.hedge_wins = 0
+        self.budget_denials = 0
+
+    def record_latency(self, agent_name: str, kind: str, seconds: float) -> None:
+        """
+        Record the user-visible latency of a call
+
+        Args:
+            agent_name: Agent that made the call
+            kind: "first_token" for streamed calls, "response" otherwise
+            seconds: Time until the first token or the response
+        """
+        with self._lock:
+            samples = self._samples.get((agent_name, kind))
+            if samples is None:
+                samples = self._samples[(agent_name, kind)] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def threshold(self, agent_name: str, kind: str) -> Optional[float]:
+        """Get the latency after which a call should be hedged, or None until enough samples exist"""
+        with self._lock:
+            samples = self._samples.get((agent_name, kind))
+            if samples is None or len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile))]
+
+    def _start_call(self) -> None:
+        """Count a call that may be hedged, halving old counts so the budget follows recent traffic"""
+        with self._lock:
+            self._calls += 1
+            self.total_calls += 1
+            if self._calls >= 2 * self.budget_window:
+                self._calls /= 2
+                self._hedges /= 2
+
+    def _take_budget(self) -> bool:
+        """Reserve one hedge if the hedged fraction stays within the budget"""
+        with self._lock:
+            if self._hedges + 1 > self.budget * self._calls:
+                self.budget_denials += 1
+                return False
+            self._hedges += 1
+            self.total_hedges += 1
+            return True
+
+    def _refund_budget(self) -> None:
+        """Return a hedge reserved with _take_budget that could not be sent"""
+        with self._lock:
+            self._hedges -= 1
+            self.total_hedges -= 1
+
+    def iterate(self, start_attempt: Callable[[int], Iterator[T]], cancel_attempt: Callable[[int], None],
+                threshold: float, acquire_capacity: Callable[[], bool]) -> Iterator[T]:
+        """
+        Iterate over a call's output, hedging it if the first item is late
+
+        Each attempt is driven on its own thread. The first attempt to produce
+        an item wins; the other is cancelled and its output discarded.
+
+        Args:
+            start_attempt: Function starting attempt 0 (primary) or 1 (hedge) and returning its items
+            cancel_attempt: Function aborting an attempt, e.g. by closing its connection
+            threshold: Seconds to wait for the primary's first item before hedging
+            acquire_capacity: Function reserving backend capacity for the hedge; returns False if there is none
+
+        Yields:
+            The winning attempt's items
+        """
+        self._start_call()
+        items: queue.Queue = queue.Queue()
+        stopped = [threading.Event(), threading.Event()]
+
+        def drive(index: int) -> None:
+            try:
+                for item in start_attempt(index):
+                    items.put((index, item, None))
+                    if stopped[index].is_set():
+                        break
+            except BaseException as error:
+                items.put((index, _END, error))
+                return
+            items.put((index, _END, None))
+
+        def launch(index: int) -> None:
+            threading.Thread(target=contextvars.copy_context().run, args=(drive, index),
+                             name=f"hedge-attempt-{index}", daemon=True).start()
+
+        launch(0)
+        running = {0}
+        winner: Optional[int] = None
+        hedge_decided = False
+        deadline = time.monotonic() + threshold
+        try:
+            while True:
+                timeout = None if hedge_decided or winner is not None else max(0.0, deadline - time.monotonic())
+                try:
+                    index, item, error = items.get(timeout=timeout)
+                except queue.Empty:
+                    hedge_decided = True
+                    if self._take_budget():
+                        if acquire_capacity():
+                            launch(1)
+                            running.add(1)
+                        else:
+                            self._refund_budget()
+                    continue
+
+                if item is _END:
+                    running.discard(index)
+                if winner is None:
+                    if item is _END:
+                        if running and error is not None:
+                            continue  # The other attempt may still succeed
+                        winner = index
+                    else:
+                        winner = index
+                        hedge_decided = True
+                        if index == 1:
+                            with self._lock:
+                                self.hedge_wins += 1
+                        for other in running - {index}:
+                            stopped[other].set()
+                            cancel_attempt(other)
+
+                if index != winner:
+                    continue
+                if item is _END:
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            # Stop whatever is still running, e.g. when the consumer closes the iterator early
+            for index in running:
+                stopped[index].set()
+                cancel_attempt(index)
+
+    def get_stats(self) -> Dict:
+        """Get hedging counters and the current per-agent thresholds"""
+        with self._lock:
+            keys = list(self._samples)
+            stats = {
+                "budget": self.budget,
+                "percentile": self.percentile,
+                "calls": self.total_calls,
+                "hedged": self.total_hedges,
+                "hedge_wins": self.hedge_wins,
+                "budget_denials": self.budget_denials,
+                "recent_hedged_fraction": round(self._hedges / self._calls, 4) if self._calls else 0.0,
+            }
+        thresholds = {}
+        for agent_name, kind in keys:
+            threshold = self.threshold(agent_name, kind)
+            thresholds.setdefault(agent_name, {})[kind + "_ms"] = (
+                round(threshold * 1000, 3) if threshold is not None else None)
+        stats["thresholds"] = thresholds
+        return stats
+
+
+_shared_policy: Optional[HedgePolicy] = None
+_shared_policy_lock = threading.Lock()
+
+
+def get_hedge_policy() -> HedgePolicy:
+    """Get the process-wide hedge policy, configured from LLM_HEDGE_* environment variables"""
+    global _shared_policy
+    if _shared_policy is None:
+        with _shared_policy_lock:
+            if _shared_policy is None:
+                _shared_policy = HedgePolicy(
+                    budget=float(os.environ.get("LLM_HEDGE_BUDGET", "0.05")),
+                    percentile=float(os.environ.get("LLM_HEDGE_PERCENTILE", "0.95")),
+                    min_samples=int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", "20")),
+                )
+    return _shared_policy
@@ -0,0 +1,156 @@
+"""
+HTTP Pool Module
+
+This module provides a shared keep-alive HTTP client for backend calls. It
+reuses TCP/TLS connections per host, bounds the number of connections per
+host, applies separate connect and read timeouts, and counts how often a
+request could reuse a pooled connection.
+"""
+
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+class PoolStats:
+    """Thread-safe counters of pooled connection reuse"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.pool_hits = 0
+        self.pool_misses = 0
+
+    def record(self, hit: bool) -> None:
+        """Record one connection checkout"""
+        with self._lock:
+            self.requests += 1
+            if hit:
+                self.pool_hits += 1
+            else:
+                self.pool_misses += 1
+
+    def snapshot(self) -> Dict:
+        """Get a consistent copy of the counters"""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "pool_hits": self.pool_hits,
+                "pool_misses": self.pool_misses,
+                "hit_rate": self.pool_hits / self.requests if self.requests else 0.0,
+            }
+
+
+def _counting_pool_class(base_class, stats: PoolStats):
+    """Create a connection pool class that reports checkouts to stats"""
+
+    class CountingConnectionPool(base_class):
+        def _new_conn(self):
+            conn = super()._new_conn()
+            conn._pool_fresh = True
+            return conn
+
+        def _get_conn(self, timeout=None):
+            conn = super()._get_conn(timeout=timeout)
+            fresh = getattr(conn, "_pool_fresh", False)
+            conn._pool_fresh = False
+            # A pooled connection whose socket was dropped has to reconnect
+            stats.record(hit=not fresh and getattr(conn, "sock", None) is not None)
+            return conn
+
+    return CountingConnectionPool
+
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools report reuse statistics"""
+
+    def __init__(self, stats: PoolStats, **kwargs):
+        self._stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _counting_pool_class(HTTPConnectionPool, self._stats),
+            "https": _counting_pool_class(HTTPSConnectionPool, self._stats),
+        }
+
+
+class PooledHTTPClient:
+    """Keep-alive HTTP client with per-host connection limits"""
+
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 32,
+                 connect_timeout: float = 5.0, read_timeout: float = 30.0, pool_block: bool = True):
+        """
+        Initialize the pooled client
+
+        Args:
+            pool_connections: Number of per-host pools to keep
+            pool_maxsize: Maximum open connections per host
+            connect_timeout: Seconds to wait for a connection to be established
+            read_timeout: Seconds to wait between bytes of the response
+            pool_block: Wait for a free connection instead of exceeding pool_maxsize
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.timeout: Tuple[float, float] = (connect_timeout, read_timeout)
+        self.stats = PoolStats()
+        self._session = requests.Session()
+        self._session.headers["Connection"] = "keep-alive"
+        adapter = _PooledAdapter(self.stats, pool_connections=pool_connections,
+                                 pool_maxsize=pool_maxsize, pool_block=pool_block)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    @classmethod
+    def from_env(cls) -> "PooledHTTPClient":
+        """Create a client configured from LLM_POOL_* and LLM_*_TIMEOUT environment variables"""
+        return cls(
+            pool_connections=int(os.environ.get("LLM_POOL_CONNECTIONS", "10")),
+            pool_maxsize=int(os.environ.get("LLM_POOL_MAXSIZE", "32")),
+            connect_timeout=float(os.environ.get("LLM_CONNECT_TIMEOUT", "5")),
+            read_timeout=float(os.environ.get("LLM_READ_TIMEOUT", "30")),
+        )
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """Send a POST request over a pooled connection"""
+        kwargs.setdefault("timeout", self.timeout)
+        return self._session.post(url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """Send a GET request over a pooled connection"""
+        kwargs.setdefault("timeout", self.timeout)
+        return self._session.get(url, **kwargs)
+
+    def get_stats(self) -> Dict:
+        """Get pool reuse counters and the pool configuration"""
+        stats = self.stats.snapshot()
+        stats.update({
+            "pool_connections": self.pool_connections,
+            "pool_maxsize": self.pool_maxsize,
+            "connect_timeout": self.timeout[0],
+            "read_timeout": self.timeout[1],
+        })
+        return stats
+
+    def close(self) -> None:
+        """Close all pooled connections"""
+        self._session.close()
+
+
+_shared_client: Optional[PooledHTTPClient] = None
+_shared_client_lock = threading.Lock()
+
+
+def get_shared_client() -> PooledHTTPClient:
+    """Get the process-wide pooled client used by all agents"""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_client_lock:
+            if _shared_client is None:
+                _shared_client = PooledHTTPClient.from_env()
+    return _shared_client
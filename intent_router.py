@@ -0,0 +1,114 @@
+"""
+Intent Router Module
+
+This module provides a fast pre-LLM router. All intent patterns of the graph
+are compiled into a single regular expression that is matched in one pass
+over the user's message; when exactly one agent matches, the message can be
+routed straight to it without asking the root agent's LLM first. A message
+that matches several departments, or joins several requests, is left to the
+LLM, which can fan it out to all the agents it needs.
+"""
+
+import re
+from typing import Dict, List, Optional
+
+# Explicit per-agent patterns are strong evidence, bare transition rule keywords are weak
+PATTERN_WEIGHT = 2
+KEYWORD_WEIGHT = 1
+
+# Conjunctions joining several requests ("a room and a pass for my guest"); the second part may match no pattern
+COMPOUND_PATTERN = r"\b(?:and|also|plus|as well as)\b|&"
+
+
+class IntentRouter:
+    """Scores agents against a message with one compiled multi-pattern regex"""
+
+    def __init__(self, intent_patterns: Dict[str, List[str]], keyword_rules: Optional[Dict[str, str]] = None,
+                 min_score: int = 2, min_margin: int = PATTERN_WEIGHT, exclusive: bool = True,
+                 compound_pattern: Optional[str] = COMPOUND_PATTERN):
+        """
+        Compile the router
+
+        Args:
+            intent_patterns: Mapping from agent name to regex patterns that indicate it (case-insensitive)
+            keyword_rules: Transition rules (intent keyword -> agent name) used as weak keyword evidence;
+                keywords of two letters or less are treated as upper-case acronyms (e.g. "IT", "HR")
+            min_score: Minimum score the best agent needs to be routed to
+            min_margin: Minimum lead the best agent needs over the runner-up
+            exclusive: Only route when no other agent matched at all, so a request that
+                touches several departments is never cut down to one of them
+            compound_pattern: Regex that marks a message as several requests, which is never routed
+                (None routes compound messages like any other)
+        """
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.exclusive = exclusive
+        self._compound_regex = re.compile(compound_pattern, re.IGNORECASE) if compound_pattern else None
+        self._group_targets: List[tuple] = []
+        alternatives = []
+
+        for agent_name, patterns in intent_patterns.items():
+            for pattern in patterns:
+                re.compile(pattern)  # Fail early with the offending pattern
+                alternatives.append(f"(?P<g{len(self._group_targets)}>{pattern})")
+                self._group_targets.append((agent_name, PATTERN_WEIGHT))
+
+        for keyword, agent_name in (keyword_rules or {}).items():
+            if len(keyword) <= 2:
+                pattern = rf"(?-i:\b{re.escape(keyword.upper())}\b)"
+            else:
+                pattern = rf"\b{re.escape(keyword)}\b"
+            alternatives.append(f"(?P<g{len(self._group_targets)}>{pattern})")
+            self._group_targets.append((agent_name, KEYWORD_WEIGHT))
+
+        self._regex = re.compile("|".join(alternatives), re.IGNORECASE) if alternatives else None
+        self.routed = 0
+        self.fallbacks = 0
+        self.ambiguous = 0
+
+    def score(self, message: str) -> Dict[str, int]:
+        """
+        Score every agent whose patterns occur in the message
+
+        Args:
+            message: The user's message
+
+        Returns:
+            Mapping from agent name to accumulated score
+        """
+        scores: Dict[str, int] = {}
+        if self._regex is None:
+            return scores
+        for match in self._regex.finditer(message):
+            agent_name, weight = self._group_targets[int(match.lastgroup[1:])]
+            scores[agent_name] = scores.get(agent_name, 0) + weight
+        return scores
+
+    def route(self, message: str) -> Optional[Dict]:
+        """
+        Decide whether a message can be routed without the LLM
+
+        Args:
+            message: The user's message
+
+        Returns:
+            Dictionary with the target agent and scores if the router is confident, None otherwise
+        """
+        scores = self.score(message)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        if ranked:
+            best_agent, best_score = ranked[0]
+            runner_up = ranked[1][1] if len(ranked) > 1 else 0
+            compound = self._compound_regex is not None and self._compound_regex.search(message) is not None
+            if (runner_up and self.exclusive) or compound:
+                self.ambiguous += 1
+            elif best_score >= self.min_score and best_score - runner_up >= self.min_margin:
+                self.routed += 1
+                return {"target_agent": best_agent, "score": best_score, "scores": scores}
+        self.fallbacks += 1
+        return None
+
+    def get_stats(self) -> Dict:
+        """Get the number of routed messages and LLM fallbacks (ambiguous: several agents or requests)"""
+        return {"patterns": len(self._group_targets), "routed": self.routed, "fallbacks": self.fallbacks,
+                "ambiguous": self.ambiguous}
@@ -1,18 +1,23 @@
-import json
-from typing import Dict, List
+from typing import Dict, List, Optional
 from agent_graph import AgentGraph
 from agents.voice_agent import ConversationalAgent
+from config_registry import CompiledAgentConfig, load_agent_config
 
 class JSONGraphBuilder:
     @staticmethod
-    def create_agent_from_json(json_data: Dict) -> ConversationalAgent:
+    def create_agent_from_json(json_data: Dict, graph_structure_prompt: Optional[str] = None) -> ConversationalAgent:
         """Create a ConversationalAgent from a JSON object."""
         return ConversationalAgent(
             agent_name=json_data.get("agent_name", "custom_agent"),
             agent_tools=json_data.get("agent_tools", []),
             agent_system_prompt=json_data.get("agent_system_prompt", ""),
             temperature=json_data.get("temperature", 0.3),
-            agent_tool_prompt=json_data.get("agent_tool_prompt", "")
+            agent_tool_prompt=json_data.get("agent_tool_prompt", ""),
+            graph_structure_prompt=graph_structure_prompt,
+            response_cache=json_data.get("response_cache"),
+            context_token_budget=json_data.get("context_token_budget"),
+            priority=json_data.get("priority", 0),
+            hedging=json_data.get("hedging")
         )
 
     @staticmethod
@@ -29,6 +34,9 @@ class JSONGraphBuilder:
                     "agent_system_prompt": "string",
                     "temperature": float,
                     "agent_tool_prompt": "string",
+                    "response_cache": {"enabled": boolean, "ttl_seconds": float},
+                    "intent_patterns": ["regex routing messages straight to this agent"],
+                    "context_token_budget": integer,
                     "is_root": boolean,
                     "parent_agent": "string",
                     "transition_rules": {
@@ -46,15 +54,28 @@ class JSONGraphBuilder:
         Returns:
             AgentGraph: The constructed agent graph
         """
-        with open(json_file, 'r') as f:
-            config = json.load(f)
+        return JSONGraphBuilder.build_graph_from_config(load_agent_config(json_file))
+
+    @staticmethod
+    def build_graph_from_config(config: CompiledAgentConfig) -> AgentGraph:
+        """
+        Build an agent graph from a compiled configuration.
+        
+        Agents share the configuration's rendered graph structure prompt and
+        the graph shares its path finder, so nothing is re-read or re-rendered.
+        
+        Args:
+            config: The compiled agent configuration
             
+        Returns:
+            AgentGraph: The constructed agent graph
+        """
         agents = {}
         root_agent = None
         
         # First pass: Create all agents
-        for agent_data in config["agents"]:
-            agent = JSONGraphBuilder.create_agent_from_json(agent_data)
+        for agent_data in config.raw["agents"]:
+            agent = JSONGraphBuilder.create_agent_from_json(agent_data, config.graph_structure_prompt)
             agents[agent.get_name()] = {
                 "agent": agent,
                 "is_root": agent_data.get("is_root", False),
@@ -74,7 +95,12 @@ class JSONGraphBuilder:
         agent_graph = AgentGraph(
             root_agent,
             transition_rules=agents[root_agent.get_name()]["transition_rules"],
-            intent_patterns={}
+            intent_patterns={
+                agent_data["agent_name"]: agent_data["intent_patterns"]
+                for agent_data in config.raw["agents"] if agent_data.get("intent_patterns")
+            },
+            path_finder=config.path_finder,
+            config=config
         )
         
         # Second pass: Add all agents to the graph
@@ -0,0 +1,273 @@
+"""
+Metrics Module
+
+This module keeps process-wide counters, gauges and histograms and renders
+them in the Prometheus text exposition format for GET /metrics. Recording a
+value is a dictionary lookup and an addition under the metric's own lock,
+cheap enough for every backend call and transition. Gauges owned by other
+components (sessions, backend slots) are read through callbacks only when
+the metrics are scraped.
+"""
+
+import bisect
+import math
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+FIRST_TOKEN_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUEUE_WAIT_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PATH_LENGTH_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 10)
+TURN_CALL_BUCKETS = (0, 1, 2, 3, 4, 5, 6, 8)
+TOOL_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value"""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    """Escape a label value"""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    """A named metric family with a fixed set of label names"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _label_text(self, values: LabelValues, extra: str = "") -> str:
+        """Render a label set, with an optional extra label appended"""
+        pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """Render the metric family in the text exposition format"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, labels: LabelValues = (), amount: float = 1.0) -> None:
+        """
+        Increase the count of a label set
+
+        Args:
+            labels: Label values, in the order of the metric's label names
+            amount: Non-negative amount to add
+        """
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, labels: LabelValues = ()) -> float:
+        """Get the current count of a label set"""
+        with self._lock:
+            return self._values.get(labels, 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{self._label_text(labels)} {_format_value(value)}" for labels, value in items]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, set directly or read from a callback at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], Dict[LabelValues, float]]] = None
+
+    def set(self, value: float, labels: LabelValues = ()) -> None:
+        """Set the value of a label set"""
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, labels: LabelValues = (), amount: float = 1.0) -> None:
+        """Add to the value of a label set"""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, labels: LabelValues = (), amount: float = 1.0) -> None:
+        """Subtract from the value of a label set"""
+        self.inc(labels, -amount)
+
+    def set_function(self, function: Callable[[], Dict[LabelValues, float]]) -> None:
+        """
+        Read the gauge from a callback when scraped instead of from set()/inc()
+
+        Args:
+            function: Returns a mapping from label values to the current value
+        """
+        self._function = function
+
+    def _samples(self) -> List[str]:
+        if self._function is not None:
+            items = sorted(self._function().items())
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        return [f"{self.name}{self._label_text(labels)} {_format_value(value)}" for labels, value in items]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets per label set"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: non-cumulative counts per bucket (last one is +Inf), sum and count
+        self._values: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, labels: LabelValues = ()) -> None:
+        """
+        Record an observation
+
+        Args:
+            value: Observed value (e.g. seconds)
+            labels: Label values, in the order of the metric's label names
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, labels: LabelValues = ()) -> int:
+        """Get the number of observations of a label set"""
+        with self._lock:
+            entry = self._values.get(labels)
+            return entry[2] if entry else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((labels, (list(entry[0]), entry[1], entry[2])) for labels, entry in self._values.items())
+        lines = []
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{self._label_text(labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._label_text(labels)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metric families rendered together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Create and register a counter"""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """Create and register a gauge"""
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        """Create and register a histogram"""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        """Get a registered metric family by name"""
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Render every metric family in the Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+# Process-wide registry and the metrics recorded by the agents, transitions, tools and backend pool
+REGISTRY = MetricsRegistry()
+
+BACKEND_LATENCY = REGISTRY.histogram(
+    "llm_backend_request_seconds", "Duration of backend completion calls, from admission to the last token",
+    ("agent",), LATENCY_BUCKETS)
+FIRST_TOKEN_LATENCY = REGISTRY.histogram(
+    "llm_backend_first_token_seconds", "Time from admission to the first streamed token of backend calls",
+    ("agent",), FIRST_TOKEN_BUCKETS)
+QUEUE_WAIT = REGISTRY.histogram(
+    "llm_backend_queue_wait_seconds", "Time backend calls waited for a governor slot",
+    ("agent",), QUEUE_WAIT_BUCKETS)
+BACKEND_ERRORS = REGISTRY.counter(
+    "llm_backend_errors_total", "Failed backend calls and health probes per backend replica",
+    ("backend", "source"))
+REQUEST_ERRORS = REGISTRY.counter(
+    "llm_request_errors_total", "Backend errors surfaced to users (after failover) per agent", ("agent",))
+RESPONSE_CACHE_LOOKUPS = REGISTRY.counter(
+    "llm_response_cache_lookups_total", "Response cache lookups per agent and result (hit or miss)",
+    ("agent", "result"))
+TRANSITIONS = REGISTRY.counter(
+    "agent_transitions_total", "Agent transitions per edge and cause (transition, completion, intent_router)",
+    ("from_agent", "to_agent", "kind"))
+COMPLETION_TRANSITIONS = REGISTRY.counter(
+    "agent_completion_transitions_total", "Transitions back to a completion agent after a finished task",
+    ("from_agent", "to_agent"))
+TRANSITION_PATH_LENGTH = REGISTRY.histogram(
+    "agent_transition_path_hops", "Hops of multi-step transition paths when they are started",
+    ("type",), PATH_LENGTH_BUCKETS)
+TRANSITIONS_REFUSED = REGISTRY.counter(
+    "agent_transitions_refused_total", "Handoffs refused by the per-turn budget, per cause and refusal "
+    "(self, bounce, cycle, max_hops, max_backend_calls)", ("kind", "refusal"))
+TURN_HOPS = REGISTRY.histogram(
+    "chat_turn_hops", "Agent handoffs per user turn", (), TURN_CALL_BUCKETS)
+TURN_BACKEND_CALLS = REGISTRY.histogram(
+    "chat_turn_backend_calls", "Backend calls (agent responses) per user turn", (), TURN_CALL_BUCKETS)
+TOOL_LATENCY = REGISTRY.histogram(
+    "agent_tool_call_seconds", "Duration of tool executions, excluding time queued for a worker",
+    ("tool",), TOOL_BUCKETS)
+TOOL_CALLS = REGISTRY.counter(
+    "agent_tool_calls_total", "Tool calls per tool and result (ok, error, timeout, cached, unknown)",
+    ("tool", "result"))
+CHAT_TURNS_IN_PROGRESS = REGISTRY.gauge(
+    "chat_turns_in_progress", "Chat turns currently being processed by the API")
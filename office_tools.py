@@ -0,0 +1,163 @@
+"""
+Office Tools Module
+
+This module implements the tools the agents declare in agent_config.json
+(handle_booking, manage_schedule, answer_faq, manage_visitor, ...) against
+in-memory office records, and registers them with a tool registry together
+with their execution options: lookups that do not change anything are
+idempotent and memoized, actions that create records are not.
+"""
+
+import itertools
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from tool_registry import ToolRegistry
+
+FAQ_ANSWERS = {
+    "hours": "The office is open Monday to Friday, 8:00 to 18:00; reception is staffed from 8:30.",
+    "parking": "Visitor parking is on level -1; employees park on levels -2 and -3 with their badge.",
+    "cafeteria": "The cafeteria on the ground floor serves breakfast 8:00-10:00 and lunch 11:30-14:00.",
+    "dress code": "Business casual; client-facing meetings call for business attire.",
+    "wifi": "Connect to OFFICE-GUEST with the password printed on your visitor badge.",
+    "location": "The office is at 1 Example Street, floors 2 to 5.",
+}
+
+HR_POLICIES = {
+    "leave": "Annual leave is 25 days per year; requests go through the HR portal two weeks in advance.",
+    "sick": "Report sick leave to your manager and HR before 10:00; a note is needed after 3 days.",
+    "payroll": "Salaries are paid on the 25th; payslips are available in the HR portal.",
+    "benefits": "Benefits include health insurance, a pension plan and a yearly learning budget.",
+    "parental": "Parental leave is 16 weeks at full pay; contact HR to plan it.",
+}
+
+EMERGENCY_NUMBER = "112"
+TIME_FORMATS = ("%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M", "%Y-%m-%dT%H:%M:%S")
+
+
+def _lookup(table: Dict[str, str], *terms: str) -> Optional[Dict[str, str]]:
+    """Find the first table entry whose key occurs in any of the search terms"""
+    text = " ".join(term for term in terms if term).lower()
+    for key, answer in table.items():
+        if key in text:
+            return {"topic": key, "answer": answer}
+    return None
+
+
+def _parse_time(value: str) -> Optional[datetime]:
+    """Parse a time as written by the scheduler agent, or None if it is not in a known format"""
+    for time_format in TIME_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), time_format)
+        except (AttributeError, ValueError):
+            continue
+    return None
+
+
+class OfficeRecords:
+    """In-memory bookings, calendar events, tickets, visitors and feedback, safe to use from several threads"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._ids = itertools.count(1)
+        self.bookings: List[Dict] = []
+        self.events: List[Dict] = []
+        self.tickets: List[Dict] = []
+        self.incidents: List[Dict] = []
+        self.visitors: List[Dict] = []
+        self.feedback: List[Dict] = []
+
+    def _add(self, records: List[Dict], prefix: str, record: Dict) -> Dict:
+        with self._lock:
+            record = dict(record, id=f"{prefix}-{next(self._ids):05d}")
+            records.append(record)
+            return record
+
+    def transfer_call(self) -> Dict:
+        """Explain how a caller is handed over to a department"""
+        return {"status": "ready",
+                "instruction": "Reply with TRANSITION_TO:<agent_name> to transfer the caller to that department"}
+
+    def handle_booking(self, resource_type: str = "meeting room", duration: str = "", participants: int = 1) -> Dict:
+        """Reserve a resource; the time slot is confirmed by the scheduler"""
+        booking = self._add(self.bookings, "BK", {"resource_type": resource_type, "duration": duration,
+                                                  "participants": participants, "status": "pending_schedule"})
+        return {"booking_id": booking["id"], "status": booking["status"],
+                "next_step": "Confirm the date and time with the scheduler"}
+
+    def manage_schedule(self, event_type: str = "", start_time: str = "", end_time: str = "",
+                        location: str = "") -> Dict:
+        """Add an event to the calendar unless it overlaps another event at the same location"""
+        start, end = _parse_time(start_time), _parse_time(end_time)
+        if start is None or end is None or end <= start:
+            return {"status": "invalid", "error": "start_time and end_time must be 'YYYY-MM-DD HH:MM', end after start"}
+        with self._lock:
+            for event in self.events:
+                if event["location"].lower() == location.lower() and event["start"] < end and start < event["end"]:
+                    return {"status": "conflict", "conflicting_event": event["event_type"],
+                            "busy_from": event["start_time"], "busy_until": event["end_time"]}
+            event = self._add(self.events, "EV", {"event_type": event_type, "start_time": start_time,
+                                                  "end_time": end_time, "location": location,
+                                                  "start": start, "end": end})
+        return {"event_id": event["id"], "status": "scheduled", "event_type": event_type,
+                "start_time": start_time, "end_time": end_time, "location": location}
+
+    def answer_faq(self, question_type: str = "", context: str = "") -> Dict:
+        """Look up a frequently asked question"""
+        return _lookup(FAQ_ANSWERS, question_type, context) or {
+            "topic": question_type, "answer": None, "known_topics": sorted(FAQ_ANSWERS)}
+
+    def handle_emergency(self, emergency_type: str = "", location: str = "", severity: str = "high") -> Dict:
+        """Log an incident and alert the building's emergency team"""
+        incident = self._add(self.incidents, "IN", {"emergency_type": emergency_type, "location": location,
+                                                    "severity": severity})
+        return {"incident_id": incident["id"], "status": "emergency_team_alerted",
+                "emergency_number": EMERGENCY_NUMBER}
+
+    def collect_feedback(self, feedback_type: str = "general", rating: Optional[int] = None,
+                         comments: str = "") -> Dict:
+        """Store a piece of feedback"""
+        entry = self._add(self.feedback, "FB", {"feedback_type": feedback_type, "rating": rating,
+                                                "comments": comments})
+        return {"feedback_id": entry["id"], "status": "recorded"}
+
+    def handle_hr_query(self, topic: str = "", employee_id: str = "") -> Dict:
+        """Look up an HR policy"""
+        return _lookup(HR_POLICIES, topic) or {"topic": topic, "answer": None, "known_topics": sorted(HR_POLICIES)}
+
+    def handle_it_support(self, issue_type: str = "", priority: str = "normal", user_id: str = "") -> Dict:
+        """Open an IT support ticket"""
+        ticket = self._add(self.tickets, "IT", {"issue_type": issue_type, "priority": priority,
+                                                "user_id": user_id, "status": "open"})
+        return {"ticket_id": ticket["id"], "status": ticket["status"], "priority": priority}
+
+    def manage_visitor(self, visitor_name: str = "", purpose: str = "") -> Dict:
+        """Check a visitor in and issue a badge"""
+        visitor = self._add(self.visitors, "VB", {"visitor_name": visitor_name, "purpose": purpose})
+        return {"badge_id": visitor["id"], "status": "checked_in", "visitor_name": visitor_name}
+
+
+def register_office_tools(registry: "ToolRegistry", records: Optional[OfficeRecords] = None) -> OfficeRecords:
+    """
+    Register the office tools with a registry
+
+    Args:
+        registry: Registry to bind the implementations in
+        records: Records the tools work on (new, empty ones if omitted)
+
+    Returns:
+        OfficeRecords: The records the registered tools use
+    """
+    records = records or OfficeRecords()
+    registry.register("transfer_call", records.transfer_call, idempotent=True)
+    registry.register("answer_faq", records.answer_faq, idempotent=True, ttl=600.0)
+    registry.register("handle_hr_query", records.handle_hr_query, idempotent=True, ttl=600.0)
+    registry.register("handle_booking", records.handle_booking)
+    registry.register("manage_schedule", records.manage_schedule)
+    registry.register("handle_emergency", records.handle_emergency, timeout=2.0)
+    registry.register("collect_feedback", records.collect_feedback)
+    registry.register("handle_it_support", records.handle_it_support)
+    registry.register("manage_visitor", records.manage_visitor)
+    return records
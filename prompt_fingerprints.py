@@ -0,0 +1,141 @@
+"""
+Prompt Fingerprints Module
+
+This module records a fingerprint of every prompt sent to the backend and
+reports, per agent, how often its system prompt was already seen and how much
+of each request repeats the last request that started with the same system
+prompt. Backends with KV prefix caching (e.g. vLLM) only skip prefill for
+such shared prefixes, so byte-stable static prompts show up here as a high
+prefix hit rate.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Distinct system prompts remembered per agent before the least recently used is forgotten
+MAX_TRACKED_PREFIXES = 16
+
+
+class _AgentPromptStats:
+    """Prefix reuse counters of one agent"""
+
+    __slots__ = ("requests", "prefix_hits", "shared_messages", "shared_chars", "total_chars",
+                 "current_prefix", "chains", "prefix_counts")
+
+    def __init__(self):
+        self.requests = 0
+        self.prefix_hits = 0
+        self.shared_messages = 0
+        self.shared_chars = 0
+        self.total_chars = 0
+        self.current_prefix: Optional[str] = None
+        # Last fingerprint chain and request count per system prompt, least recently used first
+        self.chains: "OrderedDict[bytes, List[Tuple[bytes, int]]]" = OrderedDict()
+        self.prefix_counts: Dict[bytes, int] = {}
+
+
+class PromptFingerprints:
+    """Per-agent statistics on how much of each prompt repeats the previous one"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._agents: Dict[str, _AgentPromptStats] = {}
+
+    @staticmethod
+    def chain(messages: List[Dict]) -> List[Tuple[bytes, int]]:
+        """
+        Fingerprint a message list
+
+        Args:
+            messages: Chat messages in request order
+
+        Returns:
+            For each message, a digest of it and everything before it, and its length in characters
+        """
+        digest = hashlib.sha256()
+        result = []
+        for message in messages:
+            content = message["content"]
+            digest.update(message["role"].encode("utf-8") + b"\x00" + content.encode("utf-8") + b"\x00")
+            result.append((digest.copy().digest(), len(content)))
+        return result
+
+    def record(self, agent_name: str, messages: List[Dict]) -> None:
+        """
+        Record a prompt about to be sent
+
+        Args:
+            agent_name: Agent sending the prompt
+            messages: The request's chat messages
+        """
+        chain = self.chain(messages)
+        if not chain:
+            return
+        # Messages are chained, so the first digest identifies the system prompt
+        prefix = chain[0][0]
+        with self._lock:
+            stats = self._agents.get(agent_name)
+            if stats is None:
+                stats = self._agents[agent_name] = _AgentPromptStats()
+            previous = stats.chains.pop(prefix, None)
+            shared = 0
+            if previous is not None:
+                stats.prefix_hits += 1
+                for (digest, _), (previous_digest, _) in zip(chain, previous):
+                    if digest != previous_digest:
+                        break
+                    shared += 1
+            stats.requests += 1
+            stats.shared_messages += shared
+            stats.shared_chars += sum(length for _, length in chain[:shared])
+            stats.total_chars += sum(length for _, length in chain)
+            stats.current_prefix = prefix.hex()[:16]
+            stats.chains[prefix] = chain
+            stats.prefix_counts[prefix] = stats.prefix_counts.get(prefix, 0) + 1
+            if len(stats.chains) > MAX_TRACKED_PREFIXES:
+                forgotten, _ = stats.chains.popitem(last=False)
+                del stats.prefix_counts[forgotten]
+
+    def get_stats(self, agent_name: Optional[str] = None) -> Dict:
+        """
+        Get prefix reuse per agent
+
+        Args:
+            agent_name: Only report this agent
+
+        Returns:
+            Mapping from agent name to request count, the share of requests whose system prompt
+            was seen before, the share of prompt characters in a shared prefix, and the tracked
+            system prompt fingerprints with their request counts
+        """
+        with self._lock:
+            report = {}
+            for name, stats in self._agents.items():
+                if agent_name is not None and name != agent_name:
+                    continue
+                report[name] = {
+                    "requests": stats.requests,
+                    "prefix_hit_rate": round(stats.prefix_hits / stats.requests, 4),
+                    "avg_shared_messages": round(stats.shared_messages / stats.requests, 3),
+                    "shared_char_ratio": round(stats.shared_chars / stats.total_chars, 4)
+                    if stats.total_chars else 0.0,
+                    "current_prefix": stats.current_prefix,
+                    "prefixes": {prefix.hex()[:16]: count for prefix, count in stats.prefix_counts.items()},
+                }
+            return report
+
+
+_shared_fingerprints: Optional[PromptFingerprints] = None
+_shared_fingerprints_lock = threading.Lock()
+
+
+def get_prompt_fingerprints() -> PromptFingerprints:
+    """Get the process-wide prompt fingerprint recorder"""
+    global _shared_fingerprints
+    if _shared_fingerprints is None:
+        with _shared_fingerprints_lock:
+            if _shared_fingerprints is None:
+                _shared_fingerprints = PromptFingerprints()
+    return _shared_fingerprints
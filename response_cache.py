@@ -0,0 +1,139 @@
+"""
+Response Cache Module
+
+This module provides a size-bounded LRU cache with per-entry TTL, and on top
+of it a cache of backend completions keyed on the model, the system prompt,
+the message payload and the temperature. Agents opt in through the
+"response_cache" block of their entry in agent_config.json.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from metrics import RESPONSE_CACHE_LOOKUPS
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a TTL"""
+
+    def __init__(self, max_entries: int = 1024, default_ttl: float = 300.0):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Maximum number of entries; least recently used ones are evicted beyond this
+            default_ttl: Seconds an entry stays valid unless put() is given another TTL
+        """
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get a cached value, or None if it is missing or expired"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value (not None) for ttl seconds, evicting the least recently used entries if full"""
+        expires_at = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict:
+        """Get size and hit/miss/eviction counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class ResponseCache(TTLCache):
+    """Cache of backend completions with per-agent hit/miss counters"""
+
+    def __init__(self, max_entries: int = 1024, default_ttl: float = 300.0):
+        super().__init__(max_entries, default_ttl)
+        self._agent_counters: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def make_key(model: str, system_prompt: Optional[str], messages: List[Dict], temperature: float) -> str:
+        """
+        Build a cache key for a completion request
+
+        Args:
+            model: Backend model name
+            system_prompt: System prompt of the request (hashed separately so long prompts stay cheap to compare)
+            messages: The non-system messages of the request
+            temperature: Sampling temperature of the agent
+
+        Returns:
+            str: Hex digest identifying the request
+        """
+        prompt_hash = hashlib.sha256((system_prompt or "").encode("utf-8")).hexdigest()
+        payload = json.dumps([model, prompt_hash, messages, temperature], sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def lookup(self, agent_name: str, key: str) -> Optional[str]:
+        """Get a cached completion and count the hit or miss for the agent"""
+        value = self.get(key)
+        with self._lock:
+            counters = self._agent_counters.setdefault(agent_name, {"hits": 0, "misses": 0})
+            counters["hits" if value is not None else "misses"] += 1
+        RESPONSE_CACHE_LOOKUPS.inc((agent_name, "hit" if value is not None else "miss"))
+        return value
+
+    def get_stats(self) -> Dict:
+        """Get overall and per-agent counters"""
+        stats = super().get_stats()
+        with self._lock:
+            stats["agents"] = {name: dict(counters) for name, counters in self._agent_counters.items()}
+        return stats
+
+
+_shared_cache: Optional[ResponseCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Get the process-wide response cache, sized from RESPONSE_CACHE_* environment variables"""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                _shared_cache = ResponseCache(
+                    max_entries=int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "1024")),
+                    default_ttl=float(os.environ.get("RESPONSE_CACHE_TTL_SECONDS", "300")),
+                )
+    return _shared_cache
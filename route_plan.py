@@ -0,0 +1,136 @@
+"""
+Route Plan Module
+
+This module holds the multi-step route a session is walking, e.g.
+reception_agent -> booking_agent -> scheduler_agent. A plan is created when
+a transition needs more than one hop (an explicit "A->B" path or a route
+found by the path finder), is attached to the session's transition manager
+and knows its current step, so the next hop is available in constant time.
+In relay mode the intermediate agents are passed through within the same
+turn without a backend call, and only the final agent answers.
+"""
+
+import os
+from typing import Dict, Iterable, List, Optional
+
+# How the hops of a plan are executed: "relay" passes through intermediate agents in the same
+# turn; "stepwise" lets every agent on the route answer, one hop per user message
+ROUTE_EXECUTION_RELAY = "relay"
+ROUTE_EXECUTION_STEPWISE = "stepwise"
+DEFAULT_ROUTE_EXECUTION = ROUTE_EXECUTION_RELAY
+
+# Plan kinds, as used for the path-length metric
+PLAN_REQUESTED = "multi_step_path"
+PLAN_AUTO = "auto_generated_path"
+
+
+def resolve_route_execution(settings: Optional[Dict] = None) -> str:
+    """
+    Get the route execution mode from the "transitions" section of agent_config.json
+
+    Args:
+        settings: The section, with an optional "route_execution"; ROUTE_EXECUTION in the
+            environment overrides it
+
+    Returns:
+        str: "relay" or "stepwise"
+    """
+    settings = settings or {}
+    mode = os.environ.get("ROUTE_EXECUTION", settings.get("route_execution", DEFAULT_ROUTE_EXECUTION)).lower()
+    if mode not in (ROUTE_EXECUTION_RELAY, ROUTE_EXECUTION_STEPWISE):
+        raise ValueError(f"Unknown route execution mode: {mode!r}")
+    return mode
+
+
+class RoutePlan:
+    """A route through several agents and the step the session has reached on it"""
+
+    __slots__ = ("kind", "path", "step", "_positions")
+
+    def __init__(self, kind: str, path: List[str], step: int = 0):
+        """
+        Create a plan
+
+        Args:
+            kind: PLAN_REQUESTED for a path written by an agent, PLAN_AUTO for one found by the path finder
+            path: Agents on the route, starting with the agent the plan was made at
+            step: Index in path of the agent the session is at
+        """
+        self.kind = kind
+        self.path = list(path)
+        self.step = step
+        # Positions are lookups (an agent a requested path repeats is found at its first occurrence)
+        self._positions: Dict[str, int] = {}
+        for index, agent_name in enumerate(self.path):
+            self._positions.setdefault(agent_name, index)
+
+    @property
+    def current_agent(self) -> str:
+        """Agent at the current step"""
+        return self.path[self.step]
+
+    @property
+    def next_agent(self) -> Optional[str]:
+        """Agent of the next hop, or None at the end of the route"""
+        return self.path[self.step + 1] if self.step + 1 < len(self.path) else None
+
+    @property
+    def target_agent(self) -> str:
+        """Agent at the end of the route"""
+        return self.path[-1]
+
+    @property
+    def complete(self) -> bool:
+        """Whether the session has reached the end of the route"""
+        return self.step >= len(self.path) - 1
+
+    @property
+    def hops(self) -> int:
+        """Hops of the whole route"""
+        return len(self.path) - 1
+
+    def position(self, agent_name: str) -> Optional[int]:
+        """Get the index of an agent on the route, or None if it is not on it"""
+        return self._positions.get(agent_name)
+
+    def is_relay(self, agent_name: str) -> bool:
+        """Whether an agent is an intermediate (pass-through) agent of the route"""
+        index = self._positions.get(agent_name)
+        return index is not None and 0 < index < len(self.path) - 1
+
+    def advance_to(self, agent_name: str) -> bool:
+        """
+        Move the current step to an agent further along the route
+
+        Args:
+            agent_name: Agent the session has moved to
+
+        Returns:
+            bool: Whether the agent is ahead on the route (the step is unchanged otherwise)
+        """
+        index = self._positions.get(agent_name)
+        if index is None or index <= self.step:
+            return False
+        self.step = index
+        return True
+
+    def to_dict(self) -> Dict:
+        """Get the plan as JSON-serializable data"""
+        return {"kind": self.kind, "path": list(self.path), "step": self.step}
+
+    @classmethod
+    def from_dict(cls, data: Dict, agent_names: Iterable[str]) -> Optional["RoutePlan"]:
+        """
+        Recreate a plan from to_dict() data
+
+        Args:
+            data: Data returned by to_dict()
+            agent_names: Agents of the current topology
+
+        Returns:
+            The plan, or None if it goes through an agent that no longer exists or is finished
+        """
+        plan = cls(data["kind"], data["path"], data.get("step", 0))
+        if not set(agent_names).issuperset(plan.path) or plan.complete:
+            return None
+        return plan
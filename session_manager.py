@@ -0,0 +1,303 @@
+"""
+Session Manager Module
+
+This module keeps one conversation state per session_id on top of a shared,
+immutable agent graph topology, evicting sessions by LRU order, idle TTL and
+an overall memory cap. With a session store, each turn's state is saved after
+the turn and a session is (re)loaded lazily at the start of a turn when it is
+not cached or another worker has saved a newer revision, so evicted sessions
+come back and any worker can serve any session. Turns of one session are
+serialized by a per-session lock, held by the API for the whole turn; across
+workers, the store's compare-and-set save rejects a turn that started from a
+revision another worker has already continued.
+"""
+
+import asyncio
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from agent_graph import AgentGraph
+from async_utils import run_blocking
+from session_store import SessionConflict, SessionStore
+
+DEFAULT_SESSION_ID = "default"
+
+
+class _SessionEntry:
+    """A session graph together with its bookkeeping data"""
+
+    __slots__ = ("graph", "version", "revision", "last_access", "size_bytes")
+
+    def __init__(self, graph: AgentGraph, version: int, revision: int = 0):
+        self.graph = graph
+        self.version = version
+        self.revision = revision
+        self.last_access = time.monotonic()
+        self.size_bytes = graph.estimate_state_size()
+
+
+class SessionManager:
+    """Maps session IDs to per-session agent graphs with LRU/TTL eviction"""
+
+    def __init__(self, template_graph: AgentGraph, max_sessions: int = 1000,
+                 idle_ttl_seconds: float = 1800.0, max_memory_bytes: int = 256 * 1024 * 1024,
+                 store: Optional[SessionStore] = None):
+        """
+        Initialize the session manager
+
+        Args:
+            template_graph: Graph whose topology (nodes, prompts, path tables) is shared by all sessions
+            max_sessions: Maximum number of sessions kept in memory
+            idle_ttl_seconds: Sessions idle for longer than this are evicted
+            max_memory_bytes: Upper bound on the estimated memory held by all sessions
+            store: Where session states are persisted after each turn; in memory only if omitted
+        """
+        self.template_graph = template_graph
+        self.version = 1
+        self.max_sessions = max_sessions
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_memory_bytes = max_memory_bytes
+        self._sessions: "OrderedDict[str, _SessionEntry]" = OrderedDict()
+        self._total_bytes = 0
+        self._evictions = 0
+        self._loads = 0
+        self._saves = 0
+        self._conflicts = 0
+        self.store = store
+        self._lock = threading.Lock()
+        # Keyed by session ID rather than held on the entry, so a session evicted or reloaded mid-turn
+        # still has one lock; a lock is dropped once no turn holds or waits for it
+        self._turn_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    def get_session(self, session_id: Optional[str] = None) -> AgentGraph:
+        """
+        Get the graph for a session, creating it if needed
+
+        Args:
+            session_id: Session identifier; the default session is used if omitted
+
+        Returns:
+            AgentGraph: The session's graph
+        """
+        session_id = session_id or DEFAULT_SESSION_ID
+        if self.store is not None:
+            return self._get_stored_session(session_id)
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired(now)
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                entry = _SessionEntry(self.template_graph.create_session(), self.version)
+                self._sessions[session_id] = entry
+                self._total_bytes += entry.size_bytes
+                self._enforce_limits(keep=session_id)
+                return entry.graph
+            return self._touch(session_id, entry)
+
+    async def aget_session(self, session_id: Optional[str] = None) -> AgentGraph:
+        """get_session for the request path: store reads run on the worker pool, not the event loop"""
+        if self.store is None:
+            return self.get_session(session_id)
+        return await run_blocking(self.get_session, session_id)
+
+    def turn_lock(self, session_id: Optional[str] = None) -> asyncio.Lock:
+        """
+        Get the lock serializing the turns of a session
+
+        A turn holds it from aget_session() until aend_turn(), so two requests of
+        the same session (or two without a session ID, which share the default
+        session) never run on the same graph at once.
+
+        Args:
+            session_id: Session identifier; the default session is used if omitted
+
+        Returns:
+            asyncio.Lock: The session's turn lock
+        """
+        session_id = session_id or DEFAULT_SESSION_ID
+        with self._lock:
+            lock = self._turn_locks.get(session_id)
+            if lock is None:
+                lock = self._turn_locks[session_id] = asyncio.Lock()
+            return lock
+
+    def _get_stored_session(self, session_id: str, create: bool = True) -> Optional[AgentGraph]:
+        """
+        Get a session's graph, loading its state from the store when the cached copy is missing or stale
+
+        Store reads happen outside the lock; only the revision is read while the cached copy is current.
+
+        Args:
+            session_id: Session identifier
+            create: Start a new session if neither the cache nor the store has it
+
+        Returns:
+            The session's graph, or None if it does not exist and create is False
+        """
+        stored_revision = self.store.revision(session_id)
+        with self._lock:
+            self._evict_expired(time.monotonic())
+            entry = self._sessions.get(session_id)
+            if entry is not None and (stored_revision is None or entry.revision >= stored_revision):
+                return self._touch(session_id, entry)
+            if stored_revision is None and not create:
+                return None
+
+        state = self.store.load(session_id) if stored_revision is not None else None
+        with self._lock:
+            template, version = self.template_graph, self.version
+        graph = template.restore_session(state) if state else template.create_session()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            revision = state["revision"] if state else 0
+            if entry is not None and entry.revision >= revision:
+                # Another request of this session loaded or saved it meanwhile
+                return self._touch(session_id, entry)
+            if entry is not None:
+                self._total_bytes -= entry.size_bytes
+            entry = self._sessions[session_id] = _SessionEntry(graph, version, revision)
+            self._sessions.move_to_end(session_id)
+            self._total_bytes += entry.size_bytes
+            if state:
+                self._loads += 1
+            self._enforce_limits(keep=session_id)
+            return entry.graph
+
+    def _touch(self, session_id: str, entry: _SessionEntry) -> AgentGraph:
+        """Mark a cached session as used and move it to the current topology (caller holds the lock)"""
+        self._sessions.move_to_end(session_id)
+        if entry.version != self.version:
+            # The topology was reloaded since this session's last turn
+            entry.graph = entry.graph.migrate_to(self.template_graph)
+            entry.version = self.version
+        entry.last_access = time.monotonic()
+        return entry.graph
+
+    def swap_template(self, template_graph: AgentGraph) -> int:
+        """
+        Atomically replace the shared topology
+
+        Turns already running keep the graph they started with; each session
+        moves to the new topology at the start of its next turn.
+
+        Args:
+            template_graph: Fully built graph to use from now on
+
+        Returns:
+            int: The new topology version
+        """
+        with self._lock:
+            self.template_graph = template_graph
+            self.version += 1
+            return self.version
+
+    def peek_session(self, session_id: Optional[str] = None) -> Optional[AgentGraph]:
+        """Get the graph for an existing session without creating or touching it"""
+        if self.store is not None:
+            return self._get_stored_session(session_id or DEFAULT_SESSION_ID, create=False)
+        with self._lock:
+            entry = self._sessions.get(session_id or DEFAULT_SESSION_ID)
+            return entry.graph if entry else None
+
+    async def apeek_session(self, session_id: Optional[str] = None) -> Optional[AgentGraph]:
+        """peek_session for the request path: store reads run on the worker pool, not the event loop"""
+        if self.store is None:
+            return self.peek_session(session_id)
+        return await run_blocking(self.peek_session, session_id)
+
+    async def aend_turn(self, session_id: Optional[str] = None) -> None:
+        """end_turn for the request path: encoding and the store write run on the worker pool"""
+        if self.store is None:
+            self.end_turn(session_id)
+        else:
+            await run_blocking(self.end_turn, session_id)
+
+    def end_turn(self, session_id: Optional[str] = None) -> None:
+        """
+        Update a session's size estimate after a turn, save its state and enforce the memory cap
+
+        Args:
+            session_id: Session identifier; the default session is used if omitted
+
+        Raises:
+            SessionConflict: Another worker saved the session since this turn loaded it; the turn is
+                discarded and the session is reloaded from the store on its next turn
+        """
+        session_id = session_id or DEFAULT_SESSION_ID
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return
+            new_size = entry.graph.estimate_state_size()
+            self._total_bytes += new_size - entry.size_bytes
+            entry.size_bytes = new_size
+            entry.last_access = time.monotonic()
+            if self.store is not None:
+                entry.revision += 1
+                state = entry.graph.to_state()
+                state["revision"] = entry.revision
+                self._saves += 1
+            self._enforce_limits(keep=session_id)
+        # Batched with the saves of concurrent turns when the store is wrapped in a BatchingSessionStore
+        if self.store is not None and not self.store.save(session_id, state):
+            with self._lock:
+                if self._sessions.get(session_id) is entry:
+                    self._sessions.pop(session_id)
+                    self._total_bytes -= entry.size_bytes
+                self._conflicts += 1
+            raise SessionConflict(session_id)
+
+    def remove_session(self, session_id: str) -> bool:
+        """Drop a session, from the store too; returns True if it was held in memory"""
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            if entry is not None:
+                self._total_bytes -= entry.size_bytes
+        if self.store is not None:
+            self.store.delete(session_id)
+        return entry is not None
+
+    def get_stats(self) -> Dict:
+        """Get session counts, estimated memory and eviction totals"""
+        with self._lock:
+            stats = {
+                "active_sessions": len(self._sessions),
+                "topology_version": self.version,
+                "estimated_bytes": self._total_bytes,
+                "evictions": self._evictions,
+                "max_sessions": self.max_sessions,
+                "idle_ttl_seconds": self.idle_ttl_seconds,
+                "max_memory_bytes": self.max_memory_bytes,
+                "store_loads": self._loads,
+                "store_saves": self._saves,
+                "store_conflicts": self._conflicts,
+            }
+        stats["store"] = self.store.get_stats() if self.store is not None else None
+        return stats
+
+    def _evict_expired(self, now: float) -> None:
+        """Evict sessions idle for longer than the TTL (caller holds the lock)"""
+        while self._sessions:
+            session_id, entry = next(iter(self._sessions.items()))
+            if now - entry.last_access <= self.idle_ttl_seconds:
+                break
+            self._evict(session_id)
+
+    def _enforce_limits(self, keep: str) -> None:
+        """Evict least recently used sessions until count and memory limits hold (caller holds the lock)"""
+        while len(self._sessions) > 1 and (
+                len(self._sessions) > self.max_sessions or self._total_bytes > self.max_memory_bytes):
+            session_id = next(iter(self._sessions))
+            if session_id == keep:
+                self._sessions.move_to_end(session_id)
+                session_id = next(iter(self._sessions))
+            self._evict(session_id)
+
+    def _evict(self, session_id: str) -> None:
+        """Remove a session and account for it (caller holds the lock)"""
+        entry = self._sessions.pop(session_id)
+        self._total_bytes -= entry.size_bytes
+        self._evictions += 1
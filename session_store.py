@@ -0,0 +1,602 @@
+"""
+Session Store Module
+
+This module persists per-session conversation state (see AgentGraph.to_state)
+outside the process, so several API workers can serve the same sessions and
+a restart loses none of them. Stores are keyed by session ID and keep one
+state per session together with its revision, which the session manager
+increments after every turn and compares to decide when its cached copy is
+stale. A save is a compare-and-set on the revision the state was derived
+from, so when two workers continue the same revision only one of them wins
+and the other learns of the conflict instead of overwriting a turn.
+Backends: in-memory, SQLite in WAL mode and an append-only JSON-lines file.
+Concurrent saves are gathered into batches by a background writer, so many
+turns share one transaction.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: the file store is then safe for a single process only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL_SECONDS = 0.005
+DEFAULT_MAX_BATCH = 256
+DEFAULT_COMPACT_MIN_BYTES = 64 * 1024 * 1024
+
+
+def base_revision(state: Dict) -> int:
+    """Get the revision a state was derived from (no stored state counts as revision 0)"""
+    return state["revision"] - 1
+
+
+class SessionConflict(Exception):
+    """A session's state was saved by another worker since this one loaded it"""
+
+    def __init__(self, session_id: str):
+        super().__init__(f"Session {session_id} was updated by another request; reload it and retry")
+        self.session_id = session_id
+
+
+class SessionStore:
+    """Storage interface for serialized session states, each carrying an integer "revision" """
+
+    name = "base"
+
+    def load(self, session_id: str) -> Optional[Dict]:
+        """Get the stored state of a session, or None if there is none"""
+        raise NotImplementedError
+
+    def revision(self, session_id: str) -> Optional[int]:
+        """Get the revision of a session's stored state without loading it, or None if there is none"""
+        raise NotImplementedError
+
+    def save_batch(self, states: Dict[str, Dict]) -> List[str]:
+        """
+        Store several session states at once
+
+        Each state is a compare-and-set: it is written only if the stored
+        revision is still the one it was derived from (see base_revision), so
+        a worker that continued an outdated copy never overwrites a newer turn.
+
+        Args:
+            states: Session ID to state, each with a "revision"
+
+        Returns:
+            IDs of the sessions whose state was not written because of a conflict
+        """
+        raise NotImplementedError
+
+    def save(self, session_id: str, state: Dict) -> bool:
+        """Store one session state; returns False if another writer saved the session first"""
+        return not self.save_batch({session_id: state})
+
+    def delete(self, session_id: str) -> None:
+        """Remove a session's state"""
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Write out any buffered states"""
+
+    def close(self) -> None:
+        """Flush and release the store's resources"""
+
+    def get_stats(self) -> Dict:
+        """Get the backend name and its counters"""
+        return {"backend": self.name}
+
+
+class MemorySessionStore(SessionStore):
+    """Process-local store; states outlive LRU eviction from the session manager but not the process"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._states: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def load(self, session_id: str) -> Optional[Dict]:
+        with self._lock:
+            return self._states.get(session_id)
+
+    def revision(self, session_id: str) -> Optional[int]:
+        with self._lock:
+            state = self._states.get(session_id)
+            return state["revision"] if state else None
+
+    def save_batch(self, states: Dict[str, Dict]) -> List[str]:
+        conflicts = []
+        with self._lock:
+            for session_id, state in states.items():
+                current = self._states.get(session_id)
+                if (current["revision"] if current else 0) == base_revision(state):
+                    self._states[session_id] = state
+                else:
+                    conflicts.append(session_id)
+        return conflicts
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._states.pop(session_id, None)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {"backend": self.name, "sessions": len(self._states)}
+
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite table of session states in WAL mode, shareable by processes on one host"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str, busy_timeout_ms: int = 5000):
+        """
+        Initialize the store, creating the database if needed
+
+        Args:
+            path: Database file
+            busy_timeout_ms: How long a write waits for another process's write to finish
+        """
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, revision INTEGER NOT NULL, "
+            "updated REAL NOT NULL, state TEXT NOT NULL)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's connection (connections are not shared between threads)"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000,
+                                         isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def load(self, session_id: str) -> Optional[Dict]:
+        row = self._connection().execute(
+            "SELECT state FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def revision(self, session_id: str) -> Optional[int]:
+        row = self._connection().execute(
+            "SELECT revision FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else None
+
+    def save_batch(self, states: Dict[str, Dict]) -> List[str]:
+        now = time.time()
+        rows = [(session_id, state["revision"], json.dumps(state, separators=(",", ":")))
+                for session_id, state in states.items()]
+        conflicts = []
+        connection = self._connection()
+        # One transaction per batch: a single WAL commit however many sessions it holds
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            for session_id, revision, state in rows:
+                if revision == 1:
+                    cursor = connection.execute(
+                        "INSERT INTO sessions (session_id, revision, updated, state) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT(session_id) DO NOTHING", (session_id, revision, now, state))
+                else:
+                    cursor = connection.execute(
+                        "UPDATE sessions SET revision = ?, updated = ?, state = ? "
+                        "WHERE session_id = ? AND revision = ?", (revision, now, state, session_id, revision - 1))
+                if cursor.rowcount != 1:
+                    conflicts.append(session_id)
+        return conflicts
+
+    def delete(self, session_id: str) -> None:
+        self._connection().execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def close(self) -> None:
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def get_stats(self) -> Dict:
+        count = self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        return {"backend": self.name, "path": self.path, "sessions": count}
+
+
+class AppendOnlyFileSessionStore(SessionStore):
+    """
+    JSON-lines file to which every saved state is appended
+
+    Each line is a small JSON header (session ID, revision, deletion flag), a
+    tab and the state. An in-memory index maps each session to the position
+    of its newest state, so loading reads one line; the index follows lines
+    appended by other processes by reading the file from where it last
+    stopped. Appends are serialized across processes with flock, and the file
+    is rewritten with only the newest states once it is mostly stale.
+    """
+
+    name = "file"
+
+    def __init__(self, path: str, compact_min_bytes: int = DEFAULT_COMPACT_MIN_BYTES):
+        """
+        Initialize the store, indexing an existing file
+
+        Args:
+            path: Log file
+            compact_min_bytes: File size below which the file is never compacted
+        """
+        self.path = path
+        self.compact_min_bytes = compact_min_bytes
+        self.compactions = 0
+        self._lock = threading.Lock()
+        self._file = None
+        with self._lock:
+            self._open()
+
+    def _open(self) -> None:
+        """(Re)open the file and rebuild the index from its start (caller holds the lock)"""
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.path, "a+b")
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        self._index: Dict[str, Tuple[int, int, int]] = {}  # session ID -> (offset, length, revision)
+        self._read_offset = 0
+        self._live_bytes = 0
+        self._catch_up()
+
+    def _catch_up(self) -> None:
+        """Index lines appended since the last read, reopening the file if it was compacted (caller holds the lock)"""
+        try:
+            replaced = os.stat(self.path).st_ino != self._inode
+        except FileNotFoundError:
+            replaced = True
+        if replaced:
+            self._open()
+            return
+        size = os.fstat(self._file.fileno()).st_size
+        if size <= self._read_offset:
+            return
+        self._file.seek(self._read_offset)
+        data = self._file.read(size - self._read_offset)
+        # A line still being written by another process is picked up on a later call
+        end = data.rfind(b"\n") + 1
+        offset = self._read_offset
+        for line in data[:end].splitlines(keepends=True):
+            self._index_line(line, offset)
+            offset += len(line)
+        self._read_offset += end
+
+    def _index_line(self, line: bytes, offset: int) -> None:
+        """Apply one log line to the index (caller holds the lock)"""
+        header, _, state = line.partition(b"\t")
+        try:
+            entry = json.loads(header)
+        except ValueError:
+            logger.warning("Skipping unreadable session store line", extra={"path": self.path, "offset": offset})
+            return
+        session_id = entry["id"]
+        current = self._index.get(session_id)
+        if entry.get("deleted"):
+            if current is not None:
+                self._live_bytes -= current[1]
+                del self._index[session_id]
+            return
+        if current is not None:
+            if entry["revision"] < current[2]:
+                return
+            self._live_bytes -= current[1]
+        self._index[session_id] = (offset + len(header) + 1, len(state), entry["revision"])
+        self._live_bytes += len(state)
+
+    def _append(self, lines: List[Tuple[str, Optional[int], bytes]]) -> List[str]:
+        """
+        Append lines under the cross-process lock and index them (caller holds the lock)
+
+        Args:
+            lines: (session ID, revision or None for a deletion, encoded line); a state is only
+                appended if the indexed revision is still the one it was derived from
+
+        Returns:
+            IDs of the sessions whose state was not appended because of a conflict
+        """
+        while True:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            try:
+                if os.stat(self.path).st_ino != self._inode:
+                    # Another process compacted the file while we waited for the lock
+                    continue
+                self._catch_up()
+                data, conflicts = [], []
+                for session_id, revision, line in lines:
+                    current = self._index.get(session_id)
+                    if revision is None or (current[2] if current else 0) == revision - 1:
+                        data.append(line)
+                    else:
+                        conflicts.append(session_id)
+                self._file.write(b"".join(data))
+                self._file.flush()
+                self._catch_up()
+                size = self._read_offset
+                if size >= self.compact_min_bytes and self._live_bytes * 2 < size:
+                    self._compact()
+                return conflicts
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+                if os.stat(self.path).st_ino != self._inode:
+                    self._open()
+
+    def _compact(self) -> None:
+        """Rewrite the file with only the newest state of each session (caller holds both locks)"""
+        temp_path = f"{self.path}.compact"
+        with open(temp_path, "wb") as out:
+            for session_id, (offset, length, revision) in self._index.items():
+                self._file.seek(offset)
+                header = json.dumps({"id": session_id, "revision": revision}).encode()
+                out.write(header + b"\t" + self._file.read(length))
+        os.replace(temp_path, self.path)
+        self.compactions += 1
+
+    @staticmethod
+    def _line(session_id: str, state: Optional[Dict]) -> bytes:
+        """Encode one log line; json.dumps escapes tabs and newlines inside the state"""
+        if state is None:
+            return json.dumps({"id": session_id, "deleted": True}).encode() + b"\t\n"
+        header = json.dumps({"id": session_id, "revision": state["revision"]}).encode()
+        return header + b"\t" + json.dumps(state, separators=(",", ":")).encode() + b"\n"
+
+    def load(self, session_id: str) -> Optional[Dict]:
+        with self._lock:
+            self._catch_up()
+            entry = self._index.get(session_id)
+            if entry is None:
+                return None
+            self._file.seek(entry[0])
+            data = self._file.read(entry[1])
+        return json.loads(data)
+
+    def revision(self, session_id: str) -> Optional[int]:
+        with self._lock:
+            self._catch_up()
+            entry = self._index.get(session_id)
+            return entry[2] if entry else None
+
+    def save_batch(self, states: Dict[str, Dict]) -> List[str]:
+        lines = [(session_id, state["revision"], self._line(session_id, state))
+                 for session_id, state in states.items()]
+        with self._lock:
+            return self._append(lines)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._append([(session_id, None, self._line(session_id, None))])
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "backend": self.name,
+                "path": self.path,
+                "sessions": len(self._index),
+                "file_bytes": self._read_offset,
+                "live_bytes": self._live_bytes,
+                "compactions": self.compactions,
+            }
+
+
+class _Batch:
+    """States gathered for one write, and its outcome once written"""
+
+    __slots__ = ("states", "written", "conflicts", "error")
+
+    def __init__(self):
+        self.states: Dict[str, Dict] = {}
+        self.written = threading.Event()
+        self.conflicts: List[str] = []
+        self.error: Optional[Exception] = None
+
+
+class BatchingSessionStore(SessionStore):
+    """
+    Gathers the states saved by concurrent turns and writes them to another store in one batch
+
+    A background thread writes the gathered states as soon as it is free and
+    flush_interval has passed since the first of them arrived (or max_batch
+    are waiting), so concurrent turns share one transaction. A save returns
+    once the batch holding its state is written, with that state's
+    compare-and-set outcome, so other workers never load an older state after
+    the turn has ended.
+    """
+
+    def __init__(self, store: SessionStore, flush_interval: float = DEFAULT_FLUSH_INTERVAL_SECONDS,
+                 max_batch: int = DEFAULT_MAX_BATCH):
+        """
+        Initialize the batching wrapper
+
+        Args:
+            store: Store the batches are written to
+            flush_interval: Longest a saved state waits for other states to join its batch, in seconds
+            max_batch: Waiting sessions that trigger an immediate write
+        """
+        self.store = store
+        self.name = store.name
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._batch = _Batch()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.batches = 0
+        self.states_written = 0
+        self.conflicts = 0
+        self.largest_batch = 0
+        self.errors = 0
+
+    def load(self, session_id: str) -> Optional[Dict]:
+        return self.store.load(session_id)
+
+    def revision(self, session_id: str) -> Optional[int]:
+        return self.store.revision(session_id)
+
+    def save_batch(self, states: Dict[str, Dict]) -> List[str]:
+        with self._condition:
+            # A session appears once per batch; a second state of it waits for the next one
+            while not self._closed and any(session_id in self._batch.states for session_id in states):
+                self._condition.wait()
+            if self._closed:
+                raise RuntimeError("Session store is closed")
+            batch = self._batch
+            batch.states.update(states)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="session-store-writer", daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+        batch.written.wait()
+        if batch.error is not None:
+            raise batch.error
+        return [session_id for session_id in batch.conflicts if session_id in states]
+
+    def delete(self, session_id: str) -> None:
+        self.store.delete(session_id)
+
+    def _run(self) -> None:
+        """Write the gathered states until closed"""
+        while True:
+            with self._condition:
+                while not self._closed and not self._batch.states:
+                    self._condition.wait()
+                deadline = time.monotonic() + self.flush_interval
+                while not self._closed and len(self._batch.states) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch, self._batch = self._batch, _Batch()
+                self._condition.notify_all()
+            if batch.states:
+                self._write(batch)
+            elif self._closed:
+                return
+
+    def _write(self, batch: _Batch) -> None:
+        """Write one batch and wake the turns waiting for it"""
+        try:
+            batch.conflicts = self.store.save_batch(batch.states)
+        except Exception as e:
+            batch.error = e
+            self.errors += 1
+            logger.error("Session store write failed", extra={"sessions": len(batch.states), "error": str(e)})
+        else:
+            self.batches += 1
+            self.states_written += len(batch.states) - len(batch.conflicts)
+            self.conflicts += len(batch.conflicts)
+            self.largest_batch = max(self.largest_batch, len(batch.states))
+        finally:
+            batch.written.set()
+
+    def flush(self) -> None:
+        with self._condition:
+            batch, self._batch = self._batch, _Batch()
+            self._condition.notify_all()
+        if batch.states:
+            self._write(batch)
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        self.flush()
+        self.store.close()
+
+    def get_stats(self) -> Dict:
+        stats = self.store.get_stats()
+        with self._condition:
+            stats["batching"] = {
+                "flush_interval_seconds": self.flush_interval,
+                "max_batch": self.max_batch,
+                "pending": len(self._batch.states),
+                "batches": self.batches,
+                "states_written": self.states_written,
+                "conflicts": self.conflicts,
+                "largest_batch": self.largest_batch,
+                "errors": self.errors,
+            }
+        return stats
+
+
+def create_session_store(backend: str, path: Optional[str] = None,
+                         flush_interval: float = DEFAULT_FLUSH_INTERVAL_SECONDS,
+                         max_batch: int = DEFAULT_MAX_BATCH) -> Optional[SessionStore]:
+    """
+    Create a session store
+
+    Args:
+        backend: "memory", "sqlite", "file", or "" / "none" for no store
+        path: Database or log file of the sqlite and file backends
+        flush_interval: Longest a saved state waits for the states of concurrent turns to join its batch,
+            in seconds; 0 writes every state on its own
+        max_batch: Waiting sessions that trigger an immediate batch write
+
+    Returns:
+        The store, or None if no backend was selected
+    """
+    backend = (backend or "none").lower()
+    if backend == "none":
+        return None
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "sqlite":
+        store: SessionStore = SQLiteSessionStore(path or "sessions.db")
+    elif backend == "file":
+        store = AppendOnlyFileSessionStore(path or "sessions.jsonl")
+    else:
+        raise ValueError(f"Unknown session store backend: {backend!r}")
+    if flush_interval > 0:
+        store = BatchingSessionStore(store, flush_interval, max_batch)
+    return store
+
+
+_shared_store: Optional[SessionStore] = None
+_shared_store_created = False
+_shared_store_lock = threading.Lock()
+
+
+def get_session_store() -> Optional[SessionStore]:
+    """
+    Get the process-wide session store configured by the environment, if any
+
+    SESSION_STORE selects the backend (memory, sqlite or file; unset keeps sessions in process
+    memory only), SESSION_STORE_PATH its file, SESSION_STORE_FLUSH_MS the batching window
+    and SESSION_STORE_MAX_BATCH the batch size that triggers an early write.
+    """
+    global _shared_store, _shared_store_created
+    with _shared_store_lock:
+        if not _shared_store_created:
+            _shared_store = create_session_store(
+                os.environ.get("SESSION_STORE", "none"),
+                os.environ.get("SESSION_STORE_PATH") or None,
+                flush_interval=float(os.environ.get("SESSION_STORE_FLUSH_MS", "5")) / 1000,
+                max_batch=int(os.environ.get("SESSION_STORE_MAX_BATCH", str(DEFAULT_MAX_BATCH))))
+            _shared_store_created = True
+        return _shared_store
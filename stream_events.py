@@ -0,0 +1,31 @@
+"""
+Stream Events Module
+
+Typed events produced while the agent graph processes a message. Tokens and
+transition notices travel through the same stream so that callers can either
+render them as text or forward them as separate server-sent events.
+"""
+
+import json
+from typing import Dict
+
+EVENT_TOKEN = "token"
+EVENT_TRANSITION = "transition"
+EVENT_DONE = "done"
+EVENT_ERROR = "error"
+
+
+def token_event(agent_name: str, content: str) -> Dict:
+    """Create an event carrying a piece of an agent's response"""
+    return {"type": EVENT_TOKEN, "agent": agent_name, "content": content}
+
+
+def transition_event(from_agent: str, to_agent: str, content: str = "", reason: str = "transition") -> Dict:
+    """Create an event announcing a transition; content is the user-visible notice, if any"""
+    return {"type": EVENT_TRANSITION, "from_agent": from_agent, "to_agent": to_agent,
+            "reason": reason, "content": content}
+
+
+def format_sse(event: Dict) -> str:
+    """Serialize an event as a server-sent event frame"""
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
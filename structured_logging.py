@@ -0,0 +1,204 @@
+"""
+Structured Logging Module
+
+This module moves log formatting and I/O off the request path. Loggers hand
+their records, unformatted, to a bounded in-memory queue; a background
+listener thread renders them as one JSON object per line and writes them
+out. Each record carries the session and turn it was logged in (from context
+variables set by the API), and records below WARNING can be sampled per
+logger category, configured by the "logging" section of agent_config.json.
+"""
+
+import atexit
+import contextvars
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, TextIO
+
+DEFAULT_QUEUE_SIZE = 10000
+
+session_id_var: contextvars.ContextVar = contextvars.ContextVar("session_id", default=None)
+turn_id_var: contextvars.ContextVar = contextvars.ContextVar("turn_id", default=None)
+_turn_ids = itertools.count(1)
+
+# Attributes every LogRecord has; anything else was passed through extra= and is emitted as a field
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "asctime", "session_id", "turn_id"}
+
+
+@contextmanager
+def log_context(session_id: Optional[str]) -> Iterator[int]:
+    """
+    Tag every record logged within a with-block with a session and a new turn ID
+
+    Args:
+        session_id: Session the turn belongs to
+
+    Yields:
+        int: The turn ID
+    """
+    turn_id = next(_turn_ids)
+    previous = session_id_var.get(), turn_id_var.get()
+    session_id_var.set(session_id)
+    turn_id_var.set(turn_id)
+    try:
+        yield turn_id
+    finally:
+        # Restored by value: a streamed turn's generator may be finalized in another context
+        session_id_var.set(previous[0])
+        turn_id_var.set(previous[1])
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats a record as a single-line JSON object"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        session_id = getattr(record, "session_id", None)
+        if session_id is not None:
+            entry["session_id"] = session_id
+        turn_id = getattr(record, "turn_id", None)
+        if turn_id is not None:
+            entry["turn_id"] = turn_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that samples records per logger category and never formats on the caller's thread
+
+    A record below WARNING is kept with the sampling rate of the longest
+    configured logger-name prefix matching it (1.0 if none match). When the
+    queue is full the record is dropped and counted rather than blocking.
+    """
+
+    def __init__(self, log_queue: queue.Queue, sampling: Optional[Dict[str, float]] = None):
+        super().__init__(log_queue)
+        self.sampling = dict(sampling or {})
+        self._rates: Dict[str, float] = {}
+        self.dropped = 0
+        self.sampled_out = 0
+
+    def _rate(self, logger_name: str) -> float:
+        """Get the sampling rate of a logger, resolving its category once"""
+        rate = self._rates.get(logger_name)
+        if rate is None:
+            rate = 1.0
+            best = -1
+            for prefix, prefix_rate in self.sampling.items():
+                if (logger_name == prefix or logger_name.startswith(prefix + ".")) and len(prefix) > best:
+                    rate, best = prefix_rate, len(prefix)
+            self._rates[logger_name] = rate
+        return rate
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.levelno < logging.WARNING:
+            rate = self._rate(record.name)
+            if rate < 1.0 and (rate <= 0.0 or random.random() >= rate):
+                self.sampled_out += 1
+                return
+        record.session_id = session_id_var.get()
+        record.turn_id = turn_id_var.get()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting (including the message arguments) happens on the listener thread
+        return record
+
+
+class _Pipeline:
+    """The installed handler and listener"""
+
+    def __init__(self, handler: SamplingQueueHandler, listener: logging.handlers.QueueListener):
+        self.handler = handler
+        self.listener = listener
+
+
+_pipeline: Optional[_Pipeline] = None
+_pipeline_lock = threading.Lock()
+
+
+def configure_logging(settings: Optional[Dict] = None, stream: Optional[TextIO] = None) -> SamplingQueueHandler:
+    """
+    Route all logging through the background JSON pipeline, replacing any previous configuration
+
+    Args:
+        settings: The "logging" section of agent_config.json: "level" (default INFO), "sampling"
+            (logger-name prefix to the fraction of records below WARNING kept) and "queue_size".
+            LOG_LEVEL in the environment overrides the level.
+        stream: Where records are written (default stderr)
+
+    Returns:
+        SamplingQueueHandler: The handler installed on the root logger
+    """
+    global _pipeline
+    settings = settings or {}
+    level = os.environ.get("LOG_LEVEL", settings.get("level", "INFO")).upper()
+    log_queue: queue.Queue = queue.Queue(maxsize=int(settings.get("queue_size", DEFAULT_QUEUE_SIZE)))
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JSONFormatter())
+    handler = SamplingQueueHandler(log_queue, settings.get("sampling"))
+    listener = logging.handlers.QueueListener(log_queue, output)
+
+    with _pipeline_lock:
+        root = logging.getLogger()
+        if _pipeline is None:
+            atexit.register(shutdown_logging)
+        else:
+            root.removeHandler(_pipeline.handler)
+            _pipeline.listener.stop()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(level)
+        listener.start()
+        _pipeline = _Pipeline(handler, listener)
+    return handler
+
+
+def shutdown_logging() -> None:
+    """Write out the queued records and stop the listener thread"""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            return
+        _pipeline.listener.stop()
+        logging.getLogger().removeHandler(_pipeline.handler)
+        _pipeline = None
+
+
+def get_logging_stats() -> Dict:
+    """Get the pipeline's queue depth and dropped and sampled-out record counts"""
+    with _pipeline_lock:
+        if _pipeline is None:
+            return {"enabled": False}
+        handler = _pipeline.handler
+        return {
+            "enabled": True,
+            "level": logging.getLevelName(logging.getLogger().level),
+            "queue_depth": handler.queue.qsize(),
+            "dropped": handler.dropped,
+            "sampled_out": handler.sampled_out,
+            "sampling": dict(handler.sampling),
+        }
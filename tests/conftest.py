@@ -0,0 +1,54 @@
+"""Shared test setup: import the root modules and keep agents from resolving a real backend"""
+
+import os
+import sys
+import threading
+from typing import Dict, List
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(1, os.path.join(REPO_ROOT, "benchmarks"))
+# Agents resolve a backend on construction; tests that need one start their own
+os.environ.setdefault("NGROK_SERVER_URL", "http://127.0.0.1:9")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+@pytest.fixture
+def mock_backend():
+    """Start in-process mock backends (benchmarks/mock_backend.py) on free ports; call with its CLI flags"""
+    from mock_backend import build_parser, create_server
+
+    servers = []
+
+    def start(*flags: str):
+        args = build_parser().parse_args(["--port", "0", "--ttft", "fixed:0", "--token-delay", "fixed:0", *flags])
+        server = create_server(args)
+        threading.Thread(target=server.serve_forever, name="mock-backend", daemon=True).start()
+        servers.append(server)
+        host, port = server.server_address[:2]
+        server.url = f"http://{host}:{port}"
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def scripted_session():
+    """Create sessions of the configured graph whose agents answer from a script instead of a backend"""
+    from config_registry import load_agent_config
+    from json_graph_builder import JSONGraphBuilder
+
+    def create(replies: Dict[str, str]):
+        graph = JSONGraphBuilder.build_graph_from_config(load_agent_config())
+        for name, node in graph.nodes.items():
+            async def aexecute_with_streaming(messages: List[Dict], reply=replies.get(name, "OK.")):
+                yield reply
+            node.agent.aexecute_with_streaming = aexecute_with_streaming
+        return graph.create_session()
+
+    return create
@@ -0,0 +1,148 @@
+"""BackendPool failover, ejection, slow-start re-admission and health probes against mock backends"""
+
+import time
+
+import pytest
+
+import backend_pool
+from agents.voice_agent import ConversationalAgent
+from backend_pool import MIN_SLOW_START_WEIGHT, STATE_EJECTED, STATE_HEALTHY, Backend, BackendPool
+from http_pool import PooledHTTPClient
+
+
+@pytest.fixture
+def http_client():
+    return PooledHTTPClient(connect_timeout=1.0, read_timeout=5.0)
+
+
+def make_pool(urls, http_client, **options) -> BackendPool:
+    return BackendPool([Backend(url, "mock-model") for url in urls], http_client=http_client, **options)
+
+
+def fail(pool: BackendPool, backend: Backend, times: int) -> None:
+    for _ in range(times):
+        assert pool.acquire() is backend
+        pool.release(backend, success=False, error="injected failure")
+
+
+def wait_for(condition, timeout: float = 3.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_failover_to_healthy_backend(mock_backend, http_client, monkeypatch):
+    failing, healthy = mock_backend("--error-rate", "1"), mock_backend()
+    pool = make_pool([failing.url, healthy.url], http_client, failure_threshold=2)
+    # Ties go to the first backend listed, so the failing one is tried first until it is ejected
+    monkeypatch.setattr(backend_pool.random, "random", lambda: 1.0)
+    agent = ConversationalAgent("test_agent", agent_system_prompt="You are a test agent.",
+                                http_client=http_client, backend_pool=pool)
+
+    replies = [agent.send_request("Hello") for _ in range(4)]
+
+    assert all(not reply.startswith("[Error") for reply in replies)
+    assert failing.stats["errors"] == 2 and healthy.stats["requests"] == 4
+    bad, good = pool.backends
+    assert bad.state == STATE_EJECTED and bad.ejections == 1
+    assert good.failures == 0 and good.outstanding == 0 and bad.outstanding == 0
+
+
+def test_client_errors_do_not_fail_over(mock_backend, http_client):
+    server = mock_backend("--error-rate", "1", "--error-status", "400")
+    pool = make_pool([server.url, mock_backend().url], http_client, failure_threshold=1)
+    agent = ConversationalAgent("test_agent", http_client=http_client, backend_pool=pool)
+    pool.backends[1].outstanding = 100  # Steer the request to the first backend
+
+    assert agent.send_request("Hello").startswith("[Error")
+    assert pool.backends[0].state == STATE_HEALTHY and pool.backends[0].failures == 0
+
+
+def test_ejection_after_consecutive_failures(http_client):
+    pool = make_pool(["http://127.0.0.1:9", "http://127.0.0.1:10"], http_client, failure_threshold=3)
+    first, second = pool.backends
+    second.outstanding = 100  # Keep acquire() on the first backend
+
+    fail(pool, first, 2)
+    pool.release(pool.acquire(), success=True)
+    fail(pool, first, 2)
+    assert first.state == STATE_HEALTHY and first.consecutive_failures == 2
+
+    fail(pool, first, 1)
+    assert first.state == STATE_EJECTED and first.failures == 5 and first.ejections == 1
+    assert all(pool.acquire() is second for _ in range(5))
+
+
+def test_all_ejected_uses_backend_whose_ejection_ends_first(http_client):
+    pool = make_pool(["http://127.0.0.1:9", "http://127.0.0.1:10"], http_client, failure_threshold=1,
+                     ejection_seconds=60.0)
+    first, second = pool.backends
+    second.outstanding = 100
+    fail(pool, first, 1)
+    second.outstanding = 0
+    fail(pool, second, 1)
+
+    assert pool.acquire() is first
+
+
+def test_slow_start_readmission(http_client):
+    pool = make_pool(["http://127.0.0.1:9", "http://127.0.0.1:10"], http_client, failure_threshold=1,
+                     ejection_seconds=0.05, slow_start_seconds=0.5)
+    ejected, steady = pool.backends
+    steady.outstanding = 100
+    fail(pool, ejected, 1)
+    steady.outstanding = 0
+    assert all(pool.acquire() is steady for _ in range(3))
+    for _ in range(3):
+        pool.release(steady)
+
+    time.sleep(0.06)
+    picks = [pool.acquire() for _ in range(8)]
+
+    # Re-admitted on the first acquire() after its ejection, then weighted down to a fraction of the traffic
+    assert ejected.state == STATE_HEALTHY and ejected.admitted_at is not None
+    assert ejected.weight(time.monotonic(), pool.slow_start_seconds) < 0.5
+    assert picks.count(ejected) <= 1
+    for backend in picks:
+        pool.release(backend)
+
+    time.sleep(0.5)
+    assert ejected.weight(time.monotonic(), pool.slow_start_seconds) == 1.0
+    assert ejected.admitted_at is None
+
+
+def test_slow_start_weight_has_a_floor():
+    backend = Backend("http://127.0.0.1:9")
+    backend.admitted_at = time.monotonic()
+    assert backend.weight(time.monotonic(), 60.0) == MIN_SLOW_START_WEIGHT
+
+
+def test_health_probes_eject_and_readmit(mock_backend, http_client):
+    server = mock_backend()
+    pool = make_pool([server.url, "http://127.0.0.1:9"], http_client, failure_threshold=2,
+                     ejection_seconds=0.1, slow_start_seconds=10.0)
+    live, dead = pool.backends
+
+    assert pool.probe(live) is True
+    assert pool.probe(dead) is False and dead.state == STATE_HEALTHY
+    assert pool.probe(dead) is False and dead.state == STATE_EJECTED
+
+    dead.outstanding = 100
+    fail(pool, live, 2)
+    dead.outstanding = 0
+    assert live.state == STATE_EJECTED
+    pool.start_health_checks(interval_seconds=0.05)
+    try:
+        assert wait_for(lambda: live.state == STATE_HEALTHY)
+        assert live.admitted_at is not None and live.consecutive_failures == 0
+        # With probes running, only a successful probe lets a backend back in
+        time.sleep(0.2)
+        assert dead.state == STATE_EJECTED
+        assert all(pool.acquire() is live for _ in range(3))
+        assert pool.get_stats()["health_checks"] is True
+    finally:
+        pool.stop_health_checks()
+    assert pool.get_stats()["health_checks"] is False
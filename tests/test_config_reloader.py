@@ -0,0 +1,53 @@
+"""A config reload is published to the rest of the process only once its graph is live"""
+
+import json
+import os
+import shutil
+
+import pytest
+
+from config_registry import load_agent_config
+from config_reloader import ConfigReloader
+from json_graph_builder import JSONGraphBuilder
+from session_manager import SessionManager
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    path = tmp_path / "agent_config.json"
+    shutil.copy(os.path.join(os.path.dirname(os.path.dirname(__file__)), "agent_config.json"), path)
+    return str(path)
+
+
+def rewrite(config_file, change):
+    with open(config_file) as f:
+        config = json.load(f)
+    change(config)
+    with open(config_file, "w") as f:
+        json.dump(config, f)
+
+
+def test_failed_build_keeps_the_published_config(config_file):
+    original = load_agent_config(config_file)
+    manager = SessionManager(JSONGraphBuilder.build_graph_from_config(original))
+    reloader = ConfigReloader(manager, config_file)
+
+    # Valid JSON that compiles, but the graph cannot be built: a second root agent
+    rewrite(config_file, lambda config: config["agents"][1].update(is_root=True))
+    with pytest.raises(ValueError):
+        reloader.reload()
+
+    assert load_agent_config(config_file) is original
+    assert manager.version == 1
+
+
+def test_successful_reload_publishes_the_new_config(config_file):
+    manager = SessionManager(JSONGraphBuilder.build_graph_from_config(load_agent_config(config_file)))
+    reloader = ConfigReloader(manager, config_file)
+
+    rewrite(config_file, lambda config: config["agents"][0].update(temperature=0.1))
+    report = reloader.reload()
+
+    assert report["reloaded"] and manager.version == 2
+    assert load_agent_config(config_file) is manager.template_graph.config
+    assert load_agent_config(config_file).agents["reception_agent"]["temperature"] == 0.1
@@ -0,0 +1,87 @@
+"""The intent router's fast path must leave compound requests to the root agent, which fans them out"""
+
+import asyncio
+from typing import Dict, List
+
+import pytest
+
+from intent_router import IntentRouter
+
+COMPOUND_MESSAGES = [
+    "book a room for the interview and get the candidate a visitor badge",
+    "please sort out a room and a pass for my guest tomorrow",
+]
+
+REPLIES = {
+    "reception_agent": "I'll get both teams on it. TRANSITION_TO:booking_agent&visitor_agent",
+    "booking_agent": "Room 4B is reserved for the interview.",
+    "visitor_agent": "A visitor badge is waiting at reception.",
+}
+
+
+async def collect(session, message: str) -> List[Dict]:
+    return [event async for event in session.aprocess_events(message)]
+
+
+@pytest.mark.parametrize("message", COMPOUND_MESSAGES)
+def test_router_declines_compound_requests(message, scripted_session):
+    router = scripted_session(REPLIES).intent_router
+    assert router.route(message) is None
+    assert router.get_stats()["ambiguous"] == 1
+
+
+def test_router_declines_matches_for_several_agents():
+    router = IntentRouter({"booking_agent": [r"\bbook\b"], "visitor_agent": [r"\bbadges?\b", r"\bvisitors?\b"]})
+    assert router.route("book the boardroom, I need a visitor badge") is None
+    assert router.route("I need to book the boardroom")["target_agent"] == "booking_agent"
+
+
+@pytest.mark.parametrize("message", COMPOUND_MESSAGES)
+def test_compound_requests_reach_fanout(message, monkeypatch, scripted_session):
+    session = scripted_session(REPLIES)
+    fanouts = []
+    afanout = session._afanout
+
+    def spy(from_agent, user_message, response, target_agents, **kwargs):
+        fanouts.append((from_agent, list(target_agents)))
+        return afanout(from_agent, user_message, response, target_agents, **kwargs)
+
+    monkeypatch.setattr(session, "_afanout", spy)
+    events = asyncio.run(collect(session, message))
+
+    assert fanouts == [("reception_agent", ["booking_agent", "visitor_agent"])]
+    text = "".join(event["content"] or "" for event in events)
+    assert REPLIES["booking_agent"] in text and REPLIES["visitor_agent"] in text
+    assert session.get_current_agent().get_name() == "reception_agent"
+
+
+def test_fanout_with_every_branch_failing_is_recorded(monkeypatch, scripted_session):
+    session = scripted_session(REPLIES)
+
+    async def unavailable(messages):
+        raise RuntimeError("backend unavailable")
+        yield  # pragma: no cover
+
+    for name in ("booking_agent", "visitor_agent"):
+        monkeypatch.setattr(session.nodes[name].agent, "aexecute_with_streaming", unavailable)
+
+    with pytest.raises(RuntimeError, match="backend unavailable"):
+        asyncio.run(collect(session, COMPOUND_MESSAGES[0]))
+
+    # The turn stays in the history, so the next turn's context has it
+    turn = [message["content"] for message in session.conversation_history.messages()]
+    assert turn[0] == COMPOUND_MESSAGES[0] and len(turn) == 3
+    assert "[booking_agent]" in turn[-1] and "[visitor_agent]" in turn[-1]
+    assert "could not be handled" in turn[-1]
+    assert session.get_current_agent().get_name() == "reception_agent"
+
+
+def test_single_department_request_skips_the_root_llm(scripted_session):
+    replies = dict(REPLIES, reception_agent="This reply must not be requested.")
+    session = scripted_session(replies)
+    events = asyncio.run(collect(session, "I need to book a meeting room"))
+
+    text = "".join(event["content"] or "" for event in events)
+    assert replies["reception_agent"] not in text
+    assert REPLIES["booking_agent"] in text
+    assert session.intent_router.get_stats()["routed"] == 1
@@ -0,0 +1,59 @@
+"""Multi-step routes written by an agent are cleaned up before they become the session's route plan"""
+
+import asyncio
+from typing import Dict, List
+
+import pytest
+
+SCHEDULER_REPLY = "Your meeting is scheduled for Tuesday at ten."
+
+
+async def collect(session, message: str) -> List[Dict]:
+    return [event async for event in session.aprocess_events(message)]
+
+
+def plan_for(session, path: str):
+    """Run detect_intent_and_transition on a reception reply naming a multi-step path"""
+    manager = session.transition_manager
+    next_agent = manager.detect_intent_and_transition(
+        "I need a room for Tuesday", f"Let me route you. TRANSITION_TO:{path}", session.root, session.nodes)
+    return next_agent, manager.plan
+
+
+@pytest.mark.parametrize("path", [
+    "reception_agent->booking_agent->scheduler_agent",
+    "booking_agent->scheduler_agent",
+    "Reception_Department->Booking_Department->booking_agent->scheduler_agent",
+])
+def test_requested_route_starts_at_the_current_agent(path, scripted_session):
+    next_agent, plan = plan_for(scripted_session({}), path)
+    assert next_agent == "booking_agent"
+    assert plan.path == ["reception_agent", "booking_agent", "scheduler_agent"]
+
+
+@pytest.mark.parametrize("path, expected", [
+    ("booking_agent->travel_agent->scheduler_agent", ["reception_agent", "booking_agent"]),
+    ("booking_agent->scheduler_agent->travel_agent", ["reception_agent", "booking_agent", "scheduler_agent"]),
+])
+def test_requested_route_is_truncated_at_an_unknown_agent(path, expected, scripted_session):
+    next_agent, plan = plan_for(scripted_session({}), path)
+    assert next_agent == "booking_agent"
+    assert plan.path == expected
+
+
+def test_requested_route_with_only_unknown_agents_is_ignored(scripted_session):
+    next_agent, plan = plan_for(scripted_session({}), "travel_agent->scheduler_agent")
+    assert next_agent is None and plan is None
+
+
+def test_route_naming_the_current_agent_is_relayed_in_one_turn(scripted_session):
+    session = scripted_session({
+        "reception_agent": "Let me route you. TRANSITION_TO:reception_agent->booking_agent->scheduler_agent",
+        "scheduler_agent": SCHEDULER_REPLY,
+    })
+    events = asyncio.run(collect(session, "I need a room for Tuesday"))
+
+    assert session.get_current_agent().get_name() == "scheduler_agent"
+    assert session.get_agent_path() == ["reception_agent", "booking_agent", "scheduler_agent"]
+    assert SCHEDULER_REPLY in "".join(event["content"] or "" for event in events)
+    assert session.get_turn_stats()["refused"] == []
@@ -0,0 +1,134 @@
+"""Session saves are a compare-and-set, so workers sharing a store never lose each other's turns"""
+
+import asyncio
+import threading
+
+import pytest
+
+from config_registry import load_agent_config
+from json_graph_builder import JSONGraphBuilder
+from session_manager import SessionManager
+from session_store import (AppendOnlyFileSessionStore, BatchingSessionStore, MemorySessionStore, SessionConflict,
+                           SQLiteSessionStore)
+
+
+@pytest.fixture(scope="module")
+def template_graph():
+    return JSONGraphBuilder.build_graph_from_config(load_agent_config())
+
+
+@pytest.fixture(params=["sqlite", "file", "sqlite+batching"])
+def store_factory(request, tmp_path):
+    """Create stores on one shared file, as separate workers would"""
+    stores = []
+
+    def create():
+        if request.param.startswith("sqlite"):
+            store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+        else:
+            store = AppendOnlyFileSessionStore(str(tmp_path / "sessions.jsonl"))
+        if request.param.endswith("batching"):
+            store = BatchingSessionStore(store, flush_interval=0.001)
+        stores.append(store)
+        return store
+
+    yield create
+    for store in stores:
+        store.close()
+
+
+def run_turn(manager: SessionManager, session_id: str, content: str) -> None:
+    graph = manager.get_session(session_id)
+    graph.conversation_history.append({"role": "user", "content": content})
+    manager.end_turn(session_id)
+
+
+def history(manager: SessionManager, session_id: str):
+    return [message["content"] for message in manager.get_session(session_id).conversation_history.messages()]
+
+
+def test_concurrent_turns_on_two_workers_conflict_instead_of_losing_one(template_graph, store_factory):
+    worker_a = SessionManager(template_graph, store=store_factory())
+    worker_b = SessionManager(template_graph, store=store_factory())
+    run_turn(worker_a, "s1", "first")
+
+    # Both workers load revision 1 and continue it
+    graph_a, graph_b = worker_a.get_session("s1"), worker_b.get_session("s1")
+    graph_a.conversation_history.append({"role": "user", "content": "from a"})
+    graph_b.conversation_history.append({"role": "user", "content": "from b"})
+    worker_a.end_turn("s1")
+    with pytest.raises(SessionConflict):
+        worker_b.end_turn("s1")
+    assert worker_b.get_stats()["store_conflicts"] == 1
+
+    # The losing worker reloads the winner's state and its retried turn builds on it
+    assert history(worker_b, "s1") == ["first", "from a"]
+    run_turn(worker_b, "s1", "from b")
+    assert history(worker_a, "s1") == ["first", "from a", "from b"]
+
+
+def test_stale_worker_reloads_before_its_turn(template_graph, store_factory):
+    worker_a = SessionManager(template_graph, store=store_factory())
+    worker_b = SessionManager(template_graph, store=store_factory())
+    run_turn(worker_a, "s1", "one")
+    assert history(worker_b, "s1") == ["one"]
+    run_turn(worker_a, "s1", "two")
+
+    # The save has been written by the time end_turn returns, so the next turn anywhere sees it
+    run_turn(worker_b, "s1", "three")
+    assert history(worker_a, "s1") == ["one", "two", "three"]
+
+
+def test_compare_and_set_on_the_base_revision(tmp_path):
+    for store in (MemorySessionStore(), SQLiteSessionStore(str(tmp_path / "cas.db")),
+                  AppendOnlyFileSessionStore(str(tmp_path / "cas.jsonl"))):
+        assert store.save("s1", {"revision": 1, "n": "a"})
+        assert not store.save("s1", {"revision": 1, "n": "b"})
+        assert not store.save("s1", {"revision": 3, "n": "c"})
+        assert store.save_batch({"s1": {"revision": 2, "n": "d"}, "s2": {"revision": 2, "n": "e"}}) == ["s2"]
+        assert store.load("s1") == {"revision": 2, "n": "d"} and store.load("s2") is None
+        store.close()
+
+
+def test_batching_store_writes_concurrent_saves_together(tmp_path):
+    store = BatchingSessionStore(SQLiteSessionStore(str(tmp_path / "batch.db")), flush_interval=0.05)
+    results = {}
+
+    def save(session_id):
+        results[session_id] = store.save(session_id, {"revision": 1})
+
+    threads = [threading.Thread(target=save, args=(f"s{i}",)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(results.values()) and len(results) == 8
+    assert store.save("s0", {"revision": 1}) is False
+
+    stats = store.get_stats()
+    assert stats["sessions"] == 8
+    assert stats["batching"]["batches"] < 8 and stats["batching"]["conflicts"] == 1
+    store.close()
+
+
+def test_async_session_lookup_runs_store_io_off_the_event_loop(template_graph, tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    threads = []
+    for name in ("revision", "load", "save_batch"):
+        method = getattr(store, name)
+        setattr(store, name, lambda *args, method=method: threads.append(threading.current_thread()) or method(*args))
+    manager = SessionManager(template_graph, store=store)
+
+    async def turn(content):
+        graph = await manager.aget_session("s1")
+        graph.conversation_history.append({"role": "user", "content": content})
+        await manager.aend_turn("s1")
+
+    asyncio.run(turn("one"))
+    manager._sessions.clear()  # Evicted: the next lookup loads the state from the store
+    asyncio.run(turn("two"))
+    assert asyncio.run(manager.apeek_session("s1")) is not None
+
+    assert threads and threading.main_thread() not in threads
+    assert history(manager, "s1") == ["one", "two"]
+    store.close()
@@ -0,0 +1,271 @@
+"""
+Tool Registry Module
+
+This module binds Python implementations to the tools agents declare in
+agent_config.json and executes the tool calls a backend returns. The calls
+of one response are independent of each other, so they are dispatched
+together to a bounded thread pool and each is given its own timeout; the
+results of idempotent tools are memoized in a TTL cache, so repeating a
+lookup costs a dictionary access instead of the work.
+"""
+
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional
+
+from config_registry import load_agent_config
+from metrics import TOOL_CALLS, TOOL_LATENCY
+from office_tools import register_office_tools
+from response_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_TIMEOUT = 5.0
+DEFAULT_MAX_ROUNDS = 2
+DEFAULT_CACHE_MAX_ENTRIES = 1024
+DEFAULT_CACHE_TTL = 300.0
+
+# Metric label for calls naming a tool that is not registered (the name comes from the model)
+UNKNOWN_TOOL = "_unknown"
+
+
+def merge_tool_call_delta(tool_calls: List[Dict], delta: Dict) -> None:
+    """
+    Add a streamed tool call fragment (an entry of delta.tool_calls) to the calls assembled so far
+
+    Args:
+        tool_calls: Calls assembled so far, in OpenAI message format; extended in place
+        delta: Fragment with an "index" and optionally "id", "function.name" and a piece of "function.arguments"
+    """
+    index = delta.get("index", len(tool_calls))
+    while len(tool_calls) <= index:
+        tool_calls.append({"id": None, "type": "function", "function": {"name": "", "arguments": ""}})
+    call = tool_calls[index]
+    if delta.get("id"):
+        call["id"] = delta["id"]
+    function = delta.get("function") or {}
+    if function.get("name"):
+        call["function"]["name"] = function["name"]
+    if function.get("arguments"):
+        call["function"]["arguments"] += function["arguments"]
+
+
+class Tool:
+    """A registered tool implementation and its execution options"""
+
+    __slots__ = ("name", "function", "idempotent", "timeout", "ttl")
+
+    def __init__(self, name: str, function: Callable[..., Any], idempotent: bool, timeout: float,
+                 ttl: Optional[float]):
+        self.name = name
+        self.function = function
+        self.idempotent = idempotent
+        self.timeout = timeout
+        self.ttl = ttl
+
+
+class ToolRegistry:
+    """Tool implementations by name, executed in parallel on a bounded pool with memoization"""
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, default_timeout: float = DEFAULT_TIMEOUT,
+                 max_rounds: int = DEFAULT_MAX_ROUNDS, cache: Optional[TTLCache] = None, enabled: bool = True):
+        """
+        Initialize the registry
+
+        Args:
+            max_workers: Tool calls executed at the same time; further calls queue for a worker
+            default_timeout: Seconds a tool call may take unless the tool was registered with its own timeout
+            max_rounds: Tool rounds (tool calls followed by another completion) allowed per agent response
+            cache: Cache for the results of idempotent tools (a new one if omitted)
+            enabled: Whether agents send their tool schemas to the backend and execute its tool calls
+        """
+        self.default_timeout = default_timeout
+        self.max_rounds = max_rounds
+        self.enabled = enabled
+        self.cache = cache or TTLCache(DEFAULT_CACHE_MAX_ENTRIES, DEFAULT_CACHE_TTL)
+        self._tools: Dict[str, Tool] = {}
+        self._max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="tool")
+        self._lock = threading.Lock()
+        self._counters = {"calls": 0, "ok": 0, "errors": 0, "timeouts": 0, "cached": 0, "unknown": 0}
+
+    def register(self, name: str, function: Callable[..., Any], idempotent: bool = False,
+                 timeout: Optional[float] = None, ttl: Optional[float] = None) -> None:
+        """
+        Bind an implementation to a tool name, replacing any previous one
+
+        Args:
+            name: Tool name as declared in agent_config.json
+            function: Called with the call's arguments as keyword arguments; returns a JSON-serializable result
+            idempotent: Whether calls with the same arguments return the same result without side
+                effects, so results can be memoized
+            timeout: Seconds a call may take, from dispatch (default: the registry's default)
+            ttl: Seconds a memoized result stays valid (default: the cache's default)
+        """
+        self._tools[name] = Tool(name, function, idempotent,
+                                 self.default_timeout if timeout is None else timeout, ttl)
+
+    def get(self, name: str) -> Optional[Callable[..., Any]]:
+        """Get the implementation of a tool, or None if none is registered"""
+        tool = self._tools.get(name)
+        return tool.function if tool is not None else None
+
+    def is_idempotent(self, name: str) -> bool:
+        """Whether a tool is registered and its results may be memoized"""
+        tool = self._tools.get(name)
+        return tool is not None and tool.idempotent
+
+    @staticmethod
+    def _cache_key(name: str, arguments: Dict) -> str:
+        payload = json.dumps([name, arguments], sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _run(tool: Tool, arguments: Dict) -> str:
+        """Execute a tool on a worker and serialize its result"""
+        started = time.perf_counter()
+        try:
+            return json.dumps(tool.function(**arguments), default=str)
+        finally:
+            TOOL_LATENCY.observe(time.perf_counter() - started, (tool.name,))
+
+    def _count(self, tool_name: str, result: str, counter: str) -> None:
+        TOOL_CALLS.inc((tool_name, result))
+        with self._lock:
+            self._counters["calls"] += 1
+            self._counters[counter] += 1
+
+    def execute(self, agent_name: str, tool_calls: List[Dict]) -> List[Dict]:
+        """
+        Execute the tool calls of one backend response
+
+        All calls are dispatched before any result is awaited, so they run in
+        parallel and the round takes about as long as its slowest call. A call
+        that fails, times out or names an unknown tool gets an error result
+        rather than failing the others.
+
+        Args:
+            agent_name: Agent whose response made the calls
+            tool_calls: Calls in OpenAI message format ("id", "function" with "name" and JSON "arguments");
+                a call without an ID is given one in place, so the calls can be sent back with their results
+
+        Returns:
+            One "tool" role message per call, in the order of tool_calls
+        """
+        contents: List[Optional[str]] = [None] * len(tool_calls)
+        pending = []
+        for index, call in enumerate(tool_calls):
+            call["id"] = call.get("id") or f"call_{index}"
+            name = call["function"]["name"]
+            tool = self._tools.get(name)
+            if tool is None:
+                contents[index] = json.dumps({"error": f"Unknown tool: {name}"})
+                self._count(UNKNOWN_TOOL, "unknown", "unknown")
+                continue
+            try:
+                arguments = json.loads(call["function"].get("arguments") or "{}")
+                if not isinstance(arguments, dict):
+                    raise ValueError("arguments must be a JSON object")
+            except ValueError as e:
+                contents[index] = json.dumps({"error": f"Invalid arguments for {name}: {e}"})
+                self._count(name, "error", "errors")
+                continue
+            key = self._cache_key(name, arguments) if tool.idempotent else None
+            if key is not None:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    contents[index] = cached
+                    self._count(name, "cached", "cached")
+                    continue
+            future = self._executor.submit(contextvars.copy_context().run, self._run, tool, arguments)
+            pending.append((index, tool, key, future, time.monotonic() + tool.timeout))
+
+        for index, tool, key, future, deadline in pending:
+            try:
+                content = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                # A running call cannot be interrupted; its result is discarded when it finishes
+                future.cancel()
+                contents[index] = json.dumps({"error": f"{tool.name} timed out after {tool.timeout}s"})
+                self._count(tool.name, "timeout", "timeouts")
+                logger.warning("Tool call timed out", extra={"agent": agent_name, "tool": tool.name,
+                                                             "timeout_s": tool.timeout})
+            except Exception as e:
+                contents[index] = json.dumps({"error": f"{tool.name} failed: {e}"})
+                self._count(tool.name, "error", "errors")
+                logger.warning("Tool call failed", extra={"agent": agent_name, "tool": tool.name,
+                                                          "error": str(e)})
+            else:
+                contents[index] = content
+                self._count(tool.name, "ok", "ok")
+                if key is not None:
+                    self.cache.put(key, content, tool.ttl)
+
+        return [{"role": "tool", "tool_call_id": call["id"], "name": call["function"]["name"], "content": content}
+                for call, content in zip(tool_calls, contents)]
+
+    def close(self) -> None:
+        """Stop the worker pool, dropping queued calls"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> Dict:
+        """Get the registered tools, call counters and result cache statistics"""
+        with self._lock:
+            counters = dict(self._counters)
+        return {
+            "enabled": self.enabled,
+            "tools": {name: {"idempotent": tool.idempotent, "timeout_s": tool.timeout, "ttl_s": tool.ttl}
+                      for name, tool in sorted(self._tools.items())},
+            "max_workers": self._max_workers,
+            "default_timeout_s": self.default_timeout,
+            "max_rounds": self.max_rounds,
+            **counters,
+            "cache": self.cache.get_stats(),
+        }
+
+
+def create_tool_registry(settings: Optional[Dict] = None) -> ToolRegistry:
+    """
+    Create a registry with the office tools registered
+
+    Args:
+        settings: The "tools" section of agent_config.json: "enabled", "max_workers", "timeout_seconds",
+            "max_rounds" and "cache" ("max_entries", "ttl_seconds"). TOOL_EXECUTION (0 disables),
+            TOOL_MAX_WORKERS and TOOL_TIMEOUT_SECONDS in the environment override them.
+
+    Returns:
+        ToolRegistry: The configured registry
+    """
+    settings = settings or {}
+    cache_settings = settings.get("cache", {})
+    registry = ToolRegistry(
+        max_workers=int(os.environ.get("TOOL_MAX_WORKERS", settings.get("max_workers", DEFAULT_MAX_WORKERS))),
+        default_timeout=float(os.environ.get("TOOL_TIMEOUT_SECONDS", settings.get("timeout_seconds", DEFAULT_TIMEOUT))),
+        max_rounds=int(settings.get("max_rounds", DEFAULT_MAX_ROUNDS)),
+        cache=TTLCache(int(cache_settings.get("max_entries", DEFAULT_CACHE_MAX_ENTRIES)),
+                       float(cache_settings.get("ttl_seconds", DEFAULT_CACHE_TTL))),
+        enabled=os.environ.get("TOOL_EXECUTION", "1" if settings.get("enabled", True) else "0") != "0",
+    )
+    register_office_tools(registry)
+    return registry
+
+
+_shared_registry: Optional[ToolRegistry] = None
+_shared_registry_lock = threading.Lock()
+
+
+def get_tool_registry() -> ToolRegistry:
+    """Get the process-wide tool registry, configured by the "tools" section of agent_config.json"""
+    global _shared_registry
+    if _shared_registry is None:
+        with _shared_registry_lock:
+            if _shared_registry is None:
+                _shared_registry = create_tool_registry(load_agent_config().raw.get("tools"))
+    return _shared_registry
@@ -0,0 +1,157 @@
+"""
+Transition Log Module
+
+This module records agent transitions in a fixed-capacity ring buffer of
+compact records. Records hold interned agent names, a timestamp and the IDs
+of the conversation messages involved instead of copies of their text, and
+can be read page by page with a sequence-number cursor.
+"""
+
+import os
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_CAPACITY = int(os.environ.get("TRANSITION_LOG_CAPACITY", "256"))
+
+
+class TransitionRecord:
+    """One transition between two agents"""
+
+    __slots__ = ("seq", "kind", "from_agent", "to_agent", "timestamp", "user_message_id", "response_message_id")
+
+    def __init__(self, seq: int, kind: str, from_agent: str, to_agent: str, timestamp: float,
+                 user_message_id: Optional[int], response_message_id: Optional[int]):
+        self.seq = seq
+        self.kind = kind
+        self.from_agent = from_agent
+        self.to_agent = to_agent
+        self.timestamp = timestamp
+        self.user_message_id = user_message_id
+        self.response_message_id = response_message_id
+
+    def to_dict(self) -> Dict:
+        """Get the record as a JSON-serializable dictionary"""
+        return {
+            "seq": self.seq,
+            "kind": self.kind,
+            "from_agent": self.from_agent,
+            "to_agent": self.to_agent,
+            "timestamp": self.timestamp,
+            "user_message_id": self.user_message_id,
+            "response_message_id": self.response_message_id,
+        }
+
+
+class TransitionLog:
+    """Ring buffer keeping the most recent transitions of a session"""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        """
+        Initialize an empty log
+
+        Args:
+            capacity: Number of records kept; older records are overwritten
+        """
+        self.capacity = capacity
+        self._buffer: List[Optional[TransitionRecord]] = [None] * capacity
+        self._next_seq = 0
+        self._first_seq_floor = 0  # Records before this were never held (e.g. not part of a restored state)
+
+    def append(self, from_agent: str, to_agent: str, kind: str = "transition",
+               user_message_id: Optional[int] = None, response_message_id: Optional[int] = None) -> TransitionRecord:
+        """
+        Record a transition, overwriting the oldest record if the log is full
+
+        Args:
+            from_agent: Agent the conversation left
+            to_agent: Agent the conversation moved to
+            kind: What caused the transition (e.g. "transition", "completion", "intent_router")
+            user_message_id: ID of the user message in the conversation history
+            response_message_id: ID of the agent response in the conversation history
+
+        Returns:
+            TransitionRecord: The stored record
+        """
+        record = TransitionRecord(self._next_seq, sys.intern(kind), sys.intern(from_agent), sys.intern(to_agent),
+                                  time.time(), user_message_id, response_message_id)
+        self._buffer[self._next_seq % self.capacity] = record
+        self._next_seq += 1
+        return record
+
+    @property
+    def first_seq(self) -> int:
+        """Sequence number of the oldest record still held"""
+        return max(self._first_seq_floor, self._next_seq - self.capacity)
+
+    @property
+    def dropped(self) -> int:
+        """Number of records overwritten so far"""
+        return self.first_seq
+
+    def last(self) -> Optional[TransitionRecord]:
+        """Get the most recent record"""
+        return self._buffer[(self._next_seq - 1) % self.capacity] if self._next_seq else None
+
+    def recent(self, count: int) -> List[TransitionRecord]:
+        """Get up to count most recent records, oldest first"""
+        start = max(self.first_seq, self._next_seq - count)
+        return [self._buffer[seq % self.capacity] for seq in range(start, self._next_seq)]
+
+    def page(self, cursor: int = 0, limit: int = 100) -> Tuple[List[TransitionRecord], int, bool]:
+        """
+        Read records in order starting at a cursor
+
+        Args:
+            cursor: Sequence number to start from (records already overwritten are skipped)
+            limit: Maximum number of records to return
+
+        Returns:
+            Tuple of (records, cursor for the next page, whether more records follow)
+        """
+        start = max(cursor, self.first_seq)
+        end = min(start + max(limit, 0), self._next_seq)
+        records = [self._buffer[seq % self.capacity] for seq in range(start, end)]
+        return records, max(end, cursor), end < self._next_seq
+
+    def to_state(self) -> Dict:
+        """Get the held records and the next sequence number as JSON-serializable data"""
+        return {"next_seq": self._next_seq, "records": [record.to_dict() for record in self]}
+
+    @classmethod
+    def from_state(cls, state: Dict, capacity: int = DEFAULT_CAPACITY) -> "TransitionLog":
+        """
+        Recreate a log from to_state() data
+
+        Args:
+            state: Data returned by to_state()
+            capacity: Capacity of the recreated log; only the newest records that fit are kept
+
+        Returns:
+            TransitionLog: The restored log, continuing the saved sequence numbers
+        """
+        log = cls(capacity)
+        records = state.get("records", [])[-capacity:]
+        log._next_seq = state.get("next_seq", 0)
+        log._first_seq_floor = records[0]["seq"] if records else log._next_seq
+        for data in records:
+            record = TransitionRecord(data["seq"], sys.intern(data["kind"]), sys.intern(data["from_agent"]),
+                                      sys.intern(data["to_agent"]), data["timestamp"],
+                                      data.get("user_message_id"), data.get("response_message_id"))
+            if record.seq >= log.first_seq:
+                log._buffer[record.seq % capacity] = record
+        return log
+
+    def memory_size(self) -> int:
+        """Roughly estimate the memory held by the log, in bytes (agent names are interned and shared)"""
+        size = sys.getsizeof(self._buffer)
+        record = self.last()
+        if record is not None:
+            size += len(self) * (sys.getsizeof(record) + sys.getsizeof(record.timestamp))
+        return size
+
+    def __len__(self) -> int:
+        return self._next_seq - self.first_seq
+
+    def __iter__(self) -> Iterator[TransitionRecord]:
+        return iter(self.recent(self.capacity))
@@ -1,22 +1,229 @@
-from typing import Dict, Generator, List, Optional, TYPE_CHECKING
+import logging
+import os
+import re
+import time
+from typing import AsyncGenerator, Dict, Generator, Iterable, List, Optional, TYPE_CHECKING
 from agent_path_finder import AgentPathFinder
+from async_utils import iterate_sync
+from context_window import ContextWindow
+from metrics import (COMPLETION_TRANSITIONS, TRANSITION_PATH_LENGTH, TRANSITIONS, TRANSITIONS_REFUSED,
+                     TURN_BACKEND_CALLS, TURN_HOPS)
+from stream_events import token_event, transition_event
+from route_plan import (DEFAULT_ROUTE_EXECUTION, PLAN_AUTO, PLAN_REQUESTED, ROUTE_EXECUTION_RELAY,
+                        RoutePlan)
+from transition_log import TransitionLog, TransitionRecord
+from turn_budget import DEFAULT_MAX_BACKEND_CALLS, DEFAULT_MAX_HOPS, TurnBudget
 
 if TYPE_CHECKING:
     from agents.voice_agent import ConversationalAgent
 
+logger = logging.getLogger(__name__)
+
 # Transition constants
 TRANSITION_TEXT = "TRANSITION_TO:"
 TRANSITION_PATH_SEPARATOR = "->"
+# Separates the targets of a fan-out, e.g. TRANSITION_TO:booking_agent&visitor_agent
+FANOUT_SEPARATOR = "&"
+# Agents a transferred agent may hand the conversation to once its task is done
+DEFAULT_COMPLETION_AGENTS = ("reception_agent", "feedback_agent")
+EARLY_DISPATCH = os.environ.get("EARLY_TRANSITION_DISPATCH", "1") != "0"
+
+_TARGET_NAME = re.compile(r"\s*([A-Za-z0-9_]+)")
+
+
+def normalize_agent_name(transition_target: str) -> str:
+    """Normalize a transition target as written by an agent (e.g. "Booking_Department") to an agent name"""
+    return transition_target.lower().replace("_department", "_agent").replace("department", "_agent")
+
+
+class TransitionStreamParser:
+    """
+    Finds a complete TRANSITION_TO:<agent> marker in a response while it is being streamed
+
+    A single target is complete once its name is a known agent and the next
+    non-space character has arrived and does not start a "->" path or an "&"
+    fan-out; paths, fan-outs and unknown names are complete at the end of their line.
+    """
+    
+    def __init__(self, agent_names: Iterable[str]):
+        """
+        Initialize the parser
+        
+        Args:
+            agent_names: Names of the agents a transition may target
+        """
+        self.agent_names = frozenset(agent_names)
+        self._text = ""
+        self._scan_from = 0
+        self._target_start = -1
+        self.complete = False
+    
+    def feed(self, chunk: str) -> Optional[int]:
+        """
+        Add the next streamed chunk
+        
+        Args:
+            chunk: Response delta
+            
+        Returns:
+            Offset within the chunk at which the marker ends once it is complete, None otherwise
+        """
+        if self.complete:
+            return None
+        chunk_start = len(self._text)
+        self._text += chunk
+        if self._target_start < 0:
+            index = self._text.find(TRANSITION_TEXT, max(0, self._scan_from - len(TRANSITION_TEXT) + 1))
+            self._scan_from = len(self._text)
+            if index < 0:
+                return None
+            self._target_start = index + len(TRANSITION_TEXT)
+        
+        end = self._marker_end()
+        if end is None:
+            return None
+        self.complete = True
+        return end - chunk_start
+    
+    def _marker_end(self) -> Optional[int]:
+        """Get the position just after the complete target, or None if more text is needed"""
+        newline = self._text.find("\n", self._target_start)
+        if newline >= 0:
+            return newline
+        match = _TARGET_NAME.match(self._text, self._target_start)
+        if not match or normalize_agent_name(match.group(1)) not in self.agent_names:
+            return None
+        following = self._text[match.end():].lstrip()
+        if not following or following[0] in (TRANSITION_PATH_SEPARATOR[0], FANOUT_SEPARATOR):
+            return None
+        return match.end()
 
 
 class TransitionManager:
     """Manages all transition logic and processing for the agent graph"""
     
-    def __init__(self):
-        """Initialize the transition manager"""
-        self.transitions: List[Dict] = []
-        self.path_finder = AgentPathFinder("agent_config.json")
-        self._transition_history: List[str] = []  # Track recent transitions to prevent loops
+    def __init__(self, path_finder: Optional[AgentPathFinder] = None,
+                 completion_agents: Optional[Iterable[str]] = None,
+                 max_hops: int = DEFAULT_MAX_HOPS, max_backend_calls: int = DEFAULT_MAX_BACKEND_CALLS,
+                 route_execution: str = DEFAULT_ROUTE_EXECUTION):
+        """
+        Initialize the transition manager
+        
+        Args:
+            path_finder: Shared path finder to use; one is built from agent_config.json if omitted
+            completion_agents: Agents a transferred agent may hand over to after finishing its task
+            max_hops: Handoffs allowed per user turn
+            max_backend_calls: Agent responses (backend calls) allowed per user turn
+            route_execution: "relay" to pass through the intermediate agents of a multi-step route
+                in the same turn, "stepwise" to let each of them answer (one hop per user message)
+        """
+        self.transition_log = TransitionLog()
+        self.plan: Optional[RoutePlan] = None  # Multi-step route the session is walking, if any
+        self.path_finder = path_finder or AgentPathFinder("agent_config.json")
+        self.completion_agents = frozenset(
+            DEFAULT_COMPLETION_AGENTS if completion_agents is None else completion_agents)
+        self.max_hops = max_hops
+        self.max_backend_calls = max_backend_calls
+        self.route_execution = route_execution
+        self.turn: Optional[TurnBudget] = None  # Budget and accounting of the current (or last) turn
+        self.early_dispatch = EARLY_DISPATCH
+        self.early_dispatches = 0
+    
+    def create_session(self) -> "TransitionManager":
+        """Create an empty manager for a new conversation sharing this one's path finder and settings"""
+        return TransitionManager(self.path_finder, self.completion_agents, self.max_hops, self.max_backend_calls,
+                                 self.route_execution)
+    
+    def start_turn(self, agent_name: str) -> TurnBudget:
+        """
+        Start the budget of a user turn
+        
+        Args:
+            agent_name: Agent that receives the user message
+            
+        Returns:
+            TurnBudget: The turn's budget, also kept as self.turn
+        """
+        self.turn = TurnBudget(agent_name, self.max_hops, self.max_backend_calls)
+        return self.turn
+    
+    def finish_turn(self) -> None:
+        """End the current turn's accounting"""
+        if self.turn is not None:
+            self.turn.finish()
+            TURN_HOPS.observe(self.turn.hops)
+            TURN_BACKEND_CALLS.observe(self.turn.backend_calls)
+    
+    def admit_hop(self, from_agent: str, target_agent: str, reason: str) -> bool:
+        """
+        Check a handoff against the current turn's budget and take it if allowed
+        
+        Args:
+            from_agent: Agent handing off
+            target_agent: Agent to hand off to
+            reason: What causes the handoff (e.g. "transition", "completion", "intent_router")
+            
+        Returns:
+            bool: Whether the handoff may go ahead
+        """
+        if self.turn is None:
+            self.start_turn(from_agent)
+        refusal = self.turn.admit_hop(target_agent, reason)
+        if refusal is None:
+            return True
+        TRANSITIONS_REFUSED.inc((reason, refusal))
+        logger.info("Refused handoff", extra={"from_agent": from_agent, "to_agent": target_agent,
+                                              "kind": reason, "refusal": refusal})
+        return False
+    
+    def admit_branches(self, from_agent: str, target_agents: List[str], reason: str = "fanout") -> List[str]:
+        """
+        Check the branches of a fan-out against the current turn's budget and take those allowed
+        
+        Args:
+            from_agent: Agent fanning out
+            target_agents: Agents to run concurrently
+            reason: What causes the fan-out
+            
+        Returns:
+            The admitted agents, in the order given
+        """
+        if self.turn is None:
+            self.start_turn(from_agent)
+        admitted = []
+        for target_agent, refusal in self.turn.admit_branches(target_agents, reason):
+            if refusal is None:
+                admitted.append(target_agent)
+                continue
+            TRANSITIONS_REFUSED.inc((reason, refusal))
+            logger.info("Refused fan-out branch", extra={"from_agent": from_agent, "to_agent": target_agent,
+                                                         "kind": reason, "refusal": refusal})
+        return admitted
+    
+    def detect_fanout(self, agent_response: str, current_agent: str, nodes: Dict) -> List[str]:
+        """
+        Get the targets of a fan-out marker (TRANSITION_TO:agent1&agent2) in an agent response
+        
+        Args:
+            agent_response: The agent's response
+            current_agent: Agent that wrote the response
+            nodes: Dictionary of all agent nodes
+            
+        Returns:
+            The distinct known agents of the marker other than current_agent, in marker
+            order; empty if the response has no fan-out marker
+        """
+        if TRANSITION_TEXT not in agent_response:
+            return []
+        transition_target = agent_response.split(TRANSITION_TEXT)[1].split("\n")[0]
+        if FANOUT_SEPARATOR not in transition_target:
+            return []
+        targets = []
+        for target in transition_target.split(FANOUT_SEPARATOR):
+            target = normalize_agent_name(target.strip())
+            if target in nodes and target != current_agent and target not in targets:
+                targets.append(target)
+        return targets
     
     def detect_transition(self, response_text: str) -> Optional[Dict]:
         """
@@ -31,7 +238,7 @@ class TransitionManager:
         if TRANSITION_TEXT in response_text:
             transition_target = response_text.split(TRANSITION_TEXT)[1].split("\n")[0].strip()
             # Normalize agent names
-            transition_target = transition_target.lower().replace("_department", "_agent").replace("department", "_agent")
+            transition_target = normalize_agent_name(transition_target)
             
             return {
                 "next_agent": transition_target,
@@ -56,96 +263,103 @@ class TransitionManager:
         if TRANSITION_TEXT in agent_response:
             transition_target = agent_response.split(TRANSITION_TEXT)[1].split("\n")[0].strip()
             # Normalize agent names
-            transition_target = transition_target.lower().replace("_department", "_agent").replace("department", "_agent")
+            transition_target = normalize_agent_name(transition_target)
             
             # Prevent self-transitions (agent transitioning to itself)
             current_agent = active_node.agent.get_name()
             if transition_target == current_agent:
-                print(f"[DEBUG] Prevented self-transition: {current_agent} -> {transition_target}")
+                logger.debug("Prevented self-transition", extra={"agent": current_agent})
+                return None
+            
+            # Fan-outs run several agents at once and are handled by the caller (see detect_fanout)
+            if FANOUT_SEPARATOR in transition_target:
                 return None
             
             # Handle multi-step transitions using path finder
             if TRANSITION_PATH_SEPARATOR in transition_target:
-                # Parse the requested path
-                requested_path = [agent.strip() for agent in transition_target.split(TRANSITION_PATH_SEPARATOR)]
-                
-                # Store the full path for execution
-                self.transitions.append({
-                    "type": "multi_step_path",
-                    "path": transition_target,
-                    "from_agent": active_node.agent.get_name(),
-                    "requested_path": requested_path,
-                    "current_step": 0,
-                    "timestamp": None
-                })
-                return requested_path[0] if requested_path else None
+                # Parse the requested path and follow it from the current agent
+                requested_path = [normalize_agent_name(agent.strip())
+                                  for agent in transition_target.split(TRANSITION_PATH_SEPARATOR)]
+                return self._start_plan(PLAN_REQUESTED, self._requested_route(current_agent, requested_path, nodes))
             
             # For single transitions, use path finder to validate and find route
-            current_agent = active_node.agent.get_name()
             if transition_target in nodes:
                 # Check if direct transition is possible or find a path
                 path = self.path_finder.find_path(current_agent, transition_target)
                 if path and len(path) > 1:
                     if len(path) == 2:  # Direct transition
                         return transition_target
-                    else:  # Multi-step path needed
-                        path_str = TRANSITION_PATH_SEPARATOR.join(path[1:])  # Exclude current agent
-                        self.transitions.append({
-                            "type": "auto_generated_path",
-                            "path": path_str,
-                            "from_agent": current_agent,
-                            "target_agent": transition_target,
-                            "full_path": path,
-                            "current_step": 0,
-                            "timestamp": None
-                        })
-                        return path[1]  # Return next agent in path
+                    return self._start_plan(PLAN_AUTO, path)  # Multi-step path needed
                         
             return transition_target
             
-        # Check if we're in the middle of a multi-step transition
-        current_agent_name = active_node.agent.get_name()
-        
-        # Look for active multi-step transitions
-        for transition in reversed(self.transitions):
-            if (transition.get("type") in ["multi_step_path", "auto_generated_path"] and 
-                not transition.get("completed", False)):
-                
-                if transition.get("type") == "multi_step_path":
-                    # Handle user-requested multi-step paths
-                    requested_path = transition.get("requested_path", [])
-                    current_step = transition.get("current_step", 0)
-                    
-                    if current_step < len(requested_path) and requested_path[current_step] == current_agent_name:
-                        # Move to next step
-                        next_step = current_step + 1
-                        if next_step < len(requested_path):
-                            transition["current_step"] = next_step
-                            return requested_path[next_step]
-                        else:
-                            # Path completed
-                            transition["completed"] = True
-                            
-                elif transition.get("type") == "auto_generated_path":
-                    # Handle auto-generated paths
-                    full_path = transition.get("full_path", [])
-                    current_step = transition.get("current_step", 0)
-                    
-                    # Find current position in path
-                    if current_agent_name in full_path:
-                        current_index = full_path.index(current_agent_name)
-                        next_index = current_index + 1
-                        
-                        if next_index < len(full_path):
-                            transition["current_step"] = next_index
-                            return full_path[next_index]
-                        else:
-                            # Path completed
-                            transition["completed"] = True
-                break
-                    
+        # Without a marker, an agent on the session's route plan hands over to the next agent on it
+        plan = self.plan
+        if plan is not None and plan.current_agent == active_node.agent.get_name():
+            return plan.next_agent
         return None
     
+    def next_relay_hop(self, agent_name: str) -> Optional[str]:
+        """
+        Get the hop a relayed route takes from an agent without letting it answer
+        
+        Args:
+            agent_name: Agent the session has just moved to
+            
+        Returns:
+            The next agent on the route plan if relay mode is on and agent_name is one of the
+            plan's intermediate agents, None if agent_name should answer
+        """
+        plan = self.plan
+        if self.route_execution != ROUTE_EXECUTION_RELAY or plan is None or plan.current_agent != agent_name:
+            return None
+        return plan.next_agent if plan.is_relay(agent_name) else None
+    
+    @staticmethod
+    def _requested_route(current_agent: str, requested_path: List[str], nodes: Dict) -> List[str]:
+        """
+        Turn a path written by an agent into a route starting at the current agent
+
+        The path may or may not name the current agent first; repeated names
+        would be self hops and are collapsed. The route ends before the first
+        name that is not an agent, so every hop of the plan can be executed.
+
+        Args:
+            current_agent: Agent that wrote the path
+            requested_path: Normalized agent names of the path, in order
+            nodes: Dictionary of all agent nodes
+
+        Returns:
+            The route, starting with current_agent (just [current_agent] if no hop is usable)
+        """
+        route = [current_agent]
+        for agent_name in requested_path:
+            if agent_name not in nodes:
+                logger.info("Truncated requested route at an unknown agent",
+                            extra={"agent": current_agent, "unknown_agent": agent_name, "hops": len(route) - 1})
+                break
+            if agent_name != route[-1]:
+                route.append(agent_name)
+        return route
+    
+    def _start_plan(self, kind: str, path: List[str]) -> Optional[str]:
+        """
+        Attach a new route plan to the session, replacing any previous one
+        
+        Args:
+            kind: PLAN_REQUESTED or PLAN_AUTO
+            path: Agents on the route, starting with the current agent
+            
+        Returns:
+            The agent of the first hop
+        """
+        plan = RoutePlan(kind, path)
+        if plan.complete:
+            return None
+        TRANSITION_PATH_LENGTH.observe(plan.hops, (kind,))
+        self.plan = plan
+        return plan.next_agent
+    
     def find_path_to_agent(self, current_agent: str, target_agent: str) -> Optional[List[str]]:
         """
         Find the optimal path from current agent to target agent
@@ -171,29 +385,79 @@ class TransitionManager:
         """
         path = self.find_path_to_agent(current_agent, target_agent)
         if path and len(path) > 1:
-            # Store the path for multi-step execution
-            if len(path) > 2:  # Multi-step path
-                path_str = TRANSITION_PATH_SEPARATOR.join(path[1:])
-                self.transitions.append({
-                    "type": "auto_generated_path",
-                    "path": path_str,
-                    "from_agent": current_agent,
-                    "target_agent": target_agent,
-                    "full_path": path,
-                    "current_step": 1,
-                    "timestamp": None
-                })
-                
-            return path[1]  # Return next agent in path
+            if len(path) > 2:  # Multi-step path: keep it as the session's route plan
+                return self._start_plan(PLAN_AUTO, path)
+            return path[1]
                         
         return None
         
+    async def astream_response(self, agent: "ConversationalAgent", messages: List[Dict],
+                               agent_names: Iterable[str], response_chunks: List[str]) -> AsyncGenerator[str, None]:
+        """
+        Stream an agent's response, stopping as soon as it contains a complete transition marker
+        
+        Nothing after the marker is needed to dispatch the transition, so the rest of the
+        generation is cancelled and the target agent can be started right away.
+        
+        Args:
+            agent: Agent to generate the response
+            messages: Messages to send to the backend
+            agent_names: Names of the agents a transition may target
+            response_chunks: List the yielded deltas are also appended to
+            
+        Yields:
+            Response deltas, the last one cut off after a transition marker
+        """
+        parser = TransitionStreamParser(agent_names) if self.early_dispatch else None
+        stream = agent.aexecute_with_streaming(messages)
+        started = time.perf_counter()
+        try:
+            async for chunk in stream:
+                cut = parser.feed(chunk) if parser else None
+                if cut is not None:
+                    chunk = chunk[:cut]
+                if chunk:
+                    response_chunks.append(chunk)
+                    yield chunk
+                if cut is not None:
+                    self.early_dispatches += 1
+                    break
+        finally:
+            await stream.aclose()
+            if self.turn is not None:
+                self.turn.record_backend_call(time.perf_counter() - started)
+    
     def process_transitioned_message(self, user_message: str, target_agent: str, 
                                    nodes: Dict, agent_contexts: Dict, 
-                                   conversation_history: List[Dict],
+                                   conversation_history: ContextWindow,
                                    format_parent_context_func, context_str: str = "") -> Generator[str, None, None]:
+        """Synchronous counterpart of aprocess_transitioned_message"""
+        yield from iterate_sync(self.aprocess_transitioned_message(
+            user_message, target_agent, nodes, agent_contexts, conversation_history,
+            format_parent_context_func, context_str))
+        
+    async def aprocess_transitioned_message(self, user_message: str, target_agent: str,
+                                            nodes: Dict, agent_contexts: Dict,
+                                            conversation_history: ContextWindow,
+                                            format_parent_context_func, context_str: str = "") -> AsyncGenerator[str, None]:
+        """Process the original message with the new target agent and yield response text"""
+        async for event in self.aprocess_transitioned_events(
+                user_message, target_agent, nodes, agent_contexts, conversation_history,
+                format_parent_context_func, context_str):
+            if event["content"]:
+                yield event["content"]
+        
+    async def aprocess_transitioned_events(self, user_message: str, target_agent: str,
+                                           nodes: Dict, agent_contexts: Dict,
+                                           conversation_history: ContextWindow,
+                                           format_parent_context_func, context_str: str = "") -> AsyncGenerator[Dict, None]:
         """
-        Process the original message with the new target agent
+        Process the original message with the new target agent, then follow its completion handoffs
+        
+        Completion handoffs (a finished agent handing the conversation to one of
+        the completion agents) are followed in a loop, each admitted against the
+        turn's hop, backend-call and cycle budget, so the number of backend calls
+        one user message can cause is bounded.
         
         Args:
             user_message: Original user message
@@ -205,10 +469,63 @@ class TransitionManager:
             context_str: Optional context string to override default context
             
         Yields:
-            Response chunks from the target agent
+            Token and transition events from the target agent and the agents it completes to
         """
-        target_node = nodes[target_agent]
-        target_agent_obj = target_node.agent
+        if self.turn is None:
+            self.start_turn(target_agent)
+        
+        while True:
+            response_chunks = []
+            async for event in self.arun_transferred_agent(user_message, target_agent, nodes, agent_contexts,
+                                                           format_parent_context_func, context_str,
+                                                           response_chunks):
+                yield event
+            full_response = "".join(response_chunks)
+            response_message_id = conversation_history.append({
+                "role": "assistant",
+                "content": full_response
+            })
+            
+            # Completion handoff, e.g. back to reception or on to feedback after the task is done
+            completion_transition = self.detect_transition(full_response)
+            if not completion_transition:
+                return
+            next_agent = completion_transition["next_agent"]
+            if next_agent not in self.completion_agents or next_agent not in nodes:
+                return
+            if not self.admit_hop(target_agent, next_agent, "completion"):
+                return
+            
+            logger.info("Completion transition", extra={"from_agent": target_agent, "to_agent": next_agent})
+            self.record_transition(
+                current_agent=target_agent,
+                user_message=user_message,
+                response=full_response,
+                next_agent=next_agent,
+                agent_contexts=agent_contexts,
+                kind="completion",
+                response_message_id=response_message_id
+            )
+            yield transition_event(target_agent, next_agent, reason="completion")
+            context_str = f"Completed task in {target_agent}, transitioning to {next_agent}"
+            user_message = f"Task completed. {completion_transition.get('context', '')}"
+            target_agent = next_agent
+    
+    async def arun_transferred_agent(self, user_message: str, target_agent: str, nodes: Dict,
+                                     agent_contexts: Dict, format_parent_context_func,
+                                     context_str: str, response_chunks: List[str]) -> AsyncGenerator[Dict, None]:
+        """
+        Run one transferred agent on a message and add its response to its context
+        
+        Used for each agent of a completion chain and for each branch of a fan-out.
+        
+        Args:
+            response_chunks: List the agent's response deltas are appended to
+            
+        Yields:
+            The agent's token events
+        """
+        target_agent_obj = nodes[target_agent].agent
         
         # Add the user message to the new agent's context
         agent_contexts[target_agent]["conversation_summary"].append({
@@ -216,57 +533,23 @@ class TransitionManager:
             "content": user_message,
             "agent": target_agent
         })
-          # Get parent context for the new agent
+        # Get parent context for the new agent
         if not context_str:
             context_str = format_parent_context_func(target_agent)
         
-        # Create a specialized system message for transitioned agents that overrides routing behavior
-        base_system_message = target_agent_obj.get_system_message()
-        
-        # Remove the graph structure and transition instructions from the base message
-        base_parts = base_system_message.split("GRAPH STRUCTURE:")
-        core_prompt = base_parts[0] if base_parts else base_system_message
-          # Create a new system message specifically for handling transitioned requests
-        specialized_system_message = f"""{core_prompt}
-
-TRANSITION CONTEXT: You have received a transferred request that you are specifically designed to handle. 
-The user's query is: '{user_message}'
-
-IMPORTANT INSTRUCTIONS:
-- Handle this request using your specialized knowledge and tools
-- Provide a direct, helpful response to address the user's specific needs
-- Once you have completed your task (e.g., confirmed a booking, answered a question), you may redirect the user back to reception or feedback for additional assistance
-- If your task is complete and the user needs general assistance, use: TRANSITION_TO: reception_agent
-- If your task is complete and the user wants to provide feedback, use: TRANSITION_TO: feedback_agent
-- Only transition after you have fully completed your assigned task"""
-        if context_str:
-            specialized_system_message += f"\nParent Context: {context_str}"
-        
-        # Add scheduler-specific context if transitioning to scheduler agent
-        if target_agent == "scheduler_agent":
-            scheduling_context = agent_contexts[target_agent]["session_data"].get("scheduling_context")
-            if scheduling_context:
-                specialized_system_message += f"""
-
-SCHEDULING CONTEXT:
-- Original request: {scheduling_context.get('original_request', '')}
-- Transferred from: {scheduling_context.get('from_agent', '')}
-- This is a scheduling-focused request - prioritize gathering time, date, duration, and location details
-- Use your manage_schedule tool once you have all required information"""
-            
-        # Create messages for the new agent with the specialized system prompt
-        messages = [
-            {"role": "system", "content": specialized_system_message},
-            {"role": "user", "content": f"[TRANSFERRED REQUEST] {user_message}"}
-        ]
+        # The agent's precomputed transfer prompt stays byte-identical across requests so the
+        # backend can reuse its cached prefix; everything request-specific follows it
+        messages = [{"role": "system", "content": target_agent_obj.get_transfer_system_message()}]
+        transfer_context = self._format_transfer_context(target_agent, agent_contexts, context_str)
+        if transfer_context:
+            messages.append({"role": "system", "content": transfer_context})
+        messages.append({"role": "user", "content": f"[TRANSFERRED REQUEST] {user_message}"})
         
         # Generate response from new agent
-        response_chunks = []
-        for chunk in target_agent_obj.execute_with_streaming(messages):
-            response_chunks.append(chunk)
-            yield chunk
+        async for chunk in self.astream_response(target_agent_obj, messages, nodes, response_chunks):
+            yield token_event(target_agent, chunk)
         
-        full_response = "".join(response_chunks) if isinstance(response_chunks[0], str) else response_chunks[0]
+        full_response = "".join(response_chunks)
         
         # Update the new agent's context with its response
         agent_contexts[target_agent]["conversation_summary"].append({
@@ -274,63 +557,29 @@ SCHEDULING CONTEXT:
             "content": full_response,
             "agent": target_agent
         })
-          # Update conversation history
-        conversation_history.append({
-            "role": "assistant", 
-            "content": full_response
-        })
-        
-        # Check for completion transitions (e.g., back to reception after task completion)
-        # Allow transitions to root/reception agent or feedback agent (completion flows)
-        # But prevent transitions back to parent agent or infinite loops
-        completion_transition = self.detect_transition(full_response)
-        if completion_transition:
-            next_agent = completion_transition["next_agent"]
-            
-            # Allow completion transitions to specific agents
-            allowed_completion_agents = ["reception_agent", "feedback_agent"]
-            
-            # Prevent infinite loops: don't transition back to the agent that initiated this transfer
-            # or to the same agent we're currently in
-            transition_history = getattr(self, '_transition_history', [])
-            if len(transition_history) > 0:
-                initiating_agent = transition_history[-1] if transition_history else None
-            else:
-                initiating_agent = None
-                
-            should_allow_transition = (
-                next_agent in allowed_completion_agents and
-                next_agent != target_agent and  # Don't transition to self
-                next_agent != initiating_agent  # Don't go back to the agent that sent us here
-            )
-            
-            if should_allow_transition:
-                print(f" Completion transition: {target_agent} → {next_agent}")
-                
-                # Record this as a completion transition
-                self.record_transition(
-                    current_agent=target_agent,
-                    user_message=user_message,
-                    response=full_response,
-                    next_agent=next_agent,
-                    agent_contexts=agent_contexts
-                )                # Process the completion transition
-                context_info = f"Completed task in {target_agent}, transitioning to {next_agent}"
-                yield from self.process_transitioned_message(
-                    user_message=f"Task completed. {completion_transition.get('context', '')}",
-                    target_agent=next_agent,
-                    nodes=nodes,
-                    agent_contexts=agent_contexts,
-                    conversation_history=conversation_history,
-                    format_parent_context_func=format_parent_context_func,
-                    context_str=context_info
-                )
-                return
+    
+    @staticmethod
+    def _format_transfer_context(target_agent: str, agent_contexts: Dict, context_str: str) -> str:
+        """Format the request-specific context sent after a transferred agent's static prompt"""
+        parts = []
+        if context_str:
+            parts.append(f"Parent Context: {context_str}")
         
-        # No completion transition detected or allowed
+        # Add scheduler-specific context if transitioning to scheduler agent
+        if target_agent == "scheduler_agent":
+            scheduling_context = agent_contexts[target_agent]["session_data"].get("scheduling_context")
+            if scheduling_context:
+                parts.append(f"""SCHEDULING CONTEXT:
+- Original request: {scheduling_context.get('original_request', '')}
+- Transferred from: {scheduling_context.get('from_agent', '')}
+- This is a scheduling-focused request - prioritize gathering time, date, duration, and location details
+- Use your manage_schedule tool once you have all required information""")
+        return "\n\n".join(parts)
     
     def record_transition(self, current_agent: str, user_message: str, 
-                         response: str, next_agent: str, agent_contexts: Dict) -> None:
+                         response: str, next_agent: str, agent_contexts: Dict,
+                         kind: str = "transition", user_message_id: Optional[int] = None,
+                         response_message_id: Optional[int] = None) -> None:
         """
         Record a transition and update agent context
         
@@ -340,21 +589,20 @@ SCHEDULING CONTEXT:
             response: Agent's response
             next_agent: Target agent name
             agent_contexts: Dictionary of agent contexts
+            kind: What caused the transition (e.g. "transition", "completion", "intent_router")
+            user_message_id: ID of the user message in the conversation history
+            response_message_id: ID of the agent response in the conversation history
         """
-        # Add transition to list
-        self.transitions.append({
-            "from_agent": current_agent,
-            "to_agent": next_agent,
-            "user_message": user_message,
-            "agent_response": response,
-            "timestamp": None  # You can add timestamp if needed
-        })
+        # The log references the messages by ID rather than copying their text
+        self.transition_log.append(current_agent, next_agent, kind, user_message_id, response_message_id)
+        TRANSITIONS.inc((current_agent, next_agent, kind))
+        if kind == "completion":
+            COMPLETION_TRANSITIONS.inc((current_agent, next_agent))
         
-        # Update transition history for loop prevention
-        self._transition_history.append(current_agent)
-        # Keep only the last 5 transitions to prevent memory buildup
-        if len(self._transition_history) > 5:
-            self._transition_history.pop(0)
+        # Follow the route plan; a hop off the route abandons it
+        if self.plan is not None and (not self.plan.advance_to(next_agent) or self.plan.complete):
+            self.plan = None
+
           # Extract and store any user preferences or session data in current agent context
         if "preference" in user_message.lower():
             agent_contexts[current_agent]["user_preferences"].update({
@@ -384,16 +632,54 @@ SCHEDULING CONTEXT:
         })
     
     def get_transitions(self) -> List[Dict]:
-        """Get all transitions that have occurred"""
-        return self.transitions.copy()
+        """Get all transitions still held in the log"""
+        return [record.to_dict() for record in self.transition_log]
         
     def get_recent_transitions(self, count: int = 5) -> List[Dict]:
         """Get the most recent transitions"""
-        return self.transitions[-count:] if self.transitions else []
+        return [record.to_dict() for record in self.transition_log.recent(count)]
+    
+    def get_transitions_page(self, cursor: int = 0, limit: int = 100) -> Dict:
+        """
+        Get one page of transitions
+        
+        Args:
+            cursor: Sequence number to start from (next_cursor of the previous page)
+            limit: Maximum number of transitions to return
+            
+        Returns:
+            Dictionary with the transitions, the next cursor, whether more follow and how many were dropped
+        """
+        records, next_cursor, has_more = self.transition_log.page(cursor, limit)
+        return {
+            "transitions": [record.to_dict() for record in records],
+            "next_cursor": next_cursor,
+            "has_more": has_more,
+            "dropped": self.transition_log.dropped
+        }
+    
+    def to_state(self) -> Dict:
+        """Get the session's transition log and route plan as JSON-serializable data"""
+        return {
+            "log": self.transition_log.to_state(),
+            "plan": self.plan.to_dict() if self.plan is not None else None,
+        }
+    
+    def load_state(self, state: Dict, agent_names: Iterable[str]) -> None:
+        """
+        Restore to_state() data into this manager
+        
+        Args:
+            state: Data returned by to_state()
+            agent_names: Agents of the current topology; a plan through agents that no longer exist is dropped
+        """
+        self.transition_log = TransitionLog.from_state(state.get("log", {}), self.transition_log.capacity)
+        plan = state.get("plan")
+        self.plan = RoutePlan.from_dict(plan, agent_names) if plan else None
     
-    def get_last_transition(self) -> Optional[Dict]:
+    def get_last_transition(self) -> Optional[TransitionRecord]:
         """Get the last transition that occurred"""
-        return self.transitions[-1] if self.transitions else None
+        return self.transition_log.last()
     
     def get_available_agents(self, current_agent: str) -> List[str]:
         """Get list of agents reachable from current agent"""
@@ -0,0 +1,188 @@
+"""
+Turn Budget Module
+
+This module bounds the work a single user message can cause. A turn starts
+at one agent and may hand off to others (transitions, intent routing,
+completion flows); every handoff is a hop and every agent response is one
+backend call. A TurnBudget admits or refuses each hop against a maximum hop
+count, a maximum number of backend calls and cycle detection over the
+(agent, reason) pairs the turn has visited, and accounts for the hops and
+backend time spent so they can be reported with the response. The branches
+of a fan-out are admitted together, each as one hop and one backend call.
+"""
+
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_MAX_HOPS = 4
+DEFAULT_MAX_BACKEND_CALLS = 4
+
+# Reasons a hop is refused
+REFUSED_SELF = "self"
+REFUSED_BOUNCE = "bounce"
+REFUSED_CYCLE = "cycle"
+REFUSED_MAX_HOPS = "max_hops"
+REFUSED_MAX_BACKEND_CALLS = "max_backend_calls"
+
+
+def resolve_turn_limits(settings: Optional[Dict] = None) -> Tuple[int, int]:
+    """
+    Get the per-turn limits from the "transitions" section of agent_config.json
+
+    Args:
+        settings: The section, with optional "max_hops" and "max_backend_calls";
+            TURN_MAX_HOPS and TURN_MAX_BACKEND_CALLS in the environment override them
+
+    Returns:
+        Tuple of (max hops, max backend calls)
+    """
+    settings = settings or {}
+    max_hops = os.environ.get("TURN_MAX_HOPS", settings.get("max_hops", DEFAULT_MAX_HOPS))
+    max_backend_calls = os.environ.get("TURN_MAX_BACKEND_CALLS",
+                                       settings.get("max_backend_calls", DEFAULT_MAX_BACKEND_CALLS))
+    return int(max_hops), int(max_backend_calls)
+
+
+class TurnBudget:
+    """Hop and backend-call budget and accounting of one user turn"""
+
+    def __init__(self, start_agent: str, max_hops: int = DEFAULT_MAX_HOPS,
+                 max_backend_calls: int = DEFAULT_MAX_BACKEND_CALLS):
+        """
+        Start a turn
+
+        Args:
+            start_agent: Agent that receives the user message
+            max_hops: Handoffs allowed in the turn
+            max_backend_calls: Agent responses (backend calls) allowed in the turn
+        """
+        self.max_hops = max_hops
+        self.max_backend_calls = max_backend_calls
+        self.chain: List[Tuple[str, str]] = [(start_agent, "start")]
+        self._visited = {(start_agent, "start")}
+        self.backend_calls = 0
+        self.backend_seconds = 0.0
+        self.refused: List[Dict] = []
+        self._started = time.perf_counter()
+        self._finished: Optional[float] = None
+
+    @property
+    def hops(self) -> int:
+        """Handoffs made so far"""
+        return len(self.chain) - 1
+
+    @property
+    def current_agent(self) -> str:
+        """Agent the turn is currently at"""
+        return self.chain[-1][0]
+
+    def check_hop(self, target_agent: str, reason: str) -> Optional[str]:
+        """
+        Decide whether the turn may hand off to an agent, without taking the hop
+
+        A hop is refused when it targets the current agent, goes straight back
+        to the agent that handed over to the current one, revisits an
+        (agent, reason) pair, or would exceed the hop or backend-call limit
+        (the target agent needs one more backend call).
+
+        Args:
+            target_agent: Agent to hand off to
+            reason: What causes the hop (e.g. "transition", "completion", "intent_router")
+
+        Returns:
+            The refusal reason, or None if the hop is allowed
+        """
+        if target_agent == self.current_agent:
+            return REFUSED_SELF
+        if len(self.chain) > 1 and target_agent == self.chain[-2][0]:
+            return REFUSED_BOUNCE
+        if (target_agent, reason) in self._visited:
+            return REFUSED_CYCLE
+        if self.hops >= self.max_hops:
+            return REFUSED_MAX_HOPS
+        if self.backend_calls >= self.max_backend_calls:
+            return REFUSED_MAX_BACKEND_CALLS
+        return None
+
+    def admit_hop(self, target_agent: str, reason: str) -> Optional[str]:
+        """
+        Take a hop if check_hop allows it
+
+        Args:
+            target_agent: Agent to hand off to
+            reason: What causes the hop
+
+        Returns:
+            The refusal reason (also kept in refused), or None if the hop was taken
+        """
+        refusal = self.check_hop(target_agent, reason)
+        if refusal is not None:
+            self.refused.append({"from_agent": self.current_agent, "to_agent": target_agent,
+                                 "reason": reason, "refusal": refusal})
+            return refusal
+        self.chain.append((target_agent, reason))
+        self._visited.add((target_agent, reason))
+        return None
+
+    def admit_branches(self, target_agents: List[str], reason: str) -> List[Tuple[str, Optional[str]]]:
+        """
+        Take the hops of a fan-out, whose branches all start from the current agent and run concurrently
+        
+        Each branch is one hop and one backend call; branches are admitted in
+        order until the hop or backend-call limit is reached, and a branch that
+        targets the current agent or revisits an (agent, reason) pair is refused.
+        
+        Args:
+            target_agents: Agents to run concurrently
+            reason: What causes the fan-out
+            
+        Returns:
+            Each target agent with its refusal reason (also kept in refused), or None if admitted
+        """
+        from_agent = self.current_agent
+        results = []
+        admitted = 0
+        for target_agent in target_agents:
+            if target_agent == from_agent:
+                refusal = REFUSED_SELF
+            elif (target_agent, reason) in self._visited:
+                refusal = REFUSED_CYCLE
+            elif self.hops >= self.max_hops:
+                refusal = REFUSED_MAX_HOPS
+            elif self.backend_calls + admitted >= self.max_backend_calls:
+                refusal = REFUSED_MAX_BACKEND_CALLS
+            else:
+                refusal = None
+            if refusal is None:
+                self.chain.append((target_agent, reason))
+                self._visited.add((target_agent, reason))
+                admitted += 1
+            else:
+                self.refused.append({"from_agent": from_agent, "to_agent": target_agent,
+                                     "reason": reason, "refusal": refusal})
+            results.append((target_agent, refusal))
+        return results
+    
+    def record_backend_call(self, seconds: float) -> None:
+        """Account for one agent response"""
+        self.backend_calls += 1
+        self.backend_seconds += seconds
+
+    def finish(self) -> None:
+        """Mark the end of the turn"""
+        if self._finished is None:
+            self._finished = time.perf_counter()
+
+    def to_dict(self) -> Dict:
+        """Get the turn's accounting as JSON-serializable data"""
+        return {
+            "hops": self.hops,
+            "backend_calls": self.backend_calls,
+            "backend_ms": round(self.backend_seconds * 1000, 1),
+            "total_ms": round(((self._finished or time.perf_counter()) - self._started) * 1000, 1),
+            "chain": [{"agent": agent, "reason": reason} for agent, reason in self.chain],
+            "refused": list(self.refused),
+            "max_hops": self.max_hops,
+            "max_backend_calls": self.max_backend_calls,
+        }